@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for genai.Client, used by image_gen.py --offline.
+
+Answers generate_content with a solid-color PNG sized like the real model
+output (from the request's aspect ratio and resolution) after a short delay,
+so batch runs, retries and metadata can be exercised without network access
+or an API key. generate_content_stream sends the text part first and the
+image at the end. It can also act like a quota-limited server and answer
+with real 429 RESOURCE_EXHAUSTED errors, or hang until the request timeout
+(http_options.timeout) runs out.
+
+Settings (environment):
+    IMAGE_GEN_FAKE_LATENCY      seconds per call (default: 0.2)
+    IMAGE_GEN_FAKE_CAPACITY     concurrent calls accepted; more get a 429 (default: unlimited)
+    IMAGE_GEN_FAKE_429_RATE     probability of a random 429 per call (default: 0)
+    IMAGE_GEN_FAKE_RETRY_DELAY  retryDelay hint sent with 429s, e.g. 2s (default: 1s, empty: none)
+    IMAGE_GEN_FAKE_HANG_RATE    probability that a call hangs until its timeout (default: 0)
+"""
+
+import hashlib
+import math
+import os
+import random
+import threading
+import time
+from io import BytesIO
+
+import httpx
+from google.genai import errors, types
+from PIL import Image, ImageDraw
+
+# Long-edge-equivalent pixel counts per resolution (square output)
+_RESOLUTION_EDGE = {"1K": 1024, "2K": 2048, "4K": 4096}
+
+
+def _output_size(aspect_ratio, resolution):
+    """Pixel size for an aspect ratio at a resolution, rounded to 16 px."""
+    w, h = (int(v) for v in (aspect_ratio or "1:1").split(":"))
+    edge = _RESOLUTION_EDGE.get(resolution or "1K", 1024)
+    scale = edge / math.sqrt(w * h)
+    return (max(16, round(w * scale / 16) * 16), max(16, round(h * scale / 16) * 16))
+
+
+def _resource_exhausted(retry_delay):
+    error = {"code": 429, "status": "RESOURCE_EXHAUSTED",
+             "message": "Resource has been exhausted (e.g. check quota). [offline]"}
+    if retry_delay:
+        error["details"] = [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": retry_delay}]
+    return errors.ClientError(429, {"error": error})
+
+
+class _FakeModels:
+    def __init__(self, latency, capacity, error_rate, retry_delay, hang_rate):
+        self.latency = latency
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.retry_delay = retry_delay
+        self.hang_rate = hang_rate
+        self.calls = 0
+        self.rejected = 0
+        self.active = 0
+        self.peak_active = 0
+        self._lock = threading.Lock()
+
+    def _admit(self):
+        with self._lock:
+            self.calls += 1
+            over = self.capacity and self.active >= self.capacity
+            if over or random.random() < self.error_rate:
+                self.rejected += 1
+                raise _resource_exhausted(self.retry_delay)
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+
+    def _release(self):
+        with self._lock:
+            self.active -= 1
+
+    def _wait(self, seconds, config):
+        """Sleep like a server taking `seconds`, giving up at the request timeout."""
+        timeout_ms = config.http_options.timeout if config and config.http_options else None
+        if random.random() < self.hang_rate:
+            seconds = float("inf")
+        if timeout_ms is not None and seconds > timeout_ms / 1000:
+            time.sleep(timeout_ms / 1000)
+            raise httpx.ReadTimeout("The read operation timed out [offline]")
+        time.sleep(min(seconds, 3600))
+
+    def generate_content(self, model, contents, config=None):
+        self._admit()
+        try:
+            self._wait(self.latency, config)
+            return self._respond(model, contents, config)
+        finally:
+            self._release()
+
+    def generate_content_stream(self, model, contents, config=None):
+        self._admit()
+        try:
+            response = self._respond(model, contents, config)
+            text, image = response.candidates[0].content.parts
+            self._wait(self.latency * 0.1, config)
+            yield types.GenerateContentResponse(
+                candidates=[types.Candidate(content=types.Content(role="model", parts=[text]))])
+            self._wait(self.latency * 0.9, config)
+            yield types.GenerateContentResponse(
+                candidates=[types.Candidate(content=types.Content(role="model", parts=[image]))],
+                usage_metadata=response.usage_metadata)
+        finally:
+            self._release()
+
+    def _respond(self, model, contents, config):
+        prompt = next((c for c in contents if isinstance(c, str)), "")
+        image_config = config.image_config if config and config.image_config else None
+        size = _output_size(image_config.aspect_ratio if image_config else None,
+                            image_config.image_size if image_config else None)
+
+        # Prompt-specific color with a random panel, so repeated calls differ like real samples
+        color = tuple(hashlib.sha256(prompt.encode()).digest()[:3])
+        image = Image.new("RGB", size, color)
+        panel = tuple(random.randrange(256) for _ in range(3))
+        x0, y0 = random.randrange(size[0] // 2), random.randrange(size[1] // 2)
+        ImageDraw.Draw(image).rectangle((x0, y0, x0 + size[0] // 3, y0 + size[1] // 3), fill=panel)
+        buf = BytesIO()
+        image.save(buf, format="PNG")
+
+        prompt_tokens = len(prompt.split()) + 258 * (len(contents) - 1)
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=[
+                types.Part(text=f"[offline] {model} placeholder for: {prompt[:60]}"),
+                types.Part.from_bytes(data=buf.getvalue(), mime_type="image/png"),
+            ]))],
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_tokens,
+                candidates_token_count=1290,
+                total_token_count=prompt_tokens + 1290,
+            ),
+        )
+
+
+class _FakeFiles:
+    def __init__(self):
+        self.uploads = 0
+        self.uploaded_bytes = 0
+        self._lock = threading.Lock()
+
+    def upload(self, file, config=None):
+        data = file.read()
+        with self._lock:
+            self.uploads += 1
+            self.uploaded_bytes += len(data)
+        name = f"files/offline-{hashlib.sha256(data).hexdigest()[:12]}"
+        return types.File(name=name, uri=f"offline://{name}", mime_type=config.mime_type if config else None,
+                          size_bytes=len(data))
+
+
+class FakeClient:
+    """Minimal genai.Client look-alike: client.models.generate_content and client.files.upload."""
+
+    def __init__(self, latency=None, capacity=None, error_rate=None, retry_delay=None, hang_rate=None):
+        env = os.environ.get
+        if latency is None:
+            latency = float(env("IMAGE_GEN_FAKE_LATENCY", "0.2"))
+        if capacity is None:
+            capacity = int(env("IMAGE_GEN_FAKE_CAPACITY", "0"))
+        if error_rate is None:
+            error_rate = float(env("IMAGE_GEN_FAKE_429_RATE", "0"))
+        if retry_delay is None:
+            retry_delay = env("IMAGE_GEN_FAKE_RETRY_DELAY", "1s")
+        if hang_rate is None:
+            hang_rate = float(env("IMAGE_GEN_FAKE_HANG_RATE", "0"))
+        self.models = _FakeModels(latency, capacity, error_rate, retry_delay, hang_rate)
+        self.files = _FakeFiles()
@@ -5,13 +5,17 @@ Supports both standard (fast) and pro (high quality) models
 """
 
 import argparse
+import json
 import os
+import sqlite3
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from io import BytesIO
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 try:
     from google import genai
@@ -23,6 +27,22 @@ except ImportError:
     print("Please run: pip install -r requirements.txt")
     sys.exit(1)
 
+from rate_limit import FATAL, RATE_LIMITED, Scheduler, classify_error
+from references import DEFAULT_MAX_EDGE, ReferenceStore
+import response_cache
+from response_cache import ResponseCache
+
+# Variant ranking reuses the manipulate-image skill's analysis code when installed
+sys.path.append(str(Path(__file__).resolve().parents[2] / "manipulate-image" / "scripts"))
+try:
+    from ops.analyze import quality_metrics
+except ImportError:
+    quality_metrics = None
+
+
+# Default per-attempt deadline in seconds (Pro 4K generations take up to about a minute)
+DEFAULT_TIMEOUT = 180.0
+
 
 class GeminiImageCLI:
     # Model identifiers (per Google docs: https://ai.google.dev/gemini-api/docs/image-generation)
@@ -37,8 +57,34 @@ class GeminiImageCLI:
     # Supported resolutions (Pro model only - Flash is fixed at ~1K)
     RESOLUTIONS = ["1K", "2K", "4K"]
 
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize the CLI with API credentials."""
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        client: Optional[Any] = None,
+        scheduler: Optional[Scheduler] = None,
+        cache: Optional[ResponseCache] = None,
+        references: Optional[ReferenceStore] = None,
+        stream: bool = False,
+        timeout: Optional[float] = None
+    ):
+        """Initialize the CLI with API credentials, or with a ready client (e.g. FakeClient)."""
+        # Per-thread log prefix, set for batch items
+        self._local = threading.local()
+        # Admission control and retry policy shared by every call of this instance
+        self.scheduler = scheduler or Scheduler(max_concurrency=1)
+        # Opt-in response cache (None: always call the API)
+        self.cache = cache
+        # Reference images, prepared once per content hash
+        self.references = references or ReferenceStore()
+        # Streaming responses and per-attempt deadline in seconds (None: no deadline)
+        self.stream = stream
+        self.timeout = timeout
+
+        if client is not None:
+            self.api_key = api_key
+            self.client = client
+            return
+
         # Get API key from parameter or environment variable
         # Note: Claude Code injects env vars from settings.local.json automatically
         self.api_key = api_key or os.environ.get("GEMINI_API_KEY")
@@ -55,6 +101,51 @@ class GeminiImageCLI:
             print(f"Error initializing Gemini client: {e}")
             sys.exit(1)
 
+    def _log(self, message: str = "") -> None:
+        """Print a message, prefixed with the batch item tag when in a batch."""
+        prefix = getattr(self._local, "prefix", "")
+        if prefix:
+            message = message.lstrip("\n")
+        print(f"{prefix}{message}", flush=bool(prefix))
+
+    def _save_image(self, data: bytes, output: str, metadata: Dict[str, Any]) -> None:
+        """
+        Save returned image bytes to output and record the result.
+
+        The bytes are written unchanged when the output extension matches their
+        format; only a different format is decoded and re-encoded. Size comes
+        from the image header either way.
+        """
+        # Image.open only parses the header; pixels load on first access
+        image = Image.open(BytesIO(data))
+
+        # Ensure output directory exists
+        output_path = Path(output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        target_format = Image.registered_extensions().get(output_path.suffix.lower())
+        source_format = image.format
+        transcoded = target_format != source_format
+        if transcoded:
+            self._log(f"Converting {source_format} response to {output_path.suffix.lstrip('.').upper()}")
+            if target_format == "JPEG" and image.mode not in ("RGB", "L", "CMYK"):
+                image = image.convert("RGB")
+            image.save(output)
+        else:
+            with open(output, "wb") as f:
+                f.write(data)
+        self._log(f"\n✓ Image saved to: {output}")
+        self._log(f"  Size: {image.size[0]}x{image.size[1]} pixels")
+
+        metadata["output"] = {
+            "file": output,
+            "width": image.size[0],
+            "height": image.size[1],
+            "format": output_path.suffix.lstrip('.').upper(),
+            "source_format": source_format,
+            "transcoded": transcoded,
+        }
+
     def _save_metadata(self, metadata: Dict[str, Any], output_path: str) -> str:
         """Save metadata as YAML file alongside the image."""
         output = Path(output_path)
@@ -76,7 +167,8 @@ class GeminiImageCLI:
         max_retries: int = 3,
         save_metadata: bool = True,
         user_request: Optional[str] = None,
-        composition: Optional[str] = None
+        composition: Optional[str] = None,
+        batch: Optional[Dict[str, Any]] = None
     ) -> bool:
         """
         Generate or edit an image using Gemini.
@@ -92,10 +184,33 @@ class GeminiImageCLI:
             save_metadata: Save metadata YAML file alongside image
             user_request: Original user request/requirements
             composition: Reasoning/composition notes explaining prompt choices
+            batch: Batch manifest/item info to record in the metadata
 
         Returns:
             True if successful, False otherwise
         """
+        success, _ = self._generate(
+            prompt, images, aspect_ratio, resolution, output, use_pro,
+            max_retries, save_metadata, user_request, composition, batch
+        )
+        return success
+
+    def _generate(
+        self,
+        prompt: str,
+        images: Optional[List[str]],
+        aspect_ratio: str,
+        resolution: str,
+        output: str,
+        use_pro: bool,
+        max_retries: int,
+        save_metadata: bool,
+        user_request: Optional[str],
+        composition: Optional[str],
+        batch: Optional[Dict[str, Any]],
+        variant: Optional[int] = None
+    ) -> Tuple[bool, Dict[str, Any]]:
+        """generate_image() body; also returns the collected metadata."""
         # Initialize metadata dict to collect all generation info
         metadata: Dict[str, Any] = {
             "generated_at": datetime.now(timezone.utc).isoformat(),
@@ -118,30 +233,46 @@ class GeminiImageCLI:
             del metadata["user_request"]
         if composition is None:
             del metadata["composition"]
+        if batch is not None:
+            metadata["batch"] = batch
+        if variant is not None:
+            metadata["variant"] = {"index": variant}
         model = self.MODEL_PRO if use_pro else self.MODEL_FLASH
         model_name = "Gemini Pro" if use_pro else "Gemini Flash"
 
-        print(f"Using {model_name} ({model})")
-        print(f"Prompt: {prompt}")
+        self._log(f"Using {model_name} ({model})")
+        self._log(f"Prompt: {prompt}")
         if use_pro:
-            print(f"Aspect Ratio: {aspect_ratio}, Resolution: {resolution}")
+            self._log(f"Aspect Ratio: {aspect_ratio}, Resolution: {resolution}")
         else:
-            print(f"Aspect Ratio: {aspect_ratio} (Flash model uses fixed ~1K resolution)")
+            self._log(f"Aspect Ratio: {aspect_ratio} (Flash model uses fixed ~1K resolution)")
 
         # Build contents array
         contents = [prompt]
 
-        # Add reference images if provided
+        # Add reference images if provided (downscaled, encoded once per content)
+        references = []
         if images:
-            print(f"Loading {len(images)} reference image(s)...")
+            self._log(f"Loading {len(images)} reference image(s)...")
             for img_path in images:
                 try:
-                    img = Image.open(img_path)
-                    contents.append(img)
-                    print(f"  - Loaded: {img_path}")
+                    ref = self.references.get(img_path, self.client)
+                    contents.append(ref.part())
+                    references.append(dict(file=img_path, **ref.describe()))
+                    note = ""
+                    if ref.reencoded:
+                        note = f", from {ref.original_size[0]}x{ref.original_size[1]} {ref.original_bytes // 1024} KB"
+                    self._log(f"  - Loaded: {img_path} ({ref.size[0]}x{ref.size[1]} {len(ref.data) // 1024} KB{note})")
                 except Exception as e:
-                    print(f"Error loading image {img_path}: {e}")
-                    return False
+                    self._log(f"Error loading image {img_path}: {e}")
+                    metadata["error"] = f"Error loading image {img_path}: {e}"
+                    return False, metadata
+
+        # Request payload per attempt; uploaded references travel as URIs
+        bytes_per_attempt = len(prompt.encode()) + sum(r["sent_bytes"] for r in references if "file_uri" not in r)
+        metadata["request"] = {"bytes_per_attempt": bytes_per_attempt, "bytes_sent": 0}
+        if references:
+            metadata["request"]["references"] = references
 
         # Configure generation parameters
         # Note: Flash model doesn't support imageSize, only aspectRatio
@@ -162,100 +293,509 @@ class GeminiImageCLI:
                 )
             )
 
+        # Answer identical earlier requests from the response cache
+        cache_key = None
+        if self.cache is not None:
+            try:
+                cache_key = self.cache.key(model, prompt, aspect_ratio, resolution if use_pro else None, images or [],
+                                           variant=variant, references=self.references.settings())
+                cached = self.cache.get(cache_key)
+            except (OSError, sqlite3.Error) as e:
+                self._log(f"Warning: response cache unavailable ({e})")
+                cache_key, cached = None, None
+
+            metadata["cache"] = {"hit": cached is not None, "key": cache_key[:16] if cache_key else None}
+            if self.cache.refresh:
+                metadata["cache"]["refreshed"] = True
+            if cached is not None:
+                return self._generate_from_cache(cached, output, save_metadata, metadata)
+
+        # Per-attempt deadline: the HTTP client cancels a hung call, which is then retried
+        if self.timeout:
+            config.http_options = types.HttpOptions(timeout=int(self.timeout * 1000))
+
         # Attempt generation with retries
         for attempt in range(max_retries):
+            self._log(f"\nGenerating image (attempt {attempt + 1}/{max_retries})...")
+            metadata["request"]["bytes_sent"] = bytes_per_attempt * (attempt + 1)
+            metadata["generation"] = {"attempts": attempt + 1}
+            received: Dict[str, Any] = {}
+            start_time = time.time()
             try:
-                print(f"\nGenerating image (attempt {attempt + 1}/{max_retries})...")
-                start_time = time.time()
+                with self.scheduler.slot():
+                    start_time = time.time()
+                    if self.stream:
+                        self._receive_stream(model, contents, config, output, metadata, received, start_time)
+                    else:
+                        response = self.client.models.generate_content(
+                            model=model,
+                            contents=contents,
+                            config=config
+                        )
+                        received["usage"] = getattr(response, "usage_metadata", None)
+                        for part in response.candidates[0].content.parts:
+                            self._receive_part(part, output, metadata, received)
 
-                response = self.client.models.generate_content(
-                    model=model,
-                    contents=contents,
-                    config=config
-                )
+            except Exception as e:
+                error_msg = str(e) or type(e).__name__
+                if "image" in received:
+                    # The stream broke after the image arrived: keep it
+                    self._log(f"Warning: response interrupted after the image was saved ({error_msg})")
+                    metadata["generation"]["interrupted"] = error_msg
+                else:
+                    self._log(f"Error: {error_msg}")
+                    metadata["error"] = error_msg
+
+                    # Rate limits, timeouts and transient failures are retried;
+                    # bad requests, auth errors and local failures are not
+                    kind, retry_after = classify_error(e)
+                    if kind == FATAL:
+                        self._log("Not retrying (non-retryable error)")
+                        return False, metadata
+                    if attempt == max_retries - 1:
+                        self._log(f"Failed after {max_retries} attempts")
+                        return False, metadata
+
+                    wait_time = self.scheduler.backoff(attempt, retry_after)
+                    reason = "Rate limited" if kind == RATE_LIMITED else "Transient error"
+                    self._log(f"{reason}. Waiting {wait_time:.1f}s before retry...")
+                    time.sleep(wait_time)
+                    continue
+
+            elapsed = time.time() - start_time
+            self._log(f"Generation completed in {elapsed:.1f}s")
+            metadata["generation"]["elapsed_seconds"] = round(elapsed, 2)
 
-                elapsed = time.time() - start_time
-                print(f"Generation completed in {elapsed:.1f}s")
+            if "image" not in received:
+                self._log("Warning: No image data found in response")
+                metadata["error"] = "No image data in response"
+                self._save_metadata(metadata, output)
+                return False, metadata
 
-                # Extract and save the generated image
-                image_saved = False
-                metadata["generation"] = {
-                    "elapsed_seconds": round(elapsed, 2),
-                    "attempts": attempt + 1,
+            metadata.pop("error", None)  # from an earlier failed attempt
+
+            # Collect token usage if available
+            usage = received.get("usage")
+            if usage is not None:
+                metadata["usage"] = {
+                    "input_tokens": usage.prompt_token_count,
+                    "output_tokens": usage.candidates_token_count,
+                    "total_tokens": usage.total_token_count,
                 }
+                self._log(f"\nToken usage:")
+                self._log(f"  Input: {usage.prompt_token_count}")
+                self._log(f"  Output: {usage.candidates_token_count}")
+                self._log(f"  Total: {usage.total_token_count}")
 
-                for part in response.candidates[0].content.parts:
-                    if part.text is not None:
-                        print(f"\nModel description: {part.text}")
-                        metadata["model_description"] = part.text
-
-                    elif part.inline_data is not None:
-                        # Save the image
-                        image = Image.open(BytesIO(part.inline_data.data))
-
-                        # Ensure output directory exists
-                        output_path = Path(output)
-                        output_path.parent.mkdir(parents=True, exist_ok=True)
-
-                        image.save(output)
-                        print(f"\n✓ Image saved to: {output}")
-                        print(f"  Size: {image.size[0]}x{image.size[1]} pixels")
-
-                        metadata["output"] = {
-                            "file": output,
-                            "width": image.size[0],
-                            "height": image.size[1],
-                            "format": output_path.suffix.lstrip('.').upper(),
-                        }
-                        image_saved = True
-
-                if not image_saved:
-                    print("Warning: No image data found in response")
-                    metadata["error"] = "No image data in response"
-                    self._save_metadata(metadata, output)
-                    return False
-
-                # Collect token usage if available
-                if hasattr(response, 'usage_metadata'):
-                    usage = response.usage_metadata
-                    metadata["usage"] = {
-                        "input_tokens": usage.prompt_token_count,
-                        "output_tokens": usage.candidates_token_count,
-                        "total_tokens": usage.total_token_count,
-                    }
-                    print(f"\nToken usage:")
-                    print(f"  Input: {usage.prompt_token_count}")
-                    print(f"  Output: {usage.candidates_token_count}")
-                    print(f"  Total: {usage.total_token_count}")
-
-                # Save metadata file
-                if save_metadata:
-                    metadata_path = self._save_metadata(metadata, output)
-                    print(f"✓ Metadata saved to: {metadata_path}")
-
-                return True
+            if cache_key:
+                image_part = received["image"]
+                try:
+                    self.cache.put(cache_key, image_part.data, image_part.mime_type,
+                                   metadata.get("model_description"), metadata.get("usage"))
+                except (OSError, sqlite3.Error) as e:
+                    self._log(f"Warning: could not store response in cache ({e})")
+
+            # Save metadata file
+            if save_metadata:
+                metadata_path = self._save_metadata(metadata, output)
+                self._log(f"✓ Metadata saved to: {metadata_path}")
+
+            return True, metadata
+
+        return False, metadata
+
+    def _receive_part(
+        self,
+        part: Any,
+        output: str,
+        metadata: Dict[str, Any],
+        received: Dict[str, Any]
+    ) -> None:
+        """Handle one response part: log the model's text or save the image."""
+        if part.text is not None:
+            self._log(f"\nModel description: {part.text}")
+            metadata["model_description"] = part.text
+
+        elif part.inline_data is not None:
+            # Save the image
+            self._save_image(part.inline_data.data, output, metadata)
+            received["image"] = part.inline_data
+
+    def _receive_stream(
+        self,
+        model: str,
+        contents: List[Any],
+        config: Any,
+        output: str,
+        metadata: Dict[str, Any],
+        received: Dict[str, Any],
+        start_time: float
+    ) -> None:
+        """
+        Consume a streamed response: text is printed as it arrives and the
+        image saved as soon as its part is complete. Records time to first
+        chunk and to the image in metadata["generation"].
+        """
+        timing = metadata["generation"]
+        text = []
+        stream = self.client.models.generate_content_stream(model=model, contents=contents, config=config)
+        for chunk in stream:
+            now = time.time() - start_time
+            timing.setdefault("ttfb_seconds", round(now, 2))
+            if self.timeout and now > self.timeout and "image" not in received:
+                raise TimeoutError(f"No image within the {self.timeout:g}s deadline")
+
+            if chunk.usage_metadata is not None:
+                received["usage"] = chunk.usage_metadata
+            candidate = chunk.candidates[0] if chunk.candidates else None
+            for part in (candidate.content.parts if candidate and candidate.content else None) or []:
+                if part.text is not None:
+                    if not text:
+                        self._log(f"\nModel description ({now:.1f}s):")
+                    self._log(f"  {part.text.strip()}")
+                    text.append(part.text)
+                    metadata["model_description"] = "".join(text)
+
+                elif part.inline_data is not None:
+                    self._save_image(part.inline_data.data, output, metadata)
+                    received["image"] = part.inline_data
+                    timing["image_seconds"] = round(time.time() - start_time, 2)
+                    self._log(f"  Image received after {timing['image_seconds']:.1f}s")
+
+    def _generate_from_cache(
+        self,
+        cached: Dict[str, Any],
+        output: str,
+        save_metadata: bool,
+        metadata: Dict[str, Any]
+    ) -> Tuple[bool, Dict[str, Any]]:
+        """Finish a generation from a cached response (no API call)."""
+        age = time.time() - cached["created"]
+        self._log(f"\nCache hit (response from {age / 60:.0f} min ago, no API call)")
+        metadata["cache"]["cached_at"] = datetime.fromtimestamp(cached["created"], timezone.utc).isoformat()
+        metadata["cache"]["age_seconds"] = round(age)
+        metadata["generation"] = {"elapsed_seconds": 0.0, "attempts": 0}
+        if cached["description"] is not None:
+            self._log(f"\nModel description: {cached['description']}")
+            metadata["model_description"] = cached["description"]
+
+        self._save_image(cached["data"], output, metadata)
+        if cached["usage"]:
+            # Tokens of the original call; nothing was billed for this one
+            metadata["usage"] = cached["usage"]
+
+        if save_metadata:
+            metadata_path = self._save_metadata(metadata, output)
+            self._log(f"✓ Metadata saved to: {metadata_path}")
+        return True, metadata
+
+    def _generate_item(self, item: Dict[str, Any], total: int) -> Dict[str, Any]:
+        """Run one batch item with a log prefix; returns its report entry."""
+        index = item["batch"]["index"]
+        self._local.prefix = f"[{index}/{total}] "
+        started = time.time()
+        try:
+            success, metadata = self._generate(**item)
+        except Exception as e:  # keep the batch going
+            self._log(f"Error: {e}")
+            success, metadata = False, {"error": str(e)}
+        finally:
+            self._local.prefix = ""
+
+        entry: Dict[str, Any] = {
+            "index": index,
+            "output": item["output"],
+            "status": "ok" if success else "failed",
+            "seconds": round(time.time() - started, 2),
+            "attempts": metadata.get("generation", {}).get("attempts"),
+        }
+        if metadata.get("cache", {}).get("hit"):
+            entry["cached"] = True
+        if not success:
+            entry["error"] = metadata.get("error", "unknown error")
+        return entry
+
+    def generate_batch(
+        self,
+        items: List[Dict[str, Any]],
+        concurrency: int = 4,
+        manifest: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate manifest items concurrently on a thread pool sharing this client.
+
+        Args:
+            items: Normalized items from load_manifest()
+            concurrency: Maximum number of requests in flight
+            manifest: Manifest path (for the report)
+
+        Returns:
+            Summary report dict (per-item status in input order)
+        """
+        total = len(items)
+        concurrency = max(1, min(concurrency, total))
+        print(f"Batch: {total} item(s), concurrency {concurrency}")
+
+        started_at = datetime.now(timezone.utc).isoformat()
+        start = time.time()
+        entries = []
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(self._generate_item, item, total) for item in items]
+            try:
+                for future in as_completed(futures):
+                    entries.append(future.result())
+            except KeyboardInterrupt:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        entries.sort(key=lambda e: e["index"])
+        succeeded = sum(1 for e in entries if e["status"] == "ok")
+        return {
+            "manifest": manifest,
+            "started_at": started_at,
+            "wall_seconds": round(time.time() - start, 2),
+            "concurrency": concurrency,
+            "scheduler": self.scheduler.stats(),
+            "total": total,
+            "succeeded": succeeded,
+            "failed": total - succeeded,
+            "cache_hits": sum(1 for e in entries if e.get("cached")),
+            "items": entries,
+        }
+
+    def _generate_variant(self, index: int, total: int, params: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
+        """Run one variant with a log prefix; measures its quality on success."""
+        self._local.prefix = f"[{index}/{total}] "
+        try:
+            success, metadata = self._generate(**params, save_metadata=False, batch=None, variant=index)
+            metadata["variant"]["of"] = total
+            if success and quality_metrics is not None:
+                with Image.open(params["output"]) as img:
+                    metadata["quality"] = quality_metrics(img)
+        except Exception as e:  # keep the other variants going
+            self._log(f"Error: {e}")
+            success, metadata = False, {"error": str(e), "variant": {"index": index}}
+        finally:
+            self._local.prefix = ""
+        return success, metadata
+
+    def generate_variants(
+        self,
+        variants: int,
+        keep: Optional[int] = None,
+        output: str = "output.png",
+        save_metadata: bool = True,
+        concurrency: Optional[int] = None,
+        **params: Any
+    ) -> Dict[str, Any]:
+        """
+        Generate N variants of one request concurrently and rank them.
+
+        Variant i is written to <stem>_i<suffix>. Successful variants are ranked
+        by quality_metrics() from the manipulate-image skill (best first); with
+        keep, only the top K images and their metadata remain on disk.
+
+        Args:
+            variants: Number of images to generate
+            keep: Keep only this many best variants (None: keep all)
+            output: Output path the variant paths derive from
+            save_metadata: Save a metadata YAML per kept variant
+            concurrency: Maximum number of requests in flight (default: variants)
+            **params: generate_image() parameters (prompt, images, aspect_ratio, ...)
+
+        Returns:
+            Summary report dict (variants in index order)
+        """
+        base = Path(output)
+        outputs = [str(base.with_name(f"{base.stem}_{i}{base.suffix}")) for i in range(1, variants + 1)]
+        concurrency = max(1, min(concurrency or variants, variants))
+        print(f"Variants: {variants}, concurrency {concurrency}" + (f", keeping best {keep}" if keep else ""))
+        if keep and quality_metrics is None:
+            print("Warning: manipulate-image skill not found; variants are not ranked, keeping all")
+            keep = None
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [pool.submit(self._generate_variant, i, variants, dict(params, output=path))
+                       for i, path in enumerate(outputs, 1)]
+            try:
+                results = [future.result() for future in futures]
+            except KeyboardInterrupt:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        scores = rank_by_quality([m.get("quality") if ok else None for ok, m in results])
+        ranked = sorted((i for i, score in enumerate(scores) if score is not None), key=lambda i: -scores[i])
+        for rank, i in enumerate(ranked, 1):
+            results[i][1]["variant"].update(rank=rank, score=round(scores[i], 3))
+
+        entries = []
+        for i, ((success, metadata), path) in enumerate(zip(results, outputs)):
+            entry: Dict[str, Any] = {"index": i + 1, "output": path, "status": "ok" if success else "failed"}
+            if success:
+                rank = metadata["variant"].get("rank")
+                kept = keep is None or (rank is not None and rank <= keep)
+                metadata["variant"]["kept"] = kept
+                entry.update(rank=rank, score=metadata["variant"].get("score"), kept=kept)
+                if metadata.get("quality"):
+                    entry["quality"] = metadata["quality"]
+                if not kept:
+                    os.remove(path)
+                elif save_metadata:
+                    self._save_metadata(metadata, path)
+            else:
+                entry["error"] = metadata.get("error", "unknown error")
+            entries.append(entry)
+
+        succeeded = sum(1 for ok, _ in results if ok)
+        return {
+            "prompt": params.get("prompt"),
+            "wall_seconds": round(time.time() - start, 2),
+            "concurrency": concurrency,
+            "scheduler": self.scheduler.stats(),
+            "total": variants,
+            "succeeded": succeeded,
+            "failed": variants - succeeded,
+            "kept": [e["output"] for e in sorted(entries, key=lambda e: e.get("rank") or variants + e["index"])
+                     if e.get("kept")],
+            "items": entries,
+        }
 
-            except Exception as e:
-                error_msg = str(e)
-                print(f"Error: {error_msg}")
-
-                # Check if it's a rate limit error
-                if "429" in error_msg or "rate limit" in error_msg.lower():
-                    if attempt < max_retries - 1:
-                        wait_time = (2 ** attempt) + 1
-                        print(f"Rate limited. Waiting {wait_time}s before retry...")
-                        time.sleep(wait_time)
-                        continue
-
-                # For other errors, don't retry
-                if attempt < max_retries - 1:
-                    print(f"Retrying...")
-                    time.sleep(1)
-                else:
-                    print(f"Failed after {max_retries} attempts")
-                    return False
 
-        return False
+# Quality metrics used to rank variants (all: higher is better)
+QUALITY_METRICS = ("sharpness", "contrast", "histogram_spread", "entropy")
+
+
+def rank_by_quality(qualities: List[Optional[Dict[str, Any]]]) -> List[Optional[float]]:
+    """
+    Score candidates by their quality_metrics() relative to each other.
+
+    Each metric is turned into a percentile rank among the candidates (0 worst,
+    1 best, ties share) and the score is the mean over QUALITY_METRICS plus
+    pixel count, so no metric dominates by scale. None entries score None.
+    """
+    present = [q for q in qualities if q]
+    if not present:
+        return [None] * len(qualities)
+
+    def value(q: Dict[str, Any], metric: str) -> float:
+        return q["width"] * q["height"] if metric == "pixels" else q[metric]
+
+    metrics = QUALITY_METRICS + ("pixels",)
+    scores: List[Optional[float]] = []
+    for q in qualities:
+        if not q:
+            scores.append(None)
+            continue
+        total = 0.0
+        for metric in metrics:
+            v = value(q, metric)
+            below = sum(1 for other in present if value(other, metric) < v)
+            equal = sum(1 for other in present if value(other, metric) == v) - 1
+            total += (below + equal / 2) / max(1, len(present) - 1)
+        scores.append(total / len(metrics))
+    return scores
+
+
+# Manifest item keys (generate_image() parameters, CLI-style names)
+MANIFEST_KEYS = {
+    "prompt", "images", "aspect_ratio", "resolution", "output", "fast",
+    "retries", "user_request", "composition",
+}
+
+
+def _read_manifest_entries(path: str) -> List[Any]:
+    """Raw entries from a JSONL file or a YAML list (or {items: [...]})."""
+    with open(path) as f:
+        text = f.read()
+    if path.endswith(".jsonl"):
+        entries = []
+        for n, line in enumerate(text.splitlines(), 1):
+            if line.strip():
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{n}: invalid JSON: {e}")
+        return entries
+
+    data = yaml.safe_load(text)
+    if isinstance(data, dict):
+        data = data.get("items")
+    if not isinstance(data, list):
+        raise ValueError(f"{path}: expected a list of items (or an 'items:' list)")
+    return data
+
+
+def load_manifest(path: str, defaults: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Read and validate a batch manifest.
+
+    Relative image and output paths are resolved against the manifest's
+    directory; items without an output get <manifest-name>/item-NNN.png.
+    defaults supplies aspect_ratio, resolution, fast, retries and
+    save_metadata for items that don't set them.
+
+    Returns:
+        List of keyword-argument dicts for GeminiImageCLI._generate()
+
+    Raises:
+        ValueError: listing every invalid item
+    """
+    entries = _read_manifest_entries(path)
+    base = Path(path).parent
+    stem = Path(path).stem
+    items, errors, outputs = [], [], {}
+
+    for n, raw in enumerate(entries, 1):
+        if not isinstance(raw, dict):
+            errors.append(f"item {n}: expected a mapping, got {type(raw).__name__}")
+            continue
+        raw = {k.replace("-", "_"): v for k, v in raw.items()}
+        unknown = sorted(set(raw) - MANIFEST_KEYS)
+        if unknown:
+            errors.append(f"item {n}: unknown key(s) {', '.join(unknown)}")
+        if not raw.get("prompt"):
+            errors.append(f"item {n}: missing prompt")
+
+        aspect_ratio = raw.get("aspect_ratio", defaults["aspect_ratio"])
+        if isinstance(aspect_ratio, int):
+            # Unquoted 16:9 in YAML 1.1 is the base-60 integer 969
+            aspect_ratio = f"{aspect_ratio // 60}:{aspect_ratio % 60}"
+        if aspect_ratio not in GeminiImageCLI.ASPECT_RATIOS:
+            errors.append(f"item {n}: unsupported aspect_ratio {aspect_ratio!r}")
+        resolution = raw.get("resolution", defaults["resolution"])
+        if resolution not in GeminiImageCLI.RESOLUTIONS:
+            errors.append(f"item {n}: unsupported resolution {resolution!r}")
+
+        images = raw.get("images") or []
+        if isinstance(images, str):
+            images = [images]
+        output = str(base / (raw.get("output") or f"{stem}/item-{n:03d}.png"))
+        if output in outputs:
+            errors.append(f"item {n}: output {output} already used by item {outputs[output]}")
+        outputs.setdefault(output, n)
+
+        items.append({
+            "prompt": raw.get("prompt"),
+            "images": [str(base / p) for p in images],
+            "aspect_ratio": aspect_ratio,
+            "resolution": resolution,
+            "output": output,
+            "use_pro": not raw.get("fast", defaults["fast"]),
+            "max_retries": int(raw.get("retries", defaults["retries"])),
+            "save_metadata": defaults["save_metadata"],
+            "user_request": raw.get("user_request"),
+            "composition": raw.get("composition"),
+            "batch": {"manifest": path, "index": n},
+        })
+
+    if errors:
+        raise ValueError(f"invalid manifest {path}:\n  " + "\n  ".join(errors))
+    if not items:
+        raise ValueError(f"{path}: no items")
+    return items
 
 
 def create_parser() -> argparse.ArgumentParser:
@@ -279,13 +819,20 @@ Examples:
 
   # Multi-image fusion
   python image_gen.py "Combine these into a collage" --images img1.jpg img2.jpg img3.jpg
+
+  # Batch: one JSONL/YAML item per image, 8 requests in flight
+  python image_gen.py --batch campaign.jsonl --concurrency 8
+
+  # Try a manifest without network access or API key
+  python image_gen.py --batch campaign.jsonl --offline
         """
     )
 
     parser.add_argument(
         "prompt",
         type=str,
-        help="Text prompt describing the image to generate or edit"
+        nargs="?",
+        help="Text prompt describing the image to generate or edit (omit with --batch)"
     )
 
     parser.add_argument(
@@ -354,6 +901,100 @@ Examples:
         help="Reasoning/composition notes explaining prompt choices (for metadata)"
     )
 
+    parser.add_argument(
+        "--batch",
+        metavar="MANIFEST",
+        help="Generate every item of a JSONL or YAML manifest concurrently"
+    )
+
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Maximum concurrent requests (default: 4 for --batch, N for --variants N)"
+    )
+
+    parser.add_argument(
+        "--rpm",
+        type=float,
+        metavar="N",
+        help="Cap on requests started per minute (default: no cap; 429s still back off)"
+    )
+
+    parser.add_argument(
+        "--variants",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Generate N variants of the prompt concurrently (output_1..N), ranked by quality"
+    )
+
+    parser.add_argument(
+        "--keep",
+        type=int,
+        metavar="K",
+        help="With --variants: keep only the K best-ranked variants"
+    )
+
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream the response: show the model's text as it arrives, save the image as soon as it is complete"
+    )
+
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        metavar="SECONDS",
+        help=f"Per-attempt deadline; a call exceeding it is cancelled and retried, 0 for none (default: {DEFAULT_TIMEOUT:g})"
+    )
+
+    parser.add_argument(
+        "--max-image-edge",
+        type=int,
+        default=DEFAULT_MAX_EDGE,
+        metavar="PX",
+        help=f"Downscale reference images to this longest edge before sending, 0 to send as-is (default: {DEFAULT_MAX_EDGE})"
+    )
+
+    parser.add_argument(
+        "--upload-images",
+        action="store_true",
+        help="Upload reference images once via the Files API and reuse them across calls"
+    )
+
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Reuse responses of identical earlier requests (or set IMAGE_GEN_CACHE=1)"
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable the response cache, even if IMAGE_GEN_CACHE=1"
+    )
+
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Call the API even on a cache hit and replace the cached response"
+    )
+
+    parser.add_argument(
+        "--report",
+        metavar="PATH",
+        help="Summary report path (default: <manifest>_report.yaml, or <output>_variants.yaml with --variants)"
+    )
+
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Use a local fake client (placeholder images, no API key or network)"
+    )
+
     return parser
 
 
@@ -362,8 +1003,95 @@ def main():
     parser = create_parser()
     args = parser.parse_args()
 
+    if args.batch and args.prompt:
+        parser.error("give either a prompt or --batch, not both")
+    if not args.batch and not args.prompt:
+        parser.error("a prompt is required (or --batch MANIFEST)")
+    if args.variants < 1:
+        parser.error("--variants must be at least 1")
+    if args.batch and args.variants > 1:
+        parser.error("--variants cannot be combined with --batch")
+    if args.keep is not None and not 1 <= args.keep <= args.variants:
+        parser.error("--keep must be between 1 and --variants")
+
+    items = None
+    if args.batch:
+        defaults = {
+            "aspect_ratio": args.aspect_ratio,
+            "resolution": args.resolution,
+            "fast": args.fast,
+            "retries": args.retries,
+            "save_metadata": not args.no_metadata,
+        }
+        try:
+            items = load_manifest(args.batch, defaults)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
     # Initialize the CLI
-    cli = GeminiImageCLI(api_key=args.api_key)
+    client = None
+    if args.offline:
+        from fake_client import FakeClient
+        client = FakeClient()
+    parallel = items is not None or args.variants > 1
+    # Variants all run at once by default, so N of them take about as long as one
+    concurrency = args.concurrency or (4 if items is not None else args.variants)
+    scheduler = Scheduler(max_concurrency=concurrency if parallel else 1, rpm=args.rpm)
+    cache = None
+    if (args.cache or args.refresh or response_cache.enabled_by_env()) and not args.no_cache:
+        cache = ResponseCache(refresh=args.refresh, namespace="offline" if args.offline else "gemini")
+    references = ReferenceStore(args.max_image_edge, upload=args.upload_images)
+    cli = GeminiImageCLI(api_key=args.api_key, client=client, scheduler=scheduler, cache=cache,
+                         references=references, stream=args.stream, timeout=args.timeout or None)
+
+    if items is not None:
+        report = cli.generate_batch(items, concurrency=concurrency, manifest=args.batch)
+        manifest = Path(args.batch)
+        report_path = args.report or str(manifest.parent / f"{manifest.stem}_report.yaml")
+        with open(report_path, "w") as f:
+            yaml.dump(report, f, default_flow_style=False, sort_keys=False, allow_unicode=True)
+
+        print(f"\nBatch complete: {report['succeeded']}/{report['total']} succeeded, "
+              f"{report['failed']} failed in {report['wall_seconds']:.1f}s")
+        for entry in report["items"]:
+            if entry["status"] != "ok":
+                print(f"  ✗ [{entry['index']}] {entry['output']}: {entry['error']}")
+        print(f"✓ Report saved to: {report_path}")
+        sys.exit(0 if report["failed"] == 0 else 1)
+
+    if args.variants > 1:
+        report = cli.generate_variants(
+            args.variants,
+            keep=args.keep,
+            output=args.output,
+            save_metadata=not args.no_metadata,
+            concurrency=concurrency,
+            prompt=args.prompt,
+            images=args.images,
+            aspect_ratio=args.aspect_ratio,
+            resolution=args.resolution,
+            use_pro=not args.fast,
+            max_retries=args.retries,
+            user_request=args.user_request,
+            composition=args.composition
+        )
+        output = Path(args.output)
+        report_path = args.report or str(output.parent / f"{output.stem}_variants.yaml")
+        with open(report_path, "w") as f:
+            yaml.dump(report, f, default_flow_style=False, sort_keys=False, allow_unicode=True)
+
+        print(f"\nVariants complete: {report['succeeded']}/{report['total']} succeeded "
+              f"in {report['wall_seconds']:.1f}s")
+        for entry in sorted(report["items"], key=lambda e: e.get("rank") or report["total"] + e["index"]):
+            if entry["status"] != "ok":
+                print(f"  ✗ {entry['output']}: {entry['error']}")
+            else:
+                rank = f"#{entry['rank']}" if entry["rank"] else "-"
+                state = "kept" if entry["kept"] else "removed"
+                print(f"  {rank:<4} {entry['output']} (score {entry['score']}, {state})")
+        print(f"✓ Report saved to: {report_path}")
+        sys.exit(0 if report["succeeded"] else 1)
 
     # Generate the image
     # Fast mode uses gemini-2.5-flash-image (faster, fixed ~1K resolution)
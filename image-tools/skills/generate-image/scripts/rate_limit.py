@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Client-side rate limiting and retry scheduling for Gemini calls.
+
+One Scheduler is shared by every generation in a process (all items of a
+--batch), so they back off together instead of retrying in lockstep:
+
+- AIMD concurrency: the number of requests in flight grows by about one per
+  window of successes and halves on a rate limit (at most once per
+  cool-down), between 1 and the configured maximum.
+- Optional token bucket (--rpm) caps requests started per minute.
+- A rate limit carrying a retry hint (Retry-After header or RetryInfo
+  retryDelay) pauses all new requests until it has passed.
+- Retry delays use exponential backoff with full jitter.
+
+classify_error() sorts exceptions into rate-limited, transient (retry) and
+fatal (give up immediately).
+"""
+
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from google.genai import errors as genai_errors
+except ImportError:  # classify_error() then only sees generic exceptions
+    genai_errors = None
+
+RATE_LIMITED = "rate_limited"
+TRANSIENT = "transient"
+FATAL = "fatal"
+
+# HTTP codes worth retrying besides 429
+_TRANSIENT_CODES = {408, 500, 502, 503, 504}
+
+# Exception class names (any module) that mean the request never completed
+_TRANSIENT_NAMES = {
+    "TimeoutException", "ConnectTimeout", "ReadTimeout", "WriteTimeout", "PoolTimeout",
+    "ConnectError", "ReadError", "RemoteProtocolError", "TimeoutError",
+    "ConnectionError", "ConnectionResetError", "ConnectionAbortedError",
+}
+
+
+def _parse_delay(value: Any) -> Optional[float]:
+    """Seconds from a Retry-After value or a protobuf duration such as '12.5s'."""
+    if value is None:
+        return None
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*s?\s*", str(value))
+    return float(match.group(1)) if match else None
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    """Server-provided retry delay of an API error, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        delay = _parse_delay(headers.get("retry-after"))
+        if delay is not None:
+            return delay
+
+    details = getattr(exc, "details", None)
+    if isinstance(details, dict):
+        details = details.get("error", details).get("details")
+    for detail in details if isinstance(details, list) else []:
+        if isinstance(detail, dict) and "retryDelay" in detail:
+            return _parse_delay(detail["retryDelay"])
+    return None
+
+
+def classify_error(exc: Exception) -> Tuple[str, Optional[float]]:
+    """
+    Classify an exception from a Gemini call.
+
+    Returns:
+        (RATE_LIMITED | TRANSIENT | FATAL, retry delay hint in seconds or None)
+    """
+    code = getattr(exc, "code", None)
+    if (genai_errors is not None and isinstance(exc, genai_errors.APIError)) or isinstance(code, int):
+        if code == 429 or getattr(exc, "status", None) == "RESOURCE_EXHAUSTED":
+            return RATE_LIMITED, _retry_after(exc)
+        if code in _TRANSIENT_CODES or (isinstance(code, int) and code >= 500):
+            return TRANSIENT, _retry_after(exc)
+        return FATAL, None
+
+    for cls in type(exc).__mro__:
+        if cls.__name__ in _TRANSIENT_NAMES:
+            return TRANSIENT, None
+    return FATAL, None
+
+
+class Scheduler:
+    """
+    Thread-safe AIMD concurrency limiter, token bucket and backoff policy.
+
+    Args:
+        max_concurrency: Upper bound (and starting value) for requests in flight
+        rpm: Optional cap on requests started per minute
+        base_delay: Backoff base in seconds
+        max_delay: Backoff cap in seconds
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        rpm: Optional[float] = None,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = float(self.max_concurrency)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.rate = rpm / 60.0 if rpm else None
+        self.tokens = float(self.max_concurrency)
+        self._refilled = time.monotonic()
+
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._last_decrease = float("-inf")
+        self._cond = threading.Condition()
+        self.counts = {"requests": 0, "ok": 0, RATE_LIMITED: 0, TRANSIENT: 0, FATAL: 0}
+
+    # ─── Admission ───────────────────────────────────────────────────────────
+
+    def _refill(self, now: float) -> None:
+        if self.rate:
+            self.tokens = min(float(self.max_concurrency), self.tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _wait_time(self, now: float) -> Optional[float]:
+        """Seconds to wait before a request may start, 0 if now, None if blocked on a slot."""
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= int(self.limit):
+            return None
+        if self.rate and self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        return 0.0
+
+    def acquire(self) -> None:
+        """Block until the limiter admits one more request."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._wait_time(now)
+                if wait == 0.0:
+                    break
+                self._cond.wait(wait)
+            self.in_flight += 1
+            if self.rate:
+                self.tokens -= 1
+            self.counts["requests"] += 1
+
+    def release(self, outcome: str, retry_after: Optional[float] = None) -> None:
+        """Record a finished request: "ok" or a classify_error() kind."""
+        with self._cond:
+            self.in_flight -= 1
+            self.counts[outcome] += 1
+            now = time.monotonic()
+            if outcome == "ok":
+                # Additive increase: about +1 after `limit` successes
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            elif outcome == RATE_LIMITED:
+                # Multiplicative decrease, once per cool-down so a burst of
+                # 429s from requests already in flight counts as one signal
+                if now - self._last_decrease >= max(self.base_delay, retry_after or 0.0):
+                    self.limit = max(1.0, self.limit / 2)
+                    self._last_decrease = now
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """Hold one admission for the duration of a request, recording its outcome."""
+        self.acquire()
+        outcome, retry_after = "ok", None
+        try:
+            yield
+        except Exception as e:
+            outcome, retry_after = classify_error(e)
+            raise
+        finally:
+            self.release(outcome, retry_after)
+
+    # ─── Backoff ─────────────────────────────────────────────────────────────
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Delay before retry number attempt + 1 (attempt counts from 0).
+
+        Full jitter over an exponential window; with a server hint the delay
+        is the hint plus up to one base delay of jitter.
+        """
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt + 1)))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return dict(self.counts, concurrency_limit=round(self.limit, 2),
+                        max_concurrency=self.max_concurrency)
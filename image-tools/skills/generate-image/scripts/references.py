@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Reference image preparation for Gemini requests.
+
+Reference images (--images) are turned into request parts once per content
+hash and reused by every retry attempt and every batch item that names the
+same picture:
+
+- Images larger than the max edge are downscaled (JPEGs decode at reduced
+  size) and re-encoded: JPEG, or PNG when there is transparency.
+- Images that are already small enough, in a format the API accepts, are
+  sent as their original bytes without decoding.
+- With uploads enabled the payload goes to the Files API once and later
+  requests only reference its URI.
+"""
+
+import hashlib
+import os
+import threading
+from io import BytesIO
+from typing import Any, Dict, Optional, Tuple
+
+from google.genai import types
+from PIL import Image, ImageOps
+
+# Longest edge sent by default; the model works at lower resolutions internally
+DEFAULT_MAX_EDGE = 2048
+
+# Formats forwarded unchanged when they need no downscaling
+_PASSTHROUGH = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+JPEG_QUALITY = 90
+
+
+class PreparedReference:
+    """One reference image as sent: payload bytes plus what was done to them."""
+
+    def __init__(self, sha256: str, data: bytes, mime_type: str, original_bytes: int,
+                 original_size: Tuple[int, int], size: Tuple[int, int], reencoded: bool):
+        self.sha256 = sha256
+        self.data = data
+        self.mime_type = mime_type
+        self.original_bytes = original_bytes
+        self.original_size = original_size
+        self.size = size
+        self.reencoded = reencoded
+        self.file_uri: Optional[str] = None
+
+    def part(self) -> types.Part:
+        if self.file_uri:
+            return types.Part.from_uri(file_uri=self.file_uri, mime_type=self.mime_type)
+        return types.Part.from_bytes(data=self.data, mime_type=self.mime_type)
+
+    def describe(self) -> Dict[str, Any]:
+        """Summary for the metadata YAML."""
+        info: Dict[str, Any] = {
+            "original_bytes": self.original_bytes,
+            "sent_bytes": len(self.data),
+            "original_size": "{}x{}".format(*self.original_size),
+            "sent_size": "{}x{}".format(*self.size),
+            "reencoded": self.reencoded,
+        }
+        if self.file_uri:
+            info["file_uri"] = self.file_uri
+        return info
+
+
+def _encode(data: bytes, max_edge: int) -> Tuple[bytes, str, Tuple[int, int], Tuple[int, int]]:
+    """Payload for image bytes: (data, mime type, original size, sent size)."""
+    image = Image.open(BytesIO(data))
+    original_size = image.size
+    oriented = image.getexif().get(0x0112, 1) == 1
+    fits = not max_edge or max(image.size) <= max_edge
+    if fits and oriented and image.format in _PASSTHROUGH:
+        return data, _PASSTHROUGH[image.format], original_size, original_size
+
+    if max_edge:
+        image.draft("RGB", (max_edge, max_edge))
+    image = ImageOps.exif_transpose(image)
+    if max_edge and max(image.size) > max_edge:
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+    buf = BytesIO()
+    if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+        image.save(buf, format="PNG")
+        mime_type = "image/png"
+    else:
+        image.convert("RGB").save(buf, format="JPEG", quality=JPEG_QUALITY)
+        mime_type = "image/jpeg"
+    return buf.getvalue(), mime_type, original_size, image.size
+
+
+class ReferenceStore:
+    """
+    Prepared reference images by content hash, shared by all requests of a process.
+
+    Args:
+        max_edge: Longest edge in pixels (0: never downscale)
+        upload: Upload payloads with the Files API instead of sending them inline
+    """
+
+    def __init__(self, max_edge: int = DEFAULT_MAX_EDGE, upload: bool = False):
+        self.max_edge = max_edge
+        self.upload = upload
+        self._prepared: Dict[str, PreparedReference] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def settings(self) -> Dict[str, Any]:
+        """The options that change the bytes sent for a reference (response cache key)."""
+        return {"max_edge": self.max_edge, "upload": self.upload}
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, path: str, client: Any) -> PreparedReference:
+        """Prepared reference for an image file (prepared and uploaded at most once)."""
+        with open(path, "rb") as f:
+            data = f.read()
+        sha256 = hashlib.sha256(data).hexdigest()
+
+        # Concurrent batch items naming the same picture wait for one preparation
+        with self._key_lock(sha256):
+            ref = self._prepared.get(sha256)
+            if ref is None:
+                payload, mime_type, original_size, size = _encode(data, self.max_edge)
+                ref = PreparedReference(sha256, payload, mime_type, len(data), original_size, size,
+                                        reencoded=payload is not data)
+                if self.upload:
+                    uploaded = client.files.upload(
+                        file=BytesIO(payload),
+                        config=types.UploadFileConfig(mime_type=mime_type, display_name=os.path.basename(path)))
+                    ref.file_uri = uploaded.uri
+                self._prepared[sha256] = ref
+        return ref
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Opt-in local cache of Gemini image responses.
+
+Entries are keyed by a canonical hash of the request: model, prompt, aspect
+ratio, resolution and the sha256 of every input image. An entry stores the
+returned image bytes, the model's description text and the token usage, so
+a repeated request (an agent retrying a skill, a re-run after a crash) is
+answered locally. Entries expire after a TTL and total size is bounded with
+LRU eviction.
+
+Settings (environment):
+    IMAGE_GEN_CACHE=1           enable without --cache
+    IMAGE_GEN_CACHE_DIR         location (default: $XDG_CACHE_HOME/image-gen)
+    IMAGE_GEN_CACHE_TTL         entry lifetime, e.g. 12h, 7d, 3600 (default: 7d)
+    IMAGE_GEN_CACHE_SIZE        size bound, e.g. 500M, 2G (default: 2G)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+DEFAULT_TTL = 7 * 86400
+DEFAULT_MAX_BYTES = 2 << 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    mime_type TEXT,
+    description TEXT,
+    usage TEXT,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used);
+"""
+
+
+def parse_bytes(text: Any) -> int:
+    """Parse '500M', '2G', '1048576' into a byte count."""
+    text = str(text).strip().upper().rstrip("B")
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def parse_duration(text: Any) -> float:
+    """Parse '90', '30m', '12h', '7d' into seconds."""
+    text = str(text).strip().lower()
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def default_cache_dir() -> str:
+    if os.environ.get("IMAGE_GEN_CACHE_DIR"):
+        return os.environ["IMAGE_GEN_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "image-gen")
+
+
+def enabled_by_env() -> bool:
+    return os.environ.get("IMAGE_GEN_CACHE", "").lower() in ("1", "true", "yes", "on")
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk response cache, safe to share between the threads of a batch.
+
+    Args:
+        root: Cache directory
+        ttl: Entry lifetime in seconds
+        max_bytes: Total image bytes kept
+        refresh: Skip lookups (always call the API) but store new responses
+        namespace: Kept apart from other namespaces (e.g. "offline" fake responses)
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        refresh: bool = False,
+        namespace: str = "gemini"
+    ):
+        self.root = root or default_cache_dir()
+        self.ttl = ttl if ttl is not None else parse_duration(os.environ.get("IMAGE_GEN_CACHE_TTL", DEFAULT_TTL))
+        self.max_bytes = max_bytes if max_bytes is not None else parse_bytes(
+            os.environ.get("IMAGE_GEN_CACHE_SIZE", DEFAULT_MAX_BYTES))
+        self.refresh = refresh
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._db = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.join(self.root, "blobs"), exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.root, "index.sqlite"), timeout=30,
+                                       isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def _blob_path(self, key: str) -> str:
+        return os.path.join(self.root, "blobs", key[:2], key)
+
+    def key(
+        self,
+        model: str,
+        prompt: str,
+        aspect_ratio: str,
+        resolution: Optional[str],
+        images: List[str],
+        variant: Optional[int] = None,
+        references: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Canonical request hash. Input images count by content, not path; variants are distinct.
+
+        references holds the settings that shape what is sent for the images
+        (downscale edge, inline vs uploaded), so a different payload is a
+        different key.
+        """
+        request = {
+            "namespace": self.namespace,
+            "model": model,
+            "prompt": prompt,
+            "aspect_ratio": aspect_ratio,
+            "resolution": resolution,
+            "images": [file_sha256(path) for path in images],
+        }
+        if variant is not None:
+            request["variant"] = variant
+        if images and references:
+            request["references"] = references
+        return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached response for key (data, mime_type, description, usage, created), or None."""
+        if self.refresh:
+            return None
+        with self._lock:
+            row = self.db.execute(
+                "SELECT mime_type, description, usage, size, created FROM entries WHERE key = ?",
+                (key,)).fetchone()
+            if row is None:
+                return None
+            mime_type, description, usage, size, created = row
+            if time.time() - created > self.ttl:
+                self._evict(key)
+                return None
+            try:
+                with open(self._blob_path(key), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                data = None
+            if data is None or len(data) != size:
+                self._evict(key)
+                return None
+            self.db.execute("UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+        return {
+            "data": data,
+            "mime_type": mime_type,
+            "description": description,
+            "usage": json.loads(usage) if usage else None,
+            "created": created,
+        }
+
+    def put(
+        self,
+        key: str,
+        data: bytes,
+        mime_type: Optional[str],
+        description: Optional[str],
+        usage: Optional[Dict[str, Any]]
+    ) -> None:
+        """Store a response, then evict expired and least recently used entries."""
+        blob = self._blob_path(key)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        tmp = f"{blob}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, blob)
+
+        now = time.time()
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries (key, mime_type, description, usage, size, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, mime_type, description, json.dumps(usage) if usage else None, len(data), now, now))
+            self._prune(now)
+
+    def _evict(self, key: str) -> None:
+        self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        try:
+            os.unlink(self._blob_path(key))
+        except FileNotFoundError:
+            pass
+
+    def _prune(self, now: float) -> None:
+        for (key,) in self.db.execute("SELECT key FROM entries WHERE created < ?", (now - self.ttl,)).fetchall():
+            self._evict(key)
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.db.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._evict(key)
+            total -= size
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# The scripts directory is not a package: image_gen.py imports its helpers from it
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+from fake_client import FakeClient
+from image_gen import GeminiImageCLI
+from rate_limit import Scheduler
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run from tmp_path with a private response cache directory."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("IMAGE_GEN_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.delenv("IMAGE_GEN_CACHE", raising=False)
+    return tmp_path
+
+
+@pytest.fixture
+def make_cli(workdir):
+    """Build an offline GeminiImageCLI; backoff is scaled down so retries take milliseconds."""
+    def make(concurrency=1, latency=0.02, capacity=0, retry_delay="", **kwargs):
+        client = FakeClient(latency=latency, capacity=capacity, error_rate=0,
+                            retry_delay=retry_delay, hang_rate=0)
+        scheduler = Scheduler(max_concurrency=concurrency, base_delay=0.01, max_delay=0.1)
+        return GeminiImageCLI(client=client, scheduler=scheduler, **kwargs)
+    return make
@@ -0,0 +1,101 @@
+import yaml
+from PIL import Image
+
+from image_gen import load_manifest
+from rate_limit import RATE_LIMITED, TRANSIENT
+from references import ReferenceStore
+from response_cache import ResponseCache
+
+DEFAULTS = {"aspect_ratio": "1:1", "resolution": "1K", "fast": False, "retries": 10, "save_metadata": True}
+
+
+def _metadata(output):
+    with open(output.replace(".png", "_metadata.yaml")) as f:
+        return yaml.safe_load(f)
+
+
+def test_batch_backs_off_on_429(make_cli, workdir):
+    (workdir / "batch.yaml").write_text(yaml.dump([{"prompt": f"item {n}"} for n in range(1, 7)]))
+    items = load_manifest(str(workdir / "batch.yaml"), DEFAULTS)
+    # A server taking one call at a time answers the other three with 429s
+    cli = make_cli(concurrency=4, latency=0.05, capacity=1)
+    report = cli.generate_batch(items, concurrency=4, manifest="batch.yaml")
+
+    assert (report["succeeded"], report["failed"]) == (6, 0)
+    assert [e["index"] for e in report["items"]] == list(range(1, 7))
+    assert cli.client.models.rejected > 0
+    assert report["scheduler"][RATE_LIMITED] == cli.client.models.rejected
+    for item in items:
+        assert Image.open(item["output"]).size == (1024, 1024)
+
+
+def test_variants_keep_best(make_cli, workdir):
+    cli = make_cli(concurrency=3)
+    report = cli.generate_variants(3, keep=1, output="out.png", concurrency=3, prompt="a red fox", images=[],
+                                   aspect_ratio="1:1", resolution="1K", use_pro=True, max_retries=3,
+                                   user_request=None, composition=None)
+
+    assert (report["succeeded"], report["failed"]) == (3, 0)
+    assert cli.client.models.peak_active == 3
+    assert report["kept"] == [e["output"] for e in report["items"] if e["rank"] == 1]
+    assert [str(p.name) for p in workdir.glob("out_*.png")] == report["kept"]
+    assert _metadata(report["kept"][0])["variant"]["kept"] is True
+
+
+def test_stream_records_timing(make_cli, workdir):
+    cli = make_cli(stream=True)
+    assert cli.generate_image("a lighthouse", aspect_ratio="16:9", resolution="1K", output="out.png")
+
+    metadata = _metadata("out.png")
+    assert metadata["model_description"].startswith("[offline]")
+    assert 0 <= metadata["generation"]["ttfb_seconds"] <= metadata["generation"]["image_seconds"]
+    assert metadata["usage"]["output_tokens"] == 1290
+    assert Image.open("out.png").size == (1360, 768)
+
+
+def test_timeout_is_retried(make_cli, workdir):
+    cli = make_cli(latency=0.05, timeout=0.5)
+    models = cli.client.models
+    generate_content = models.generate_content
+
+    def hang_once(*args, **kwargs):
+        # The first call hangs until the deadline, the retry answers
+        try:
+            return generate_content(*args, **kwargs)
+        finally:
+            models.hang_rate = 0.0
+
+    models.hang_rate = 1.0
+    models.generate_content = hang_once
+    assert cli.generate_image("a bridge", resolution="1K", output="out.png")
+
+    assert _metadata("out.png")["generation"]["attempts"] == 2
+    assert cli.scheduler.stats()[TRANSIENT] == 1
+    assert models.calls == 2
+
+
+def test_timeout_gives_up_after_retries(make_cli, workdir):
+    cli = make_cli(latency=1.0, timeout=0.05)
+    assert not cli.generate_image("a bridge", resolution="1K", output="out.png", max_retries=2)
+    assert cli.scheduler.stats()[TRANSIENT] == 2
+    assert not (workdir / "out.png").exists()
+
+
+def test_cache_hit_skips_call(make_cli, workdir):
+    cli = make_cli(cache=ResponseCache(namespace="offline"))
+    assert cli.generate_image("a castle", resolution="1K", output="first.png")
+    assert cli.generate_image("a castle", resolution="1K", output="second.png")
+
+    assert cli.client.models.calls == 1
+    assert (workdir / "first.png").read_bytes() == (workdir / "second.png").read_bytes()
+    metadata = _metadata("second.png")
+    assert metadata["cache"]["hit"] is True
+    assert metadata["generation"]["attempts"] == 0
+
+
+def test_cache_keyed_on_reference_settings(make_cli, workdir):
+    Image.radial_gradient("L").convert("RGB").resize((2000, 1500)).save("ref.jpg")
+    for max_edge, hit in ((1024, False), (1024, True), (512, False)):
+        cli = make_cli(cache=ResponseCache(namespace="offline"), references=ReferenceStore(max_edge))
+        assert cli.generate_image("restyle this", images=["ref.jpg"], resolution="1K", output="out.png")
+        assert _metadata("out.png")["cache"]["hit"] is hit
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""Chroma key benchmark: current engine vs the original float64 implementation.
+
+Each implementation runs in its own subprocess on the same synthetic image
+(a noisy subject with anti-aliased edges on an imprecise green backdrop), so
+peak RSS is measured per implementation; the increase is relative to the peak
+after decoding the source. Outputs are compared channel-wise.
+
+Usage:
+    python bench/chroma_key.py [--size 4096] [--tolerance 15] [--feather 40] [--json]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+from ops.alpha import _chroma_key_numpy, _rgb_to_hue
+
+BACKDROP = (12, 246, 9)
+
+
+def legacy_chroma_key(img, target, tolerance, feather):
+    """The original float64 implementation, kept verbatim as the reference."""
+    arr = np.array(img, dtype=np.float64)
+    r, g, b = arr[:, :, 0], arr[:, :, 1], arr[:, :, 2]
+
+    # Convert target to HSV hue
+    target_h = _rgb_to_hue(*target)
+    target_s_min = 0.15  # minimum saturation to be considered chromatic
+
+    # Convert image to HSV
+    # Normalize to 0-1
+    rn, gn, bn = r / 255.0, g / 255.0, b / 255.0
+    cmax = np.maximum(np.maximum(rn, gn), bn)
+    cmin = np.minimum(np.minimum(rn, gn), bn)
+    delta = cmax - cmin
+
+    # Hue calculation
+    hue = np.zeros_like(delta)
+    mask_r = (cmax == rn) & (delta > 0)
+    mask_g = (cmax == gn) & (delta > 0)
+    mask_b = (cmax == bn) & (delta > 0)
+    hue[mask_r] = 60.0 * (((gn[mask_r] - bn[mask_r]) / delta[mask_r]) % 6)
+    hue[mask_g] = 60.0 * (((bn[mask_g] - rn[mask_g]) / delta[mask_g]) + 2)
+    hue[mask_b] = 60.0 * (((rn[mask_b] - gn[mask_b]) / delta[mask_b]) + 4)
+
+    # Saturation (suppress divide-by-zero for black pixels)
+    with np.errstate(invalid='ignore'):
+        sat = np.where(cmax > 0, delta / cmax, 0)
+
+    # Hue distance (circular)
+    hue_diff = np.abs(hue - target_h)
+    hue_diff = np.minimum(hue_diff, 360.0 - hue_diff)
+
+    # Background detection: match hue within tolerance, with minimum saturation
+    hue_tolerance = max(tolerance, 15)
+    hue_feather = max(feather, 20)
+
+    is_chromatic = sat > target_s_min
+    bg_core = is_chromatic & (hue_diff <= hue_tolerance)
+    bg_edge = is_chromatic & (hue_diff > hue_tolerance) & (hue_diff <= hue_tolerance + hue_feather)
+
+    # Alpha: 0 for background, gradient for edges, 255 for subject
+    alpha = np.full(r.shape, 255.0)
+    alpha[bg_core] = 0.0
+    edge_alpha = (hue_diff[bg_edge] - hue_tolerance) / hue_feather * 255.0
+    alpha[bg_edge] = edge_alpha
+
+    # Also catch low-saturation near-white/near-black pixels that are close to target in RGB
+    rgb_dist = np.sqrt((r - target[0])**2 + (g - target[1])**2 + (b - target[2])**2)
+    rgb_close = rgb_dist < (tolerance * 5)
+    alpha[rgb_close & ~is_chromatic] = 0.0
+
+    # Gaussian blur the alpha mask for smooth antialiased edges
+    blur_radius = max(1.0, feather / 15.0)
+    alpha_img = Image.fromarray(alpha.astype(np.uint8), mode='L')
+    alpha_img = alpha_img.filter(ImageFilter.GaussianBlur(radius=blur_radius))
+    alpha = np.array(alpha_img, dtype=np.float64)
+
+    # Spill suppression: remove background color from edge/subject pixels
+    # For magenta (high R, high B, low G): clamp R and B so they don't
+    # exceed what's natural. Use the "low channel" as reference.
+    # Identify which channel is the "low" one in the target
+    t_channels = list(target)
+    low_idx = t_channels.index(min(t_channels))
+    high_indices = [i for i in range(3) if i != low_idx]
+
+    # Spill strength based on proximity to background
+    # Pixels closer to bg get more despill
+    max_rgb_dist = np.sqrt(3 * 255**2)
+    spill_strength = np.clip(1.0 - (rgb_dist / (max_rgb_dist * 0.3)), 0, 1)
+    # Only despill pixels that are partially or fully opaque and near edges
+    needs_despill = (alpha > 0) & (spill_strength > 0)
+
+    channels = [r.copy(), g.copy(), b.copy()]
+    low_channel = channels[low_idx]
+
+    for hi in high_indices:
+        # Clamp high channels: they shouldn't exceed low_channel + natural_offset
+        # The offset accounts for natural color (e.g., a red object has high R legitimately)
+        # Use a gentle clamp: blend toward the low channel value
+        excess = np.maximum(0, channels[hi] - low_channel - 30)
+        reduction = excess * spill_strength * 0.6
+        channels[hi] = np.where(needs_despill, channels[hi] - reduction, channels[hi])
+
+    channels = [np.clip(c, 0, 255) for c in channels]
+
+    # Build output
+    out_arr = np.stack([
+        channels[0].astype(np.uint8),
+        channels[1].astype(np.uint8),
+        channels[2].astype(np.uint8),
+        alpha.astype(np.uint8),
+    ], axis=-1)
+
+    result = Image.fromarray(out_arr, mode='RGBA')
+    transparent_count = int(np.sum(alpha < 255))
+    return result, transparent_count
+
+
+IMPLEMENTATIONS = {
+    "legacy": legacy_chroma_key,
+    "current": _chroma_key_numpy,
+}
+
+
+def synth_image(size):
+    """Deterministic RGBA test image: subject ellipse + noise on a green backdrop."""
+    img = Image.new("RGB", (size, size), BACKDROP)
+    draw = ImageDraw.Draw(img)
+    m = size // 8
+    draw.ellipse((m, m, size - m, size - m), fill=(200, 90, 160))
+    draw.rectangle((size // 3, size // 3, size // 2, size - 2 * m), fill=(30, 200, 40))
+    img = img.filter(ImageFilter.GaussianBlur(radius=max(1, size // 512)))
+    noise = Image.effect_noise((size, size), 12).convert("RGB")
+    img = Image.blend(img, noise, 0.08)
+    return img.convert("RGBA")
+
+
+def _peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _child(name, source, tolerance, feather, out_path):
+    img = Image.open(source).convert("RGBA")
+    before = _peak_rss_bytes()
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    result, count = IMPLEMENTATIONS[name](img, BACKDROP, tolerance, feather)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    peak = _peak_rss_bytes()
+    np.save(out_path, np.asarray(result))
+    print(json.dumps({
+        "impl": name,
+        "seconds": round(elapsed, 3),
+        "cpu_seconds": round(cpu, 3),
+        "peak_rss_mb": round(peak / 2**20, 1),
+        "peak_rss_increase_mb": round((peak - before) / 2**20, 1),
+        "keyed_pixels": count,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the chroma key engine")
+    parser.add_argument("--size", type=int, default=4096, help="Square image edge in px (default: 4096)")
+    parser.add_argument("--tolerance", type=int, default=15)
+    parser.add_argument("--feather", type=int, default=40)
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+    parser.add_argument("--child", choices=IMPLEMENTATIONS, help=argparse.SUPPRESS)
+    parser.add_argument("--source", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.source, args.tolerance, args.feather, args.out)
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source.png")
+        synth_image(args.size).save(source, compress_level=1)
+        arrays = {}
+        for name in IMPLEMENTATIONS:
+            out = os.path.join(tmp, f"{name}.npy")
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", name, "--out", out,
+                 "--source", source, "--tolerance", str(args.tolerance), "--feather", str(args.feather)],
+                stdout=subprocess.PIPE, text=True, check=True)
+            results.append(json.loads(proc.stdout))
+            arrays[name] = np.load(out)
+
+    diff = np.abs(arrays["current"].astype(np.int16) - arrays["legacy"].astype(np.int16))
+    comparison = {
+        "max_abs_diff": int(diff.max()),
+        "pixels_differing_pct": round(100.0 * np.count_nonzero(diff.max(axis=-1)) / diff[..., 0].size, 4),
+        "speedup": round(results[0]["seconds"] / results[1]["seconds"], 2),
+        "peak_rss_ratio": round(results[0]["peak_rss_mb"] / results[1]["peak_rss_mb"], 1),
+    }
+
+    if args.json:
+        print(json.dumps({"size": args.size, "results": results, "comparison": comparison}, indent=2))
+        return
+
+    print(f"Chroma key on {args.size}x{args.size} RGBA (tolerance {args.tolerance}, feather {args.feather})")
+    print(f"{'Impl':<10} {'Wall (s)':>9} {'CPU (s)':>9} {'Peak RSS (MB)':>14} {'RSS increase (MB)':>18}")
+    for r in results:
+        print(f"{r['impl']:<10} {r['seconds']:>9.3f} {r['cpu_seconds']:>9.3f} {r['peak_rss_mb']:>14.1f} {r['peak_rss_increase_mb']:>18.1f}")
+    print(f"Speedup: {comparison['speedup']}x, peak RSS ratio: {comparison['peak_rss_ratio']}x")
+    print(f"Max channel difference: {comparison['max_abs_diff']}, "
+          f"pixels differing: {comparison['pixels_differing_pct']}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Reduced-resolution decode benchmark for thumbnail and resize.
+
+Synthesizes a corpus of large photo-like JPEG and WebP files, then runs each
+scenario through image_tools.py twice, with the default reduced decode and
+with --full-decode. Every run is a fresh serial process (--jobs 1, no cache);
+wall time, CPU time and peak RSS come from os.wait4. The corpus is written by
+a helper process so the parent stays small (a forked child's peak RSS starts
+at its parent's). Quality is the PSNR of each reduced-decode output against
+its full-decode counterpart.
+
+Usage:
+    python bench/decode.py [--files 4] [--size 6000x4000] [--json]
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGE_TOOLS = os.path.join(SCRIPTS_DIR, "image_tools.py")
+
+from PIL import Image, ImageChops, ImageDraw, ImageFilter, ImageStat
+
+SCENARIOS = [
+    ("thumbnail 200x200", ["thumbnail", "--size", "200x200"]),
+    ("resize --width 800", ["resize", "--width", "800"]),
+    ("resize --width 1600", ["resize", "--width", "1600"]),
+    ("resize --scale 50", ["resize", "--scale", "50"]),
+]
+MODES = {"reduced": [], "full": ["--full-decode"]}
+FORMATS = {
+    "jpeg": (".jpg", {"quality": 90}),
+    "webp": (".webp", {"quality": 90, "method": 0}),
+}
+
+
+def synth_photo(width, height, seed):
+    """Photo-like RGB image: gradients, soft shapes and sensor-like noise."""
+    r = Image.linear_gradient("L").resize((width, height))
+    g = Image.radial_gradient("L").resize((width, height))
+    b = r.transpose(Image.Transpose.ROTATE_180)
+    img = Image.merge("RGB", (r, g, b))
+    draw = ImageDraw.Draw(img)
+    for i in range(12):
+        x = (seed * 997 + i * 631) % width
+        y = (seed * 389 + i * 277) % height
+        radius = min(width, height) // (4 + i % 5)
+        color = ((i * 53 + seed * 17) % 256, (i * 91) % 256, (i * 37 + 80) % 256)
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=color)
+    img = img.filter(ImageFilter.GaussianBlur(radius=max(1, width // 400)))
+    noise = Image.effect_noise((width, height), 24).convert("RGB")
+    return Image.blend(img, noise, 0.1)
+
+
+def _run(argv):
+    """Run argv; returns (wall s, cpu s, peak RSS MB, exit status)."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(argv, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - start
+    peak = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return wall, usage.ru_utime + usage.ru_stime, peak / 2**20, proc.returncode
+
+
+def _psnr(a_path, b_path):
+    a, b = Image.open(a_path).convert("RGB"), Image.open(b_path).convert("RGB")
+    if a.size != b.size:
+        return None
+    mse = sum(rms ** 2 for rms in ImageStat.Stat(ImageChops.difference(a, b)).rms) / 3
+    return float("inf") if mse == 0 else 20 * math.log10(255 / math.sqrt(mse))
+
+
+def _synth_corpus(directory, files, width, height):
+    for i in range(files):
+        photo = synth_photo(width, height, i)
+        for ext, kwargs in FORMATS.values():
+            photo.save(os.path.join(directory, f"photo{i}{ext}"), **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reduced-resolution decoding")
+    parser.add_argument("--files", type=int, default=4, help="Photos per format (default: 4)")
+    parser.add_argument("--size", default="6000x4000", help="Photo size WxH (default: 6000x4000, 24 MP)")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+    parser.add_argument("--synth", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.lower().split("x"))
+
+    if args.synth:
+        _synth_corpus(args.synth, args.files, width, height)
+        return
+
+    results, pairs = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--synth", tmp,
+                        "--files", str(args.files), "--size", args.size], check=True)
+        corpora = {fmt: [os.path.join(tmp, f"photo{i}{ext}") for i in range(args.files)]
+                   for fmt, (ext, _) in FORMATS.items()}
+
+        for (name, cmd), fmt in ((s, f) for s in SCENARIOS for f in FORMATS):
+            corpus = corpora[fmt]
+            outputs = {}
+            row = {"scenario": name, "format": fmt}
+            for mode, flags in MODES.items():
+                # Separate directory of hardlinks per mode: outputs land next to inputs
+                run_dir = os.path.join(tmp, f"{mode}-{len(results)}")
+                os.mkdir(run_dir)
+                for path in corpus:
+                    os.link(path, os.path.join(run_dir, os.path.basename(path)))
+                wall, cpu, rss, code = _run([sys.executable, IMAGE_TOOLS, cmd[0], run_dir, *cmd[1:],
+                                             *flags, "--jobs", "1", "--no-cache"])
+                if code:
+                    sys.exit(f"{name} ({mode}) failed with exit code {code}")
+                row[mode] = {"seconds": round(wall, 3), "cpu_seconds": round(cpu, 3), "peak_rss_mb": round(rss, 1)}
+                inputs = {os.path.basename(p) for p in corpus}
+                outputs[mode] = sorted(os.path.join(run_dir, f) for f in os.listdir(run_dir) if f not in inputs)
+
+            row["speedup"] = round(row["full"]["seconds"] / row["reduced"]["seconds"], 2)
+            row["rss_ratio"] = round(row["full"]["peak_rss_mb"] / row["reduced"]["peak_rss_mb"], 2)
+            results.append(row)
+            pairs.append(list(zip(outputs["reduced"], outputs["full"])))
+
+        # Decode outputs only after all timed runs, keeping the parent small
+        for row, row_pairs in zip(results, pairs):
+            psnrs = [p for p in (_psnr(a, b) for a, b in row_pairs) if p is not None]
+            row["min_psnr_db"] = round(min(psnrs), 1) if psnrs else None
+
+    if args.json:
+        print(json.dumps({"files_per_format": args.files, "size": args.size, "results": results}, indent=2))
+        return
+
+    print(f"{args.files} photos per format at {args.size}, --jobs 1")
+    print(f"{'Scenario':<20} {'Format':<7} {'Mode':<8} {'Wall (s)':>9} {'CPU (s)':>9} {'Peak RSS (MB)':>14}")
+    for row in results:
+        for mode in MODES:
+            r = row[mode]
+            print(f"{row['scenario']:<20} {row['format']:<7} {mode:<8} {r['seconds']:>9.3f} "
+                  f"{r['cpu_seconds']:>9.3f} {r['peak_rss_mb']:>14.1f}")
+        print(f"{'':<28} speedup {row['speedup']}x, peak RSS ratio {row['rss_ratio']}x, "
+              f"min PSNR vs full decode {row['min_psnr_db']} dB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""CLI startup benchmark for image_tools.py.
+
+Runs each scenario in a fresh interpreter, reports the median wall time, the
+total import time from `-X importtime`, and whether Pillow/numpy were loaded.
+The "eager" scenario imports every ops module before dispatch, reproducing the
+old pkgutil-based registration, so the gain of lazy registration is visible.
+
+Usage:
+    python bench/startup.py [--runs N] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGE_TOOLS = os.path.join(SCRIPTS_DIR, "image_tools.py")
+HEAVY_MODULES = ("PIL", "numpy")
+
+EAGER_CODE = """
+import importlib, pkgutil, runpy, sys
+sys.path.insert(0, {scripts!r})
+import ops
+for _, name, _ in pkgutil.iter_modules(ops.__path__):
+    if not name.startswith("_"):
+        importlib.import_module("ops." + name)
+sys.argv = ["image_tools.py"] + {argv!r}
+runpy.run_path({entry!r}, run_name="__main__")
+"""
+
+
+def _scenarios(sample):
+    return [
+        ("--help", [IMAGE_TOOLS, "--help"]),
+        ("resize --help", [IMAGE_TOOLS, "resize", "--help"]),
+        ("info", [IMAGE_TOOLS, "info", sample]),
+        ("info (eager, pre-registry)", ["-c", EAGER_CODE.format(
+            scripts=SCRIPTS_DIR, argv=["info", sample], entry=IMAGE_TOOLS)]),
+    ]
+
+
+def _wall_ms(argv, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def _import_profile(argv):
+    """Total self import time (ms) and heavy top-level packages loaded."""
+    proc = subprocess.run([sys.executable, "-X", "importtime"] + argv,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    total_us = 0
+    loaded = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        total_us += int(self_us)
+        top = name.strip().split(".")[0]
+        if top in HEAVY_MODULES:
+            loaded.add(top)
+    return total_us / 1000, sorted(loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark image_tools.py startup")
+    parser.add_argument("--runs", type=int, default=10, help="Runs per scenario (default: 10)")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sample = os.path.join(tmp, "sample.png")
+        subprocess.run([sys.executable, "-c",
+                        f"from PIL import Image; Image.new('RGB', (64, 64)).save({sample!r})"], check=True)
+
+        results = []
+        for label, argv in _scenarios(sample):
+            import_ms, loaded = _import_profile(argv)
+            results.append({
+                "scenario": label,
+                "wall_ms": round(_wall_ms(argv, args.runs), 1),
+                "import_ms": round(import_ms, 1),
+                "heavy_imports": loaded,
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'Scenario':<30} {'Wall (ms)':>10} {'Imports (ms)':>13}  Heavy imports")
+    for r in results:
+        print(f"{r['scenario']:<30} {r['wall_ms']:>10.1f} {r['import_ms']:>13.1f}  {', '.join(r['heavy_imports']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""Benchmark suite covering every image_tools.py subcommand.
+
+Synthesizes a deterministic corpus (seeded numpy noise, written by a helper
+process so the parent stays small): small RGBA icons, 12 MP JPEG photos with
+EXIF, an 8K RGBA render with transparent margins, a photo on a green
+backdrop and animated GIFs. Each scenario then runs in a fresh image_tools.py
+process, --runs times; wall time, CPU time and peak RSS come from os.wait4
+(medians of wall/CPU, maximum of RSS). Batch scenarios get a fresh directory
+of hardlinks per run, since outputs land next to their inputs, and the
+result cache is bypassed.
+
+Results can be saved as JSON and compared with a saved baseline: a scenario
+regresses when it is slower (or uses more memory) than the baseline by more
+than the threshold and by more than an absolute noise floor. The exit code
+is 1 if any scenario regressed or failed.
+
+Usage:
+    python bench/suite.py [--runs 3] [--only resize,alpha] [--corpus DIR]
+                          [--save results.json] [--baseline baseline.json]
+                          [--threshold 0.15] [--rss-threshold 0.15] [--json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGE_TOOLS = os.path.join(SCRIPTS_DIR, "image_tools.py")
+sys.path.insert(0, SCRIPTS_DIR)
+
+from ops import COMMANDS
+
+# Bump when the corpus changes, so a reused --corpus directory is rebuilt
+CORPUS_VERSION = 2
+BACKDROP = (12, 246, 9)
+
+# Subcommands that are not image operations
+UNBENCHED = {"cache"}
+
+# (name, argv). {corpus} is the corpus directory, {out} a fresh output
+# directory and {batch:NAME} a fresh hardlinked copy of corpus directory NAME.
+SCENARIOS = [
+    ("resize photos --width 1600", ["resize", "{batch:photos}", "--width", "1600"]),
+    ("resize render --scale 50", ["resize", "{corpus}/render.png", "--scale", "50", "-o", "{out}/r.png"]),
+    ("resize gifs --width 240", ["resize", "{batch:gifs}", "--width", "240"]),
+    ("thumbnail photos 256", ["thumbnail", "{batch:photos}", "--size", "256x256"]),
+    ("thumbnail icons 32", ["thumbnail", "{batch:icons}", "--size", "32x32"]),
+    ("thumbnail corpus -r --output-dir", ["thumbnail", "{corpus}", "-r", "--exclude", "photos",
+                                          "--exclude", "render.png", "--size", "64x64", "--output-dir", "{out}/tree"]),
+    ("crop photo --center", ["crop", "{corpus}/photos/photo0.jpg", "--center", "2000x2000", "-o", "{out}/c.jpg"]),
+    ("crop render --box", ["crop", "{corpus}/render.png", "--box", "1000,500,5000,3500", "-o", "{out}/c.png"]),
+    ("trim render", ["trim", "{corpus}/render.png", "-o", "{out}/t.png"]),
+    ("pad photo", ["pad", "{corpus}/photos/photo0.jpg", "--size", "4500x4500", "-o", "{out}/p.jpg"]),
+    ("pad icon", ["pad", "{corpus}/icons/icon00.png", "--size", "128x128", "-o", "{out}/p.png"]),
+    ("rotate photo 33", ["rotate", "{corpus}/photos/photo0.jpg", "--degrees", "33", "-o", "{out}/r.jpg"]),
+    ("rotate render 90", ["rotate", "{corpus}/render.png", "--degrees", "90", "-o", "{out}/r.png"]),
+    ("flip render", ["flip", "{corpus}/render.png", "--direction", "h", "-o", "{out}/f.png"]),
+    ("alpha --remove render", ["alpha", "{corpus}/render.png", "--remove", "-o", "{out}/a.png"]),
+    ("alpha --add photo", ["alpha", "{corpus}/photos/photo0.jpg", "--add", "-o", "{out}/a.png"]),
+    ("alpha --transparent greenscreen", ["alpha", "{corpus}/greenscreen.png",
+                                         "--transparent", ",".join(map(str, BACKDROP)),
+                                         "--tolerance", "30", "--feather", "20", "-o", "{out}/k.png"]),
+    ("composite render over photo", ["composite", "{corpus}/photos/photo0.jpg", "{corpus}/render.png",
+                                     "--overlay-size", "2000x1125", "-o", "{out}/m.png"]),
+    ("convert photos webp", ["convert", "{batch:photos}", "--format", "webp"]),
+    ("convert render jpg", ["convert", "{corpus}/render.png", "--format", "jpg", "-o", "{out}/c.jpg"]),
+    ("convert gif webp", ["convert", "{corpus}/gifs/anim0.gif", "--format", "webp", "-o", "{out}/c.webp"]),
+    ("compress photos -q 70", ["compress", "{batch:photos}", "--quality", "70"]),
+    ("compress render", ["compress", "{corpus}/render.png", "-o", "{out}/c.png"]),
+    ("pipeline photos", ["pipeline", "{batch:photos}", "--step", "resize --width 2000",
+                         "--step", "rotate --degrees 90", "--step", "convert --format webp"]),
+    ("pipeline gif frames", ["pipeline", "{corpus}/gifs/anim0.gif", "--step", "resize --width 240",
+                             "--step", "flip --direction h", "-o", "{out}/p.gif"]),
+    ("derivatives photos", ["derivatives", "{corpus}/photos", "--output-dir", "{out}/d"]),
+    ("info icons", ["info", "{corpus}/icons", "--json"]),
+    ("info gifs", ["info", "{corpus}/gifs", "--json"]),
+    ("info corpus -r", ["info", "{corpus}", "-r", "--json"]),
+    ("metadata photos", ["metadata", "{corpus}/photos", "--jsonl"]),
+]
+
+
+# ─── Corpus ──────────────────────────────────────────────────────────────────
+
+def _noise(rng, width, height, sigma):
+    import numpy as np
+    from PIL import Image
+    arr = rng.normal(128, sigma, (height, width, 3)).clip(0, 255).astype(np.uint8)
+    return Image.fromarray(arr, "RGB")
+
+
+def _photo(rng, width, height, noise=True):
+    """Photo-like RGB image: gradients, soft shapes and (optionally) sensor-like noise."""
+    from PIL import Image, ImageDraw, ImageFilter
+    r = Image.linear_gradient("L").resize((width, height))
+    g = Image.radial_gradient("L").resize((width, height))
+    img = Image.merge("RGB", (r, g, r.transpose(Image.Transpose.ROTATE_180)))
+    draw = ImageDraw.Draw(img)
+    for i in range(12):
+        x, y = int(rng.integers(width)), int(rng.integers(height))
+        radius = min(width, height) // (4 + i % 5)
+        color = tuple(int(c) for c in rng.integers(256, size=3))
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=color)
+    img = img.filter(ImageFilter.GaussianBlur(radius=max(1, width // 400)))
+    return Image.blend(img, _noise(rng, width, height, 24), 0.1) if noise else img
+
+
+def synth_corpus(directory):
+    """Write the benchmark corpus into directory (deterministic for a given numpy)."""
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    rng = np.random.default_rng(20240601)
+    for sub in ("icons", "photos", "gifs"):
+        os.makedirs(os.path.join(directory, sub), exist_ok=True)
+
+    # 32 small RGBA icons
+    for i in range(32):
+        icon = Image.new("RGBA", (64, 64), (0, 0, 0, 0))
+        color = tuple(int(c) for c in rng.integers(256, size=3)) + (255,)
+        ImageDraw.Draw(icon).rounded_rectangle((6, 6, 57, 57), radius=12, fill=color)
+        icon.save(os.path.join(directory, "icons", f"icon{i:02d}.png"))
+
+    # Four 12 MP photos with camera EXIF
+    for i in range(4):
+        photo = _photo(rng, 4000, 3000)
+        exif = Image.Exif()
+        exif[0x010F], exif[0x0110], exif[0x0132] = "BenchCam", "Model 12", "2024:06:01 12:00:00"
+        photo.save(os.path.join(directory, "photos", f"photo{i}.jpg"), quality=90, exif=exif)
+
+    # 8K RGBA render (noise-free, like CG output): opaque content inside transparent margins
+    render = Image.new("RGBA", (7680, 4320), (0, 0, 0, 0))
+    content = _photo(rng, 6400, 3600, noise=False).convert("RGBA")
+    render.paste(content, (640, 360))
+    render.save(os.path.join(directory, "render.png"), compress_level=1)
+
+    # 12 MP subject on an imprecise green backdrop
+    screen = Image.blend(Image.new("RGB", (4000, 3000), BACKDROP), _noise(rng, 4000, 3000, 24), 0.08)
+    mask = Image.new("L", screen.size, 0)
+    ImageDraw.Draw(mask).ellipse((800, 400, 3200, 2600), fill=255)
+    screen.paste(_photo(rng, 4000, 3000), mask=mask)
+    screen.save(os.path.join(directory, "greenscreen.png"), compress_level=1)
+
+    # Two animated GIFs, 24 frames each
+    for i in range(2):
+        base = _photo(rng, 480, 270).quantize(64)
+        frames = []
+        for f in range(24):
+            frame = base.copy()
+            ImageDraw.Draw(frame).ellipse((f * 16, 80, f * 16 + 80, 160), fill=f % 64)
+            frames.append(frame)
+        frames[0].save(os.path.join(directory, "gifs", f"anim{i}.gif"), save_all=True,
+                       append_images=frames[1:], duration=40, loop=0)
+
+    with open(os.path.join(directory, "VERSION"), "w") as f:
+        f.write(str(CORPUS_VERSION))
+
+
+def _ensure_corpus(directory):
+    try:
+        with open(os.path.join(directory, "VERSION")) as f:
+            if f.read().strip() == str(CORPUS_VERSION):
+                return
+    except FileNotFoundError:
+        pass
+    print(f"Synthesizing corpus in {directory} ...", file=sys.stderr)
+    subprocess.run([sys.executable, os.path.abspath(__file__), "--synth", directory], check=True)
+
+
+# ─── Runs ────────────────────────────────────────────────────────────────────
+
+def _run(argv):
+    """Run argv; returns (wall s, cpu s, peak RSS MB, exit status, stderr)."""
+    with tempfile.TemporaryFile() as err:
+        start = time.perf_counter()
+        proc = subprocess.Popen(argv, stdout=subprocess.DEVNULL, stderr=err)
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        err.seek(0)
+        stderr = err.read().decode(errors="replace")
+    peak = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return wall, usage.ru_utime + usage.ru_stime, peak / 2**20, proc.returncode, stderr
+
+
+def _expand(argv, corpus, scratch):
+    """Fill in argv placeholders for one run, creating its output/batch directories."""
+    out = tempfile.mkdtemp(dir=scratch)
+    expanded = []
+    for token in argv:
+        if token.startswith("{batch:"):
+            source = os.path.join(corpus, token[len("{batch:"):-1])
+            copy = os.path.join(out, os.path.basename(source))
+            os.mkdir(copy)
+            for name in os.listdir(source):
+                os.link(os.path.join(source, name), os.path.join(copy, name))
+            token = copy
+        expanded.append(token.format(corpus=corpus, out=out))
+    return expanded, out
+
+
+def _bench(name, argv, corpus, scratch, runs):
+    command = argv[0]
+    flags = {flag for spec in COMMANDS[command][3] for flag in spec[0]}
+    if "--no-cache" in flags:
+        argv = argv + ["--no-cache"]
+
+    walls, cpus, rss = [], [], []
+    for _ in range(runs):
+        expanded, out = _expand(argv, corpus, scratch)
+        wall, cpu, peak, code, stderr = _run([sys.executable, IMAGE_TOOLS] + expanded)
+        shutil.rmtree(out)
+        if code:
+            last = stderr.strip().splitlines()[-1:] or [""]
+            return {"name": name, "command": command, "error": f"exit code {code}: {last[0]}"}
+        walls.append(wall)
+        cpus.append(cpu)
+        rss.append(peak)
+    return {
+        "name": name,
+        "command": command,
+        "wall_seconds": round(statistics.median(walls), 4),
+        "cpu_seconds": round(statistics.median(cpus), 4),
+        "peak_rss_mb": round(max(rss), 1),
+        "runs": runs,
+    }
+
+
+def _environment():
+    import numpy
+    import PIL
+    return {
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "numpy": numpy.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+# ─── Baseline comparison ────────────────────────────────────────────────────
+
+def compare(results, baseline, threshold, rss_threshold, min_seconds, min_mb):
+    """Annotate results with ratios against baseline; returns the regressed names."""
+    base = {r["name"]: r for r in baseline["results"] if "error" not in r}
+    regressed = []
+    for r in results:
+        b = base.get(r["name"])
+        if b is None or "error" in r:
+            continue
+        wall_ratio = r["wall_seconds"] / b["wall_seconds"] if b["wall_seconds"] else 1.0
+        rss_ratio = r["peak_rss_mb"] / b["peak_rss_mb"] if b["peak_rss_mb"] else 1.0
+        r["baseline"] = {"wall_seconds": b["wall_seconds"], "peak_rss_mb": b["peak_rss_mb"],
+                         "wall_ratio": round(wall_ratio, 3), "rss_ratio": round(rss_ratio, 3)}
+        slower = wall_ratio > 1 + threshold and r["wall_seconds"] - b["wall_seconds"] > min_seconds
+        bigger = rss_ratio > 1 + rss_threshold and r["peak_rss_mb"] - b["peak_rss_mb"] > min_mb
+        if slower or bigger:
+            r["regression"] = [k for k, hit in (("wall", slower), ("rss", bigger)) if hit]
+            regressed.append(r["name"])
+    return regressed
+
+
+def _print_table(report):
+    has_base = any("baseline" in r for r in report["results"])
+    header = f"{'Scenario':<34} {'Wall (s)':>9} {'CPU (s)':>9} {'Peak RSS (MB)':>14}"
+    print(header + (f" {'Wall x':>7} {'RSS x':>7}" if has_base else ""))
+    for r in report["results"]:
+        if "error" in r:
+            print(f"{r['name']:<34} FAILED: {r['error']}")
+            continue
+        line = f"{r['name']:<34} {r['wall_seconds']:>9.3f} {r['cpu_seconds']:>9.3f} {r['peak_rss_mb']:>14.1f}"
+        if "baseline" in r:
+            line += f" {r['baseline']['wall_ratio']:>7.2f} {r['baseline']['rss_ratio']:>7.2f}"
+            if r.get("regression"):
+                line += "  REGRESSION (" + ", ".join(r["regression"]) + ")"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every image_tools.py subcommand")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per scenario (default: 3)")
+    parser.add_argument("--only", help="Comma-separated subcommands or scenario names to run")
+    parser.add_argument("--corpus", help="Corpus directory, reused across runs (default: temporary)")
+    parser.add_argument("--save", metavar="PATH", help="Write results as JSON (usable as a baseline)")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare against saved results")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Allowed wall-time increase over the baseline (default: 0.15 = 15%%)")
+    parser.add_argument("--rss-threshold", type=float, default=0.15,
+                        help="Allowed peak RSS increase over the baseline (default: 0.15)")
+    parser.add_argument("--min-seconds", type=float, default=0.05,
+                        help="Ignore wall-time increases smaller than this (default: 0.05)")
+    parser.add_argument("--min-mb", type=float, default=10.0,
+                        help="Ignore peak RSS increases smaller than this (default: 10)")
+    parser.add_argument("--json", action="store_true", help="Output as JSON")
+    parser.add_argument("--synth", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.synth:
+        synth_corpus(args.synth)
+        return
+
+    scenarios = SCENARIOS
+    if args.only:
+        wanted = {w.strip() for w in args.only.split(",")}
+        scenarios = [s for s in SCENARIOS if s[0] in wanted or s[1][0] in wanted]
+    missing = set(COMMANDS) - UNBENCHED - {argv[0] for _, argv in SCENARIOS}
+    if missing:
+        print(f"Warning: no scenario for: {', '.join(sorted(missing))}", file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = os.path.abspath(args.corpus) if args.corpus else os.path.join(tmp, "corpus")
+        _ensure_corpus(corpus)
+        scratch = os.path.join(tmp, "runs")
+        os.mkdir(scratch)
+
+        results = []
+        for name, argv in scenarios:
+            print(f"  {name} ...", file=sys.stderr, flush=True)
+            results.append(_bench(name, argv, corpus, scratch, args.runs))
+
+    report = {"corpus_version": CORPUS_VERSION, "environment": _environment(), "runs": args.runs,
+              "results": results}
+    regressed = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("environment") != report["environment"]:
+            print("Warning: baseline was recorded in a different environment", file=sys.stderr)
+        regressed = compare(results, baseline, args.threshold, args.rss_threshold,
+                            args.min_seconds, args.min_mb)
+        report["regressions"] = regressed
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        env = report["environment"]
+        print(f"Python {env['python']}, Pillow {env['pillow']}, numpy {env['numpy']}, "
+              f"{env['cpus']} CPUs; median of {args.runs} run(s)")
+        _print_table(report)
+        if args.baseline:
+            print(f"\n{len(regressed)} regression(s) against {args.baseline}" +
+                  (": " + ", ".join(regressed) if regressed else ""))
+
+    failed = any("error" in r for r in results)
+    sys.exit(1 if regressed or failed else 0)
+
+
+if __name__ == "__main__":
+    main()
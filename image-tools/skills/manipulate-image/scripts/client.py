@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Minimal client for the image-tools server, run by run.sh as `python -S -I client.py`.
+
+Per-call latency is the whole point, so this imports nothing beyond what the
+interpreter has loaded anyway (os, sys, stat) and the _socket extension: the
+JSON request is written by hand and the server is asked for a "raw" reply,
+a "<exit code> <stdout bytes> <stderr bytes>" header line followed by both
+streams, so no json/re/enum import is paid. When no server answers it execs
+image_tools.py in-process instead.
+
+The socket must be owned by the current user and not accessible to group or
+others; otherwise it is not used (a predictable /tmp path could belong to
+someone else).
+"""
+
+import os
+import stat
+import sys
+
+import _socket
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_TOOLS = os.path.join(SCRIPT_DIR, "image_tools.py")
+
+# Client environment applied for the duration of each request: the
+# IMAGE_TOOLS_* settings (cache, memory budget, ...) and the cache location
+ENV_PREFIX = "IMAGE_TOOLS_"
+ENV_NAMES = ("XDG_CACHE_HOME",)
+
+
+def socket_path():
+    """Socket location; run.sh computes the same default."""
+    if os.environ.get("IMAGE_TOOLS_SOCKET"):
+        return os.environ["IMAGE_TOOLS_SOCKET"]
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+    return os.path.join(runtime_dir, f"image-tools-{os.getuid()}.sock")
+
+
+def request_env():
+    """The variables a request carries from the client and replaces on the server."""
+    return {k: v for k, v in os.environ.items()
+            if (k.startswith(ENV_PREFIX) or k in ENV_NAMES) and k != "IMAGE_TOOLS_SOCKET"}
+
+
+def check_socket(path):
+    """Raise PermissionError unless path is a socket private to this user. OSError if missing."""
+    st = os.stat(path)
+    if not stat.S_ISSOCK(st.st_mode):
+        raise PermissionError(f"{path} is not a socket")
+    if st.st_uid != os.getuid():
+        raise PermissionError(f"{path} is owned by uid {st.st_uid}")
+    if st.st_mode & 0o077:
+        raise PermissionError(f"{path} is accessible to other users (mode {stat.S_IMODE(st.st_mode):o})")
+
+
+def _json_string(text):
+    out = ['"']
+    for ch in text:
+        if ch in '"\\' or ch < " " or "\ud800" <= ch <= "\udfff":
+            out.append(f"\\u{ord(ch):04x}")
+        else:
+            out.append(ch)
+    out.append('"')
+    return "".join(out)
+
+
+def _request_line(argv):
+    env = ", ".join(f"{_json_string(k)}: {_json_string(v)}" for k, v in request_env().items())
+    return (f'{{"argv": [{", ".join(_json_string(a) for a in argv)}], '
+            f'"cwd": {_json_string(os.getcwd())}, "env": {{{env}}}, "reply": "raw"}}\n')
+
+
+def _run_in_process(argv):
+    os.execv(sys.executable, [sys.executable, IMAGE_TOOLS] + argv)
+
+
+def call(path, argv):
+    """Run argv on the server, or in-process if no usable server is listening."""
+    try:
+        check_socket(path)
+        sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    except PermissionError as e:
+        sys.stderr.write(f"Warning: not using the image-tools server: {e}\n")
+        _run_in_process(argv)
+    except OSError:
+        _run_in_process(argv)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        _run_in_process(argv)
+
+    # Once the request is sent the op may have run: never run it a second time
+    chunks = []
+    try:
+        sock.sendall(_request_line(argv).encode("utf-8"))
+        sock.shutdown(_socket.SHUT_WR)
+        while True:
+            chunk = sock.recv(1 << 16)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    except OSError as e:
+        sys.stderr.write(f"Error: image-tools server failed to answer: {e}\n")
+        return 1
+    finally:
+        sock.close()
+
+    header, sep, body = b"".join(chunks).partition(b"\n")
+    try:
+        code, n_out, n_err = (int(part) for part in header.split())
+    except ValueError:
+        sys.stderr.write("Error: image-tools server failed to answer: no response\n")
+        return 1
+    sys.stdout.flush()
+    sys.stdout.buffer.write(body[:n_out])
+    sys.stdout.buffer.flush()
+    sys.stderr.buffer.write(body[n_out:n_out + n_err])
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(call(socket_path(), sys.argv[1:]))
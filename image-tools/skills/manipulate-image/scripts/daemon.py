@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""Optional long-lived image_tools server on a Unix domain socket.
+
+The server imports Pillow/numpy and the ops modules once, then runs requests
+through the same parser and cmd_* functions as image_tools.py. It exits after
+an idle timeout (like the elevenlabs-tts worker). run.sh talks to it through
+client.py, which starts in a few milliseconds and falls back to running
+image_tools.py in-process when no server answers. The socket is created 0600
+and clients refuse one owned by another user.
+
+Protocol: one JSON request line per connection, one JSON response line back.
+    {"argv": ["resize", "a.png", "--width", "100"], "cwd": "/path", "env": {...}}
+      -> {"exit_code": 0, "stdout": "...", "stderr": "...", "elapsed_ms": 3.2}
+    With "reply": "raw" in the request the response is instead a header line
+    "<exit code> <stdout bytes> <stderr bytes>" followed by both streams.
+    {"op": "ping"}      -> {"ok": true, "pid": 1234, "requests": 17}
+    {"op": "shutdown"}  -> {"ok": true}
+
+Usage:
+    daemon.py serve [--idle-timeout SECONDS] [--background]
+    daemon.py status | stop
+    daemon.py call <image_tools args...>
+"""
+
+import json
+import os
+import socket
+import sys
+import time
+
+import client
+from client import check_socket, request_env, socket_path
+
+IDLE_TIMEOUT = 300
+
+
+def _connect(path, timeout=None):
+    """A socket connected to the server. Raises OSError if no server (PermissionError if not ours)."""
+    check_socket(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def _exchange(sock, payload):
+    """Send one request on a connected socket and return the decoded response."""
+    sock.sendall(json.dumps(payload).encode() + b"\n")
+    sock.shutdown(socket.SHUT_WR)
+    with sock.makefile("rb") as f:
+        line = f.readline()
+    if not line:
+        raise ConnectionError("server closed the connection without a response")
+    return json.loads(line)
+
+
+def _request(path, payload, timeout=None):
+    """Send one request and return the decoded response. Raises OSError if no server."""
+    with _connect(path, timeout) as sock:
+        return _exchange(sock, payload)
+
+
+# ─── Server ──────────────────────────────────────────────────────────────────
+
+def _swap_env(env):
+    """Replace the request-scoped variables with env. Returns the previous values."""
+    previous = request_env()
+    for k in previous:
+        del os.environ[k]
+    os.environ.update(env)
+    return previous
+
+
+def _handle(request, run):
+    import io
+    import traceback
+    from contextlib import redirect_stdout, redirect_stderr
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    prev_cwd = os.getcwd()
+    # The server's own settings must not leak into a client that did not set them
+    prev_env = _swap_env(request.get("env") or {})
+    start = time.perf_counter()
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                os.chdir(request.get("cwd") or prev_cwd)
+                code = run(request["argv"])
+            except SystemExit as e:
+                # argparse errors and --help exit through SystemExit
+                code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except Exception:
+                traceback.print_exc()
+                code = 1
+    finally:
+        os.chdir(prev_cwd)
+        _swap_env(prev_env)
+
+    return {
+        "exit_code": code,
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+def _utf8(text):
+    try:
+        return text.encode("utf-8", "surrogateescape")
+    except UnicodeEncodeError:
+        return text.encode("utf-8", "backslashreplace")
+
+
+def _encode_response(request, response):
+    """The response line, or for "reply": "raw" the header and both streams (client.py)."""
+    if request.get("reply") != "raw" or "exit_code" not in response:
+        return json.dumps(response).encode() + b"\n"
+    out, err = _utf8(response["stdout"]), _utf8(response["stderr"])
+    return f"{response['exit_code']} {len(out)} {len(err)}\n".encode() + out + err
+
+
+def _preload():
+    """Import every op module up front so requests never pay for it."""
+    import importlib
+    import image_tools
+    from ops import COMMANDS
+    for module in sorted({spec[0] for spec in COMMANDS.values()}):
+        importlib.import_module(f"ops.{module}")
+    return image_tools.run
+
+
+def serve(path, idle_timeout):
+    try:
+        _request(path, {"op": "ping"}, timeout=1)
+        print(f"Error: a server is already listening on {path}")
+        return 1
+    except OSError:
+        pass
+    if os.path.lexists(path):
+        if os.lstat(path).st_uid != os.getuid():
+            print(f"Error: {path} belongs to another user (set IMAGE_TOOLS_SOCKET or XDG_RUNTIME_DIR)")
+            return 1
+        os.unlink(path)  # stale socket from a crashed server
+
+    run = _preload()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        sock.bind(path)
+    finally:
+        os.umask(old_umask)
+    sock.listen(16)
+    sock.settimeout(idle_timeout)
+    print(f"image-tools server listening on {path} (pid {os.getpid()}, idle timeout {idle_timeout}s)", flush=True)
+
+    served = 0
+    try:
+        while True:
+            try:
+                conn, _ = sock.accept()
+            except socket.timeout:
+                break
+            with conn:
+                conn.settimeout(30)
+                try:
+                    with conn.makefile("rb") as f:
+                        request = json.loads(f.readline())
+                except (OSError, ValueError):
+                    continue
+
+                op = request.get("op")
+                if op == "shutdown":
+                    response = {"ok": True}
+                elif op == "ping":
+                    response = {"ok": True, "pid": os.getpid(), "requests": served}
+                else:
+                    response = _handle(request, run)
+                    served += 1
+                try:
+                    conn.sendall(_encode_response(request, response))
+                except OSError:
+                    pass
+                if op == "shutdown":
+                    break
+    finally:
+        sock.close()
+        if os.path.exists(path):
+            os.unlink(path)
+    return 0
+
+
+def serve_background(path, idle_timeout):
+    """Start the server detached and wait until it accepts connections."""
+    import subprocess
+
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "serve", "--idle-timeout", str(idle_timeout)],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            info = _request(path, {"op": "ping"}, timeout=1)
+            print(json.dumps({"status": "running", "pid": info["pid"], "socket": path}))
+            return 0
+        except OSError:
+            time.sleep(0.05)
+    print(json.dumps({"status": "error", "message": "server did not start"}))
+    return 1
+
+
+# ─── Client ──────────────────────────────────────────────────────────────────
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "call":
+        # Forward everything verbatim; argparse would eat image_tools flags
+        sys.exit(client.call(socket_path(), sys.argv[2:]))
+
+    import argparse
+    parser = argparse.ArgumentParser(prog="daemon", description="image-tools server")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("serve", help="Run the server")
+    p.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT,
+                   help=f"Exit after this many idle seconds (default: {IDLE_TIMEOUT})")
+    p.add_argument("--background", action="store_true", help="Detach and return once the server is ready")
+    sub.add_parser("status", help="Show whether the server is running")
+    sub.add_parser("stop", help="Stop the server")
+    args = parser.parse_args()
+
+    path = socket_path()
+    if args.command == "serve":
+        if args.background:
+            sys.exit(serve_background(path, args.idle_timeout))
+        sys.exit(serve(path, args.idle_timeout))
+
+    try:
+        info = _request(path, {"op": "ping" if args.command == "status" else "shutdown"}, timeout=5)
+    except PermissionError as e:
+        print(json.dumps({"status": "error", "message": str(e), "socket": path}))
+        sys.exit(1)
+    except OSError:
+        print(json.dumps({"status": "stopped", "socket": path}))
+        sys.exit(0 if args.command == "stop" else 1)
+    if args.command == "status":
+        print(json.dumps({"status": "running", "pid": info["pid"], "requests": info["requests"], "socket": path}))
+    else:
+        print(json.dumps({"status": "stopped", "socket": path}))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,25 +8,89 @@ import os
 # Add script directory to path so ops package is importable
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from ops import register_all
+from ops import CACHEABLE, register_all
 
 
-def main():
+def build_parser():
     parser = argparse.ArgumentParser(
         prog="image_tools",
         description="Swiss army knife for image manipulation",
     )
-    parser.add_argument("--verbose", "-v", action="store_true", help="Verbose output")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Verbose output (with --profile: per-file timings)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print a per-phase timing breakdown (open, decode, transform, encode, fs) to stderr")
+    parser.add_argument("--profile-json", metavar="PATH", help="Write the profile summary and per-file records as JSON")
+    parser.add_argument("--trace", metavar="PATH", help="Write a Chrome trace (chrome://tracing, Perfetto) of the run")
+    parser.add_argument("--cprofile", metavar="PATH", help="Dump cProfile stats of the main process (use --jobs 1)")
 
     subparsers = parser.add_subparsers(dest="command", help="Operation to perform")
     register_all(subparsers)
+    return parser
+
 
-    args = parser.parse_args()
+def run(argv=None):
+    """Parse argv and dispatch to the op. Returns the process exit code."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
     if not args.command:
         parser.print_help()
-        sys.exit(1)
+        return 1
+
+    if args.command in CACHEABLE and not args.no_cache:
+        from ops import _cache
+        if _cache.enabled():
+            args.cache = _cache.ResultCache()
+
+    if args.profile or args.profile_json or args.trace or args.cprofile:
+        return 1 if _run_profiled(args) else 0
+
+    # Batch commands return their failure count
+    return 1 if args.func(args) else 0
+
 
-    args.func(args)
+def _run_profiled(args):
+    """Run the command under ops._profile (and cProfile); returns its result."""
+    import json
+    from ops import _profile
+
+    profiler = args.profiler = _profile.Profiler(trace=bool(args.trace))
+    _profile.install()
+    cprof = None
+    if args.cprofile:
+        import cProfile
+        cprof = cProfile.Profile()
+    try:
+        label = getattr(args, "input", None) or args.command
+        with profiler.file(label) as record:
+            if cprof:
+                cprof.enable()
+            try:
+                result = args.func(args)
+            finally:
+                if cprof:
+                    cprof.disable()
+    finally:
+        _profile.uninstall()
+
+    # Single-file commands have no per-file records of their own
+    if not profiler.records:
+        profiler.add(record)
+    summary = profiler.summary(args.command)
+    if args.profile or not (args.profile_json or args.trace or args.cprofile):
+        profiler.write_summary(summary, verbose=args.verbose)
+    if args.profile_json:
+        with open(args.profile_json, "w") as f:
+            json.dump(dict(summary, records=profiler.records_json()), f, indent=2)
+    if args.trace:
+        with open(args.trace, "w") as f:
+            json.dump(profiler.chrome_trace(), f)
+    if cprof:
+        cprof.dump_stats(args.cprofile)
+    return result
+
+
+def main():
+    sys.exit(run())
 
 
 if __name__ == "__main__":
@@ -1,16 +1,232 @@
-"""Operation modules for image-tools. Each module registers subcommands."""
+"""Operation modules for image-tools.
+
+Subcommands and their arguments are declared in the static COMMANDS table so
+the CLI can be built without importing any op module. A module (and Pillow,
+numpy, ...) is only imported when one of its subcommands actually runs.
+"""
 
 import importlib
-import pkgutil
-import os
+
+
+def _arg(*flags, **kwargs):
+    return flags, kwargs
+
+
+_INPUT_FILE = _arg("input", help="Image file")
+_INPUT_BATCH = _arg("input", help="Image file or directory")
+_OUTPUT = _arg("-o", "--output", help="Output path")
+_JOBS = _arg("--jobs", "-j", type=int, help="Parallel workers for directory input (default: CPU count)")
+_NO_CACHE = _arg("--no-cache", action="store_true", help="Bypass the result cache")
+_MAX_MEMORY = _arg("--max-memory", metavar="SIZE",
+                   help="Run the chroma key / compositing in row strips to bound working memory, e.g. 256M "
+                        "(default: IMAGE_TOOLS_MAX_MEMORY)")
+_FULL_DECODE = _arg("--full-decode", action="store_true",
+                    help="Decode and resample at full resolution (no reduced JPEG decode or integer pre-reduce)")
+_READERS = _arg("--jobs", "-j", type=int, help="Parallel reader threads (default: 4x CPU count, max 32)")
+# Directory input discovery (see ops/_scan.py)
+_SCAN = [
+    _arg("--recursive", "-r", action="store_true", help="Descend into subdirectories"),
+    _arg("--include", action="append", metavar="GLOB",
+         help="Only files matching GLOB (name or relative path), repeatable"),
+    _arg("--exclude", action="append", metavar="GLOB",
+         help="Skip files and directories matching GLOB (name or relative path), repeatable"),
+    _arg("--symlinks", choices=["skip", "files", "follow"], default="files",
+         help="Symlink policy: skip, files (default: follow links to files only) or follow (also directories)"),
+]
+_TARGETS = [
+    _arg("--target-ssim", type=float, metavar="S",
+         help="Smallest encoding whose SSIM against the source is at least S, e.g. 0.98"),
+    _arg("--target-psnr", type=float, metavar="DB",
+         help="Smallest encoding whose PSNR against the source is at least DB, e.g. 40"),
+]
+_INCREMENTAL = _arg("--incremental", action="store_true",
+                    help="Skip inputs unchanged since the last --incremental run (manifest in the output directory)"
+                         " and delete outputs of removed inputs")
+_OUTPUT_DIR = _arg("--output-dir", metavar="DIR",
+                   help="Write outputs under DIR, mirroring the input directory layout (default: next to inputs)")
+
+# Deterministic per-file commands the dispatcher runs through the result cache
+CACHEABLE = {"alpha", "compress", "convert", "pipeline", "resize", "thumbnail"}
+
+# subcommand -> (ops module, handler function, help, arguments)
+COMMANDS = {
+    "alpha": ("alpha", "cmd_alpha", "Manage alpha channel", [
+        _INPUT_FILE,
+        _OUTPUT,
+        _arg("--add", action="store_true", help="Add alpha channel"),
+        _arg("--remove", action="store_true", help="Remove alpha (flatten)"),
+        _arg("--background", help="Background color for --remove as R,G,B (default: white)"),
+        _arg("--transparent", help="Make color transparent as R,G,B"),
+        _arg("--tolerance", type=int, default=0, help="Color match tolerance (0-255)"),
+        _arg("--feather", type=int, default=0, help="Feather radius for antialiased edges (0-255, default: 0)"),
+        _MAX_MEMORY,
+        _NO_CACHE,
+    ]),
+    "cache": ("cache", "cmd_cache", "Inspect or prune the result cache", [
+        _arg("action", choices=["stats", "prune", "clear"], help="stats, prune (LRU to --max-size) or clear"),
+        _arg("--max-size", help="Size bound for prune, e.g. 500M (default: IMAGE_TOOLS_CACHE_SIZE or 1G)"),
+        _arg("--dir", help="Cache directory (default: IMAGE_TOOLS_CACHE_DIR or ~/.cache/image-tools)"),
+    ]),
+    "composite": ("alpha", "cmd_composite", "Overlay images", [
+        _arg("base", help="Base image file"),
+        _arg("overlay", help="Overlay image file"),
+        _OUTPUT,
+        _arg("--position", default="center", help="Position: center or X,Y"),
+        _arg("--overlay-size", help="Resize overlay to WxH before compositing"),
+        _MAX_MEMORY,
+    ]),
+    "derivatives": ("derivatives", "cmd_derivatives", "Responsive sizes x formats from one decode", [
+        _INPUT_BATCH,
+        _arg("--widths", "-w", default="320,640,1280,2560",
+             help="Comma-separated target widths; wider than the source are skipped (default: 320,640,1280,2560)"),
+        _arg("--formats", "-f", default="webp,jpg", help="Comma-separated output formats (default: webp,jpg)"),
+        _arg("--quality", "-q", type=int, help="Quality 1-100 (for JPEG/WebP)"),
+        _arg("--manifest", metavar="PATH",
+             help="JSON manifest path (default: derivatives.json in the output directory)"),
+        _arg("--threads", type=int, help="Encoder threads per image (default: CPU count, shared among --jobs workers)"),
+        _FULL_DECODE,
+        *_SCAN,
+        _OUTPUT_DIR,
+        _JOBS,
+    ]),
+    "info": ("analyze", "cmd_info", "Show image info", [
+        _INPUT_BATCH,
+        _arg("--json", action="store_true", help="Output as JSON lines, streamed as files complete"),
+        _arg("--quality", action="store_true",
+             help="Also compute sharpness, contrast, histogram spread and entropy (decodes pixels)"),
+        *_SCAN,
+        _READERS,
+    ]),
+    "metadata": ("analyze", "cmd_metadata", "Extract EXIF metadata", [
+        _INPUT_BATCH,
+        _arg("-o", "--output", help="Save to JSON file"),
+        _arg("--jsonl", action="store_true", help="Stream one JSON object per line as files complete"),
+        *_SCAN,
+        _READERS,
+    ]),
+    "convert": ("convert", "cmd_convert", "Convert image format", [
+        _INPUT_BATCH,
+        _arg("--format", "-f", required=True, help="Target format: png, jpg, webp, bmp, tiff, gif"),
+        _arg("--quality", "-q", type=int, help="Quality 1-100 (for JPEG/WebP)"),
+        *_TARGETS,
+        _OUTPUT,
+        *_SCAN,
+        _OUTPUT_DIR,
+        _INCREMENTAL,
+        _JOBS,
+        _NO_CACHE,
+    ]),
+    "compress": ("convert", "cmd_compress", "Compress image", [
+        _INPUT_BATCH,
+        _arg("--quality", "-q", type=int, default=80,
+             help="Quality 1-100 (default: 80); the upper bound of the --max-bytes search"),
+        _arg("--max-bytes", metavar="SIZE",
+             help="Byte budget per file, e.g. 200K: search the highest quality that fits"),
+        _arg("--min-scale", type=float, metavar="PCT",
+             help="With --max-bytes, allow downscaling to PCT percent when quality alone cannot fit"),
+        *_TARGETS,
+        _OUTPUT,
+        *_SCAN,
+        _OUTPUT_DIR,
+        _INCREMENTAL,
+        _JOBS,
+        _NO_CACHE,
+    ]),
+    "crop": ("crop", "cmd_crop", "Crop image", [
+        _INPUT_FILE,
+        _OUTPUT,
+        _arg("--box", help="Crop box as left,top,right,bottom"),
+        _arg("--center", help="Center crop as WxH"),
+    ]),
+    "trim": ("crop", "cmd_trim", "Auto-trim borders", [
+        _INPUT_FILE,
+        _OUTPUT,
+        _arg("--color", help="Background color to trim as R,G,B (default: sample corner)"),
+    ]),
+    "pad": ("crop", "cmd_pad", "Pad image to target size", [
+        _INPUT_FILE,
+        _arg("--size", required=True, help="Target size as WxH"),
+        _arg("--color", help="Padding color as R,G,B (default: 255,255,255)"),
+        _OUTPUT,
+    ]),
+    "pipeline": ("pipeline", "cmd_pipeline", "Chain ops in memory (one decode, one save)", [
+        _INPUT_BATCH,
+        _arg("--step", "-s", action="append", required=True, metavar="'OP [FLAGS]'",
+             help="Step to apply, repeatable, in order. OP is one of: "
+                  "crop, trim, pad, resize, rotate, flip, alpha, convert"),
+        _arg("-o", "--output", help="Output path (default: <name>_pipeline.<ext>)"),
+        *_SCAN,
+        _OUTPUT_DIR,
+        _INCREMENTAL,
+        _JOBS,
+        _MAX_MEMORY,
+        _NO_CACHE,
+    ]),
+    "resize": ("resize", "cmd_resize", "Resize image(s)", [
+        _INPUT_BATCH,
+        _OUTPUT,
+        _arg("--width", type=int, help="Target width (px)"),
+        _arg("--height", type=int, help="Target height (px)"),
+        _arg("--scale", type=float, help="Scale percentage (e.g. 50 for half)"),
+        _arg("--overwrite", action="store_true", help="Overwrite input file"),
+        _FULL_DECODE,
+        *_SCAN,
+        _OUTPUT_DIR,
+        _INCREMENTAL,
+        _JOBS,
+        _NO_CACHE,
+    ]),
+    "thumbnail": ("resize", "cmd_thumbnail", "Generate thumbnail", [
+        _INPUT_BATCH,
+        _arg("--size", required=True, help="Max size as WxH or W (e.g. 200x200)"),
+        _OUTPUT,
+        _FULL_DECODE,
+        *_SCAN,
+        _OUTPUT_DIR,
+        _INCREMENTAL,
+        _JOBS,
+        _NO_CACHE,
+    ]),
+    "rotate": ("transform", "cmd_rotate", "Rotate image", [
+        _INPUT_FILE,
+        _arg("--degrees", "-d", type=float, required=True, help="Rotation angle in degrees (CCW)"),
+        _arg("--no-expand", action="store_true", help="Don't expand canvas to fit rotated image"),
+        _OUTPUT,
+    ]),
+    "flip": ("transform", "cmd_flip", "Flip image", [
+        _INPUT_FILE,
+        _arg("--direction", "-d", required=True, help="Flip direction: h/horizontal or v/vertical"),
+        _OUTPUT,
+    ]),
+}
+
+
+class LazyCommand:
+    """Subcommand handler that imports ops.<module> on first call.
+
+    A plain class (not a closure) so parsed args stay picklable for process pools.
+    """
+
+    def __init__(self, module, func):
+        self.module = module
+        self.func = func
+
+    def __call__(self, args):
+        module = importlib.import_module(f"ops.{self.module}")
+        return getattr(module, self.func)(args)
+
+
+def add_command(subparsers, name):
+    """Add one subcommand from the COMMANDS table."""
+    module, func, help_text, arguments = COMMANDS[name]
+    p = subparsers.add_parser(name, help=help_text)
+    for flags, kwargs in arguments:
+        p.add_argument(*flags, **kwargs)
+    p.set_defaults(func=LazyCommand(module, func))
+    return p
 
 
 def register_all(subparsers):
-    """Auto-discover and register all ops modules."""
-    ops_dir = os.path.dirname(__file__)
-    for finder, name, ispkg in pkgutil.iter_modules([ops_dir]):
-        if name.startswith("_"):
-            continue
-        module = importlib.import_module(f"ops.{name}")
-        if hasattr(module, "register"):
-            module.register(subparsers)
+    """Register every subcommand without importing the op modules."""
+    for name in COMMANDS:
+        add_command(subparsers, name)
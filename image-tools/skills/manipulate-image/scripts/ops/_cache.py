@@ -0,0 +1,261 @@
+"""Content-addressed result cache for deterministic per-file operations.
+
+Entries are keyed by sha256(input content) + operation + normalized arguments
++ CACHE_VERSION and the Pillow version, so a release that changes an op's output
+bytes does not serve results computed by the previous one.
+Input hashes are remembered per (device, inode, size, mtime), so unchanged files
+are not re-read. A hit hardlinks (or copies) the cached output into place
+instead of recomputing it. Total blob size is bounded with LRU eviction.
+
+The cache is on by default and keeps a copy of every output it stores.
+
+Settings (environment):
+    IMAGE_TOOLS_CACHE=0          disable the cache
+    IMAGE_TOOLS_CACHE_DIR        location (default: $XDG_CACHE_HOME/image-tools)
+    IMAGE_TOOLS_CACHE_SIZE       size bound, e.g. 500M, 2G (default: 1G)
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+
+import PIL
+
+from ops._scan import output_base
+from ops._units import parse_bytes
+
+DEFAULT_MAX_BYTES = 1 << 30
+
+# Part of every key: bump whenever a change to an op alters its output bytes
+CACHE_VERSION = 3
+
+# Namespace attributes that never change the output bytes
+_IGNORED_ARGS = {"input", "output", "func", "jobs", "verbose", "no_cache", "cache", "parsed_steps", "max_memory",
+                 "profile", "profile_json", "trace", "cprofile", "profiler",
+                 "recursive", "include", "exclude", "symlinks", "output_dir", "incremental"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    out_suffix TEXT,
+    message TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    blob_mtime_ns INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used);
+CREATE TABLE IF NOT EXISTS inputs (
+    dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (dev, ino)
+);
+CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+_INPUT_TOKEN = "\0input\0"
+_OUTPUT_TOKEN = "\0output\0"
+
+
+def output_args(args):
+    """The parsed arguments that can change an operation's output bytes."""
+    return {k: v for k, v in sorted(vars(args).items()) if k not in _IGNORED_ARGS}
+
+
+def default_cache_dir():
+    if os.environ.get("IMAGE_TOOLS_CACHE_DIR"):
+        return os.environ["IMAGE_TOOLS_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "image-tools")
+
+
+def enabled():
+    return os.environ.get("IMAGE_TOOLS_CACHE", "1").lower() not in ("0", "false", "no", "off")
+
+
+class ResultCache:
+    """On-disk cache. Picklable: each process opens its own sqlite connection."""
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root or default_cache_dir()
+        if max_bytes is None:
+            max_bytes = parse_bytes(os.environ.get("IMAGE_TOOLS_CACHE_SIZE", DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self._db = None
+
+    def __getstate__(self):
+        return {"root": self.root, "max_bytes": self.max_bytes, "_db": None}
+
+    @property
+    def db(self):
+        if self._db is None:
+            os.makedirs(os.path.join(self.root, "blobs"), exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.root, "index.sqlite"), timeout=30, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def _blob_path(self, key):
+        return os.path.join(self.root, "blobs", key[:2], key)
+
+    def _bump(self, name):
+        self.db.execute(
+            "INSERT INTO stats (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,))
+
+    # ─── Keys ────────────────────────────────────────────────────────────────
+
+    def input_hash(self, filepath):
+        """sha256 of the file, reusing the stored hash while inode/size/mtime match."""
+        st = os.stat(filepath)
+        row = self.db.execute(
+            "SELECT sha256 FROM inputs WHERE dev = ? AND ino = ? AND size = ? AND mtime_ns = ?",
+            (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)).fetchone()
+        if row:
+            return row[0]
+
+        h = hashlib.sha256()
+        with open(filepath, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        self.db.execute(
+            "INSERT OR REPLACE INTO inputs (dev, ino, size, mtime_ns, sha256) VALUES (?, ?, ?, ?, ?)",
+            (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, digest))
+        return digest
+
+    def key(self, filepath, args):
+        params = output_args(args)
+        # Outputs named from the input path only differ by directory, which
+        # fetch() re-derives; the input extension still matters (compress)
+        params["input_ext"] = os.path.splitext(filepath)[1].lower()
+        payload = json.dumps([CACHE_VERSION, PIL.__version__, self.input_hash(filepath), params],
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    # ─── Lookup / store ──────────────────────────────────────────────────────
+
+    def fetch(self, key, filepath, output, base=None):
+        """Place the cached output for key. Returns (out, message) or None on a miss.
+
+        base is the path default output names derive from (filepath, or its
+        mirror under --output-dir).
+        """
+        row = self.db.execute(
+            "SELECT out_suffix, message, size, blob_mtime_ns FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._bump("misses")
+            return None
+
+        out_suffix, message, size, blob_mtime_ns = row
+        if out_suffix is None and not output:
+            # Stored from a run with -o: the default output name is unknown
+            self._bump("misses")
+            return None
+        blob = self._blob_path(key)
+        try:
+            st = os.stat(blob)
+        except FileNotFoundError:
+            st = None
+        if st is None or st.st_size != size or st.st_mtime_ns != blob_mtime_ns:
+            # Blob vanished or was written through a hardlinked output
+            self._evict(key)
+            self._bump("misses")
+            return None
+
+        out = output or os.path.splitext(base or filepath)[0] + out_suffix
+        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+        if os.path.lexists(out):
+            os.unlink(out)  # never write through an existing inode
+        try:
+            os.link(blob, out)
+        except OSError:
+            shutil.copyfile(blob, out)
+
+        self.db.execute("UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+        self._bump("hits")
+        message = message.replace(_OUTPUT_TOKEN, out).replace(_INPUT_TOKEN, filepath)
+        return out, message
+
+    def store(self, key, filepath, output, out, message, base=None):
+        """Copy a freshly written output into the cache."""
+        out_suffix = None
+        if not output:
+            base = os.path.splitext(base or filepath)[0]
+            if not out.startswith(base):
+                return
+            out_suffix = out[len(base):]
+
+        blob = self._blob_path(key)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        tmp = f"{blob}.{os.getpid()}.tmp"
+        shutil.copyfile(out, tmp)
+        os.replace(tmp, blob)
+        st = os.stat(blob)
+
+        template = message.replace(out, _OUTPUT_TOKEN).replace(filepath, _INPUT_TOKEN)
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries (key, out_suffix, message, size, blob_mtime_ns, created, last_used)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, out_suffix, template, st.st_size, st.st_mtime_ns, now, now))
+        self.prune(self.max_bytes)
+
+    def run(self, worker, filepath, args):
+        """Cached worker(filepath, args) -> (out, message)."""
+        key = self.key(filepath, args)
+        base = output_base(filepath, args)
+        hit = self.fetch(key, filepath, args.output, base)
+        if hit:
+            return hit
+        out, message = worker(filepath, args)
+        self.store(key, filepath, args.output, out, message, base)
+        return out, message
+
+    # ─── Maintenance ─────────────────────────────────────────────────────────
+
+    def _evict(self, key):
+        self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        try:
+            os.unlink(self._blob_path(key))
+        except FileNotFoundError:
+            pass
+
+    def prune(self, max_bytes):
+        """Evict least recently used entries until the total is under max_bytes."""
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        evicted = 0
+        if total <= max_bytes:
+            return evicted
+        for key, size in self.db.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            if total <= max_bytes:
+                break
+            self._evict(key)
+            total -= size
+            evicted += 1
+        return evicted
+
+    def stats(self):
+        entries, total = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        counters = dict(self.db.execute("SELECT name, value FROM stats").fetchall())
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "dir": self.root,
+            "entries": entries,
+            "size_bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+            "hashed_inputs": self.db.execute("SELECT COUNT(*) FROM inputs").fetchone()[0],
+        }
+
+    def clear(self):
+        count = self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        self.db.executescript("DELETE FROM entries; DELETE FROM inputs; DELETE FROM stats;")
+        shutil.rmtree(os.path.join(self.root, "blobs"), ignore_errors=True)
+        return count
@@ -0,0 +1,273 @@
+"""In-memory encoding searches: compress --max-bytes and --target-ssim/--target-psnr.
+
+fit_bytes() encodes a decoded image into BytesIO buffers until it finds the
+highest quality whose output fits the budget, so the caller writes a single
+file. Attempts, in order of cost to the picture:
+
+    quality      binary search over [MIN_QUALITY, max quality] (JPEG, WebP)
+    subsampling  a 4:4:4 JPEG source keeps 4:4:4 down to quality
+                 FULL_CHROMA_QUALITY, below that 4:2:0 is searched
+    scale        only with a min scale below 1: shrink by the square root of
+                 the size ratio and search again, down to min scale
+
+The search starts at BYTES_START_QUALITY, stops early once an attempt fits
+within EARLY_EXIT of the budget, and a miss at the first quality tries the
+lowest next (so hopeless searches end after two encodes). Every file starts
+from the same quality, so its result does not depend on which files a batch
+worker handled before it (results are cached per file).
+
+fit_target() instead looks for the lowest quality (JPEG, WebP) or palette
+size (PNG, GIF) whose decoded result still scores the target SSIM or PSNR
+against the source (see ops/_metrics.py), starting from TARGET_START_QUALITY.
+"""
+
+import math
+from io import BytesIO
+from PIL import Image
+
+MIN_QUALITY = 20
+
+# Below this quality, chroma subsampling costs less than further quality loss
+FULL_CHROMA_QUALITY = 75
+
+# Accept an attempt using at least this share of the budget without
+# narrowing the quality interval further
+EARLY_EXIT = 0.9
+
+# Formats with a quality setting; the others only get optimize and scale
+QUALITY_FORMATS = ("JPEG", "WEBP")
+
+# First quality tried by fit_bytes(): typical web budgets land near it
+BYTES_START_QUALITY = 75
+
+
+def save_kwargs(pil_format, quality):
+    """Image.save() settings for --quality in convert, pipeline and derivatives."""
+    kwargs = {}
+    if quality and pil_format in QUALITY_FORMATS:
+        kwargs["quality"] = quality
+    if pil_format == "PNG" and quality:
+        kwargs["compress_level"] = min(9, max(0, (100 - quality) // 10))
+    return kwargs
+
+
+def encode(img, pil_format, **kwargs):
+    """img encoded as pil_format, as bytes."""
+    buf = BytesIO()
+    img.save(buf, pil_format, **kwargs)
+    return buf.getvalue()
+
+
+def _subsamplings(img, pil_format):
+    if pil_format != "JPEG":
+        return [None]
+    if getattr(img, "format", None) == "JPEG":
+        from PIL import JpegImagePlugin
+        if JpegImagePlugin.get_sampling(img) == 0:
+            return [0, 2]
+    return [2]
+
+
+def search_quality(encode_at, max_bytes, lo, hi, start=None):
+    """Highest quality in [lo, hi] whose encode_at(quality) fits max_bytes.
+
+    Returns (quality, data, attempts, smallest): quality and data are None
+    when even lo is too large, smallest is the least byte count seen. Sizes
+    are assumed to grow with quality.
+    """
+    best_q, best, attempts, smallest = None, None, 0, None
+    q = hi if start is None else min(max(start, lo), hi)
+    first = True
+    while lo <= hi:
+        data = encode_at(q)
+        attempts += 1
+        smallest = min(smallest or len(data), len(data))
+        if len(data) <= max_bytes:
+            best_q, best = q, data
+            if len(data) >= max_bytes * EARLY_EXIT:
+                break
+            lo = q + 1
+        else:
+            hi = q - 1
+            if first and lo < hi:
+                q, first = lo, False
+                continue
+        first = False
+        q = (lo + hi + 1) // 2
+    return best_q, best, attempts, smallest
+
+
+def fit_bytes(img, pil_format, max_bytes, max_quality=80, min_scale=1.0):
+    """Encode img as pil_format within max_bytes.
+
+    Returns (data, settings) with settings {"quality", "subsampling",
+    "scale", "size", "attempts"}. Raises ValueError when no attempt down to
+    MIN_QUALITY and min_scale fits.
+    """
+    attempts = 0
+    scale, frame = 1.0, img
+    while True:
+        smallest = None
+        for subsampling in _subsamplings(img, pil_format):
+            if pil_format in QUALITY_FORMATS:
+                kwargs = {"optimize": True} if pil_format == "JPEG" else {}
+                if subsampling is not None:
+                    kwargs["subsampling"] = subsampling
+
+                def encode_at(quality):
+                    return encode(frame, pil_format, quality=quality, **kwargs)
+
+                lo, hi = min(MIN_QUALITY, max_quality), max_quality
+                if subsampling == 0:
+                    lo = min(max(lo, FULL_CHROMA_QUALITY), hi)
+                quality, data, n, least = search_quality(encode_at, max_bytes, lo, hi, BYTES_START_QUALITY)
+                attempts += n
+                if data is None:
+                    smallest = min(smallest or least, least)
+                    continue
+            else:
+                quality, data = None, encode(frame, pil_format, optimize=True)
+                attempts += 1
+                if len(data) > max_bytes:
+                    smallest = min(smallest or len(data), len(data))
+                    continue
+            sampling = {0: "4:4:4", 2: "4:2:0"}.get(subsampling)
+            return data, {"quality": quality, "subsampling": sampling, "scale": round(scale, 3),
+                          "size": frame.size, "attempts": attempts}
+
+        if scale <= min_scale:
+            raise ValueError(f"cannot fit {max_bytes:,}B: smallest attempt is {smallest:,}B"
+                             f" at {frame.size[0]}x{frame.size[1]}"
+                             + ("" if min_scale < 1 else " (allow downscaling with --min-scale)"))
+        # Encoded size is roughly proportional to the pixel count
+        scale = max(min_scale, scale * math.sqrt(max_bytes / smallest) * 0.9)
+        size = (max(1, round(img.size[0] * scale)), max(1, round(img.size[1] * scale)))
+        frame = img.resize(size, Image.LANCZOS, reducing_gap=2.0)
+
+
+# ─── Perceptual targets ──────────────────────────────────────────────────────
+
+# A passing attempt this close to the target ends the search
+TARGET_SLACK = {"ssim": 0.002, "psnr": 0.25}
+
+# First quality tried by fit_target()
+TARGET_START_QUALITY = 75
+
+# Initial stride when bracketing the target from the start setting
+GALLOP_STEP = 4
+
+# Palette formats: quantized encodes are searched over the color count
+PALETTE_FORMATS = ("PNG", "GIF")
+
+
+def search_target(encode_at, score_at, target, slack, lo, hi, start=None):
+    """Lowest setting in [lo, hi] whose encoding scores at least target.
+
+    Steps away from start in doubling strides until the answer is bracketed,
+    then bisects, so a start near the answer costs few encodes.
+    Returns (setting, data, score, attempts). When no setting reaches the
+    target, hi is returned with its score. Scores are assumed to grow with
+    the setting.
+    """
+    tried = {}
+
+    def passes(q):
+        if q not in tried:
+            data = encode_at(q)
+            tried[q] = (q, data, score_at(data))
+        return tried[q][2] >= target
+
+    def close(q):
+        return tried[q][2] <= target + slack
+
+    q = min(max(start if start is not None else hi, lo), hi)
+    step = GALLOP_STEP
+    if passes(q):
+        hi = q
+        while hi > lo and not close(hi):
+            q = max(lo, hi - step)
+            if not passes(q):
+                lo = q + 1
+                break
+            hi, step = q, step * 2
+    else:
+        while True:
+            lo = q + 1
+            if lo > hi:
+                return tried[hi] + (len(tried),)
+            q = min(hi, q + step)
+            if passes(q):
+                hi = q
+                break
+            step *= 2
+    while lo < hi and not close(hi):
+        mid = (lo + hi) // 2
+        if passes(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    return tried[hi] + (len(tried),)
+
+
+def _has_alpha(img):
+    return img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+
+
+def fit_target(img, pil_format, metric, target):
+    """Smallest-setting encoding of img whose metric ("ssim" or "psnr") reaches target.
+
+    JPEG and WebP search quality (JPEG keeps 4:4:4 chroma from
+    FULL_CHROMA_QUALITY up); PNG and GIF search a palette size. WebP and PNG
+    fall back to lossless when the top setting misses the target. Returns (data, settings)
+    with settings {"quality", "colors", "lossless", "metric", "score", "met",
+    "attempts"}.
+    """
+    from ops import _metrics
+
+    alpha = _has_alpha(img)
+    size = _metrics.comparison_size(img.size)
+    ref = _metrics.comparison_array(img, size, alpha)
+    scorer = _metrics.SCORERS[metric]
+
+    def score_at(data):
+        with Image.open(BytesIO(data)) as decoded:
+            return scorer(ref, _metrics.comparison_array(decoded, size, alpha))
+
+    settings = {"quality": None, "colors": None, "lossless": False, "metric": metric}
+    slack = TARGET_SLACK[metric]
+    if pil_format in QUALITY_FORMATS:
+        source = img.convert("RGB") if pil_format == "JPEG" and img.mode not in ("RGB", "L", "CMYK") else img
+        kwargs = {"optimize": True} if pil_format == "JPEG" else {}
+
+        def encode_at(quality):
+            if pil_format == "JPEG":
+                kwargs["subsampling"] = 0 if quality >= FULL_CHROMA_QUALITY else 2
+            return encode(source, pil_format, quality=quality, **kwargs)
+
+        quality, data, score, attempts = search_target(
+            encode_at, score_at, target, slack, MIN_QUALITY, 100, TARGET_START_QUALITY)
+        settings["quality"] = quality
+        if score < target and pil_format == "WEBP":
+            data = encode(img, pil_format, lossless=True)
+            attempts += 1
+            score, settings["quality"], settings["lossless"] = score_at(data), None, True
+    elif pil_format in PALETTE_FORMATS:
+        source = img.convert("RGBA" if alpha else "RGB")
+        method = Image.Quantize.FASTOCTREE if alpha else Image.Quantize.MEDIANCUT
+
+        def encode_at(colors):
+            return encode(source.quantize(colors, method=method), pil_format, optimize=True)
+
+        colors, data, score, attempts = search_target(encode_at, score_at, target, slack, 2, 256, 64)
+        settings["colors"] = colors
+        if score < target and pil_format == "PNG":
+            lossless = encode(img, pil_format, optimize=True)
+            attempts += 1
+            data, score, settings["colors"] = lossless, score_at(lossless), None
+            settings["lossless"] = True
+    else:
+        data = encode(img, pil_format)
+        score, attempts = score_at(data), 1
+        settings["lossless"] = True
+    settings.update(score=round(score, 4), met=score >= target, attempts=attempts)
+    return data, settings
@@ -0,0 +1,161 @@
+"""Multi-frame (animated GIF, WebP, APNG) support shared by the ops.
+
+apply(img, fn) runs a per-image operation on a still as before, and on an
+animated image runs it on every frame in a thread pool (Pillow releases the
+GIL in resampling, rotation and mode conversion), returning an Animation.
+Frames are decoded as full composited canvases in one mode, so any
+operation that works on a still works on a frame.
+
+Animation.save() writes all frames with the source's per-frame durations,
+loop count and (GIF to GIF) disposal methods. Identical consecutive frames,
+common after a downscale or a crop, are merged into one frame with the sum
+of their durations. Formats without animation get the first frame.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageSequence
+
+from ops._parallel import worker_threads
+
+# Pillow formats that can store multiple frames with timing
+ANIMATED_FORMATS = {"GIF", "WEBP", "PNG"}
+
+DEFAULT_DURATION = 100
+
+
+def _has_alpha(img):
+    return img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+
+
+def is_animated(img):
+    return getattr(img, "is_animated", False) and getattr(img, "n_frames", 1) > 1
+
+
+class Animation:
+    """Decoded frames of an animated image plus their timing."""
+
+    def __init__(self, frames, durations, disposals, info, source_format):
+        self.frames = frames
+        self.durations = durations
+        self.disposals = disposals
+        self.info = info
+        self.format = source_format
+
+    @classmethod
+    def open(cls, img):
+        """Decode every frame of img (composited, one shared mode)."""
+        raw, durations, disposals = [], [], []
+        for frame in ImageSequence.Iterator(img):
+            copy = frame.copy()  # Loads the frame, which sets its duration (WebP)
+            durations.append(copy.info.get("duration", DEFAULT_DURATION))
+            disposals.append(getattr(frame, "disposal_method", 0))
+            raw.append(copy)
+        mode = "RGBA" if any(_has_alpha(f) for f in raw) else "RGB"
+        frames = [f if f.mode == mode else f.convert(mode) for f in raw]
+        info = {k: img.info[k] for k in ("loop", "background") if k in img.info}
+        return cls(frames, durations, disposals, info, img.format)
+
+    @property
+    def size(self):
+        return self.frames[0].size
+
+    @property
+    def mode(self):
+        return self.frames[0].mode
+
+    def _with_frames(self, frames):
+        return Animation(frames, self.durations, self.disposals, self.info, self.format)
+
+    def map_values(self, fn, jobs=None):
+        """[fn(frame) for every frame], computed in a thread pool.
+
+        Inside a batch worker process only that worker's share of the CPUs
+        is used: the batch already spreads files over them.
+        """
+        jobs = min(jobs or worker_threads(), len(self.frames))
+        if jobs == 1:
+            return [fn(frame) for frame in self.frames]
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            return list(pool.map(fn, self.frames))
+
+    def map(self, fn, jobs=None):
+        """New Animation with fn(frame) -> image applied to every frame."""
+        frames = self.map_values(fn, jobs)
+        if len({f.size for f in frames}) > 1:
+            raise ValueError("operation produced frames of different sizes")
+        return self._with_frames(frames)
+
+    # Image-like helpers, so size/mode-agnostic code can take either
+    def convert(self, mode):
+        return self if mode == self.mode else self.map(lambda f: f.convert(mode))
+
+    def resize(self, size, *args, **kwargs):
+        return self.map(lambda f: f.resize(size, *args, **kwargs))
+
+    def crop(self, box):
+        return self.map(lambda f: f.crop(box))
+
+    def deduplicated(self):
+        """(frames, durations, disposals) with identical consecutive frames merged."""
+        frames, durations, disposals = [], [], []
+        previous = None
+        for frame, duration, disposal in zip(self.frames, self.durations, self.disposals):
+            data = frame.tobytes()
+            if data == previous:
+                durations[-1] += duration
+                disposals[-1] = disposal
+                continue
+            previous = data
+            frames.append(frame)
+            durations.append(duration)
+            disposals.append(disposal)
+        return frames, durations, disposals
+
+    def save(self, fp, format=None, **params):
+        """Save like Image.save: all frames where the format supports it."""
+        if format is None:
+            ext = str(fp).rsplit(".", 1)[-1].lower()
+            format = Image.registered_extensions().get(f".{ext}")
+        format = (format or "").upper()
+        if format not in ANIMATED_FORMATS:
+            return self.frames[0].save(fp, format or None, **params)
+
+        frames, durations, disposals = self.deduplicated()
+        if format == "GIF" and self.mode == "RGB":
+            # Pillow's default median cut palette dominates GIF encoding; the octree
+            # one is about 20 times faster per frame for a slightly coarser palette
+            frames = self._with_frames(frames).map_values(
+                lambda f: f.quantize(256, method=Image.Quantize.FASTOCTREE))
+        params.update(save_all=True, append_images=frames[1:], duration=durations)
+        if "loop" in self.info:
+            params.setdefault("loop", self.info["loop"])
+        elif format == "WEBP":
+            params.setdefault("loop", 1)  # A GIF without a loop count plays once
+        if format == self.format == "WEBP" and "background" in self.info:
+            # A GIF background is an index into a palette the re-encode replaces
+            params.setdefault("background", self.info["background"])
+        if format == "GIF":
+            if self.format == "GIF":
+                params.setdefault("disposal", disposals)
+            else:
+                # Full frames: clear to background when transparency would show the previous one
+                params.setdefault("disposal", 2 if self.mode == "RGBA" else 1)
+        return frames[0].save(fp, format, **params)
+
+
+def open_frames(img):
+    """An Animation for an animated img, otherwise img itself."""
+    return Animation.open(img) if is_animated(img) else img
+
+
+def apply(img, fn, pil_format=None):
+    """fn(img) for a still; for an animated image (or Animation) fn on every frame.
+
+    With pil_format set to a format that cannot animate, only the first
+    frame is processed.
+    """
+    if isinstance(img, Image.Image):
+        if not is_animated(img) or (pil_format and pil_format not in ANIMATED_FORMATS):
+            return fn(img)
+        img = Animation.open(img)
+    return img.map(fn)
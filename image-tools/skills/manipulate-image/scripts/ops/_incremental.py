@@ -0,0 +1,194 @@
+"""Incremental batches (--incremental): skip inputs that are unchanged since the last run.
+
+A manifest (sqlite, MANIFEST_NAME in the output directory) records for each
+(command, source) pair the source's size, mtime and sha256, the arguments
+that shape the output, and the output path. On the next run a source is
+skipped when its size and mtime still match (or, after a touch, its content
+hash does), its arguments are unchanged and its output still exists; only
+the remaining files reach the worker pool. Outputs of sources that no
+longer exist, and outputs replaced under a new name after an argument
+change, are deleted.
+
+Paths are stored relative to the input directory (sources) and to the
+manifest directory (outputs), so the tree can be moved as a whole. Use one
+output directory per command configuration: two different resize runs
+sharing a directory would replace each other's outputs.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from ops._cache import output_args
+
+MANIFEST_NAME = ".image-tools-manifest.sqlite"
+
+# Results recorded between commits (crash safety vs write amplification)
+_COMMIT_EVERY = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    command TEXT NOT NULL,
+    source TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    args TEXT NOT NULL,
+    output TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (command, source)
+);
+"""
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+class Manifest:
+    """The manifest of one command's runs into one output directory."""
+
+    def __init__(self, args):
+        self.command = args.command
+        self.root = args.input if os.path.isdir(args.input) else os.path.dirname(args.input) or "."
+        self.dir = getattr(args, "output_dir", None) or self.root
+        os.makedirs(self.dir, exist_ok=True)
+        self.path = os.path.join(self.dir, MANIFEST_NAME)
+        self.db = sqlite3.connect(self.path, timeout=30)
+        self.db.executescript(_SCHEMA)
+        self.signature = json.dumps(output_args(args), sort_keys=True, default=str)
+        self.records = {
+            source: (size, mtime_ns, sha256, signature, output)
+            for source, size, mtime_ns, sha256, signature, output in self.db.execute(
+                "SELECT source, size, mtime_ns, sha256, args, output FROM files WHERE command = ?",
+                (self.command,))
+        }
+        self.pending = 0
+        # Outputs written next to their inputs must not become inputs themselves
+        self.outputs = {os.path.normpath(self.output_path(record[4])) for record in self.records.values()}
+
+    def is_output(self, filepath):
+        return os.path.normpath(filepath) in self.outputs
+
+    def source_key(self, filepath):
+        return os.path.relpath(filepath, self.root)
+
+    def output_path(self, stored):
+        return os.path.join(self.dir, stored)
+
+    def unchanged(self, filepath):
+        """True when filepath can be skipped; refreshes size/mtime after a touch."""
+        source = self.source_key(filepath)
+        record = self.records.get(source)
+        if record is None:
+            return False
+        size, mtime_ns, sha256, signature, output = record
+        if signature != self.signature or not os.path.exists(self.output_path(output)):
+            return False
+        st = os.stat(filepath)
+        if (st.st_size, st.st_mtime_ns) == (size, mtime_ns):
+            return True
+        if st.st_size != size or _sha256(filepath) != sha256:
+            return False
+        self.records[source] = (st.st_size, st.st_mtime_ns, sha256, signature, output)
+        self.db.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE command = ? AND source = ?",
+                        (st.st_size, st.st_mtime_ns, self.command, source))
+        return True
+
+    def record(self, result):
+        """Store a worker result. Returns the replaced output path if it was deleted."""
+        if not result["ok"]:
+            return None  # The stored size/mtime no longer match, so it is retried next run
+        filepath = result["file"]
+        source = self.source_key(filepath)
+        previous = self.records.pop(source, None)
+        replaced = None
+        st = os.stat(filepath)
+        output = os.path.relpath(result["output"], self.dir)
+        self.db.execute(
+            "INSERT OR REPLACE INTO files (command, source, size, mtime_ns, sha256, args, output, updated)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.command, source, st.st_size, st.st_mtime_ns, _sha256(filepath), self.signature,
+             output, time.time()))
+        self.outputs.add(os.path.normpath(self.output_path(output)))
+        if previous and os.path.normpath(previous[4]) != os.path.normpath(output):
+            if _remove(self.output_path(previous[4])):
+                replaced = self.output_path(previous[4])
+        self.pending += 1
+        if self.pending >= _COMMIT_EVERY:
+            self.db.commit()
+            self.pending = 0
+        return replaced
+
+    def remove_orphans(self, seen):
+        """Delete outputs of sources not seen this run that no longer exist. Returns them."""
+        removed = []
+        for source, record in list(self.records.items()):
+            if source in seen or os.path.exists(os.path.join(self.root, source)):
+                continue
+            if _remove(self.output_path(record[4])):
+                removed.append(self.output_path(record[4]))
+            self.db.execute("DELETE FROM files WHERE command = ? AND source = ?", (self.command, source))
+            del self.records[source]
+        return removed
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+def run_incremental(worker, files, args, on_result=None):
+    """run_pool() over the files that changed since the last --incremental run."""
+    from ops._parallel import run_pool
+
+    manifest = Manifest(args)
+    verbose = getattr(args, "verbose", False)
+    seen = set()
+    counts = {"processed": 0, "unchanged": 0, "removed": 0}
+
+    def changed():
+        for filepath in files:
+            if manifest.is_output(filepath):
+                continue
+            seen.add(manifest.source_key(filepath))
+            if manifest.unchanged(filepath):
+                counts["unchanged"] += 1
+                if verbose:
+                    print(f"{filepath}: unchanged")
+                continue
+            yield filepath
+
+    def record(result):
+        counts["processed"] += 1
+        replaced = manifest.record(result)
+        if replaced:
+            counts["removed"] += 1
+            if verbose:
+                print(f"Removed {replaced} (replaced)")
+        if on_result:
+            on_result(result)
+
+    try:
+        failures = run_pool(worker, changed(), args, record)
+        for path in manifest.remove_orphans(seen):
+            counts["removed"] += 1
+            print(f"Removed {path} (source deleted)")
+    finally:
+        manifest.close()
+    print(f"Incremental: {counts['processed']} processed, {counts['unchanged']} unchanged, "
+          f"{counts['removed']} output(s) removed ({manifest.path})")
+    return failures
@@ -0,0 +1,87 @@
+"""Full-reference similarity scores (SSIM, PSNR) for --target-ssim/--target-psnr.
+
+Both images are compared at a reduced size (long edge METRIC_EDGE, box
+filtered), which keeps a score at a few milliseconds for any input size
+while still seeing compression artifacts. SSIM uses 8x8 uniform windows at
+a stride of 4 (built from 4x4 block sums) on the Y, Cb and Cr planes,
+weighted 0.8/0.1/0.1 so chroma errors (palettes, subsampling) count without
+dominating; with transparency the alpha plane's SSIM is also taken and the
+lower score counts. PSNR is over all channels.
+"""
+
+from PIL import Image
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+METRICS = ("ssim", "psnr")
+
+METRIC_EDGE = 1024
+
+SSIM_WINDOW = 8
+
+# Stabilizers from Wang et al. for 8-bit data
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+
+# BT.601 full-range RGB -> YCbCr, and the SSIM weight of each plane
+_YCBCR = np.array([[0.299, 0.587, 0.114],
+                   [-0.168736, -0.331264, 0.5],
+                   [0.5, -0.418688, -0.081312]]) if HAS_NUMPY else None
+_YCBCR_OFFSET = (0.0, 128.0, 128.0)
+_PLANE_WEIGHTS = (0.8, 0.1, 0.1)
+
+
+def comparison_size(size):
+    """Size both sides of a comparison are reduced to."""
+    w, h = size
+    scale = min(1.0, METRIC_EDGE / max(w, h))
+    return max(SSIM_WINDOW, round(w * scale)), max(SSIM_WINDOW, round(h * scale))
+
+
+def comparison_array(img, size, alpha):
+    """float64 (H, W, C) array of img at size: RGB, plus A when alpha is set."""
+    img = img.convert("RGBA" if alpha else "RGB")
+    if img.size != size:
+        img = img.resize(size, Image.BOX)
+    return np.asarray(img, dtype=np.float64)
+
+
+def _window_mean(a):
+    """Mean over SSIM_WINDOW-square windows at half-window stride."""
+    step = SSIM_WINDOW // 2
+    h, w = a.shape[0] // step * step, a.shape[1] // step * step
+    blocks = a[:h, :w].reshape(h // step, step, w // step, step).sum(axis=(1, 3))
+    return (blocks[:-1, :-1] + blocks[1:, :-1] + blocks[:-1, 1:] + blocks[1:, 1:]) / SSIM_WINDOW ** 2
+
+
+def _ssim_plane(x, y):
+    mx, my = _window_mean(x), _window_mean(y)
+    vx = _window_mean(x * x) - mx * mx
+    vy = _window_mean(y * y) - my * my
+    cov = _window_mean(x * y) - mx * my
+    num = (2 * mx * my + _C1) * (2 * cov + _C2)
+    den = (mx * mx + my * my + _C1) * (vx + vy + _C2)
+    return float((num / den).mean())
+
+
+def ssim(ref, test):
+    """Mean SSIM of two comparison arrays."""
+    ref_planes, test_planes = ref[..., :3] @ _YCBCR.T, test[..., :3] @ _YCBCR.T
+    score = sum(w * _ssim_plane(ref_planes[..., c] + _YCBCR_OFFSET[c], test_planes[..., c] + _YCBCR_OFFSET[c])
+                for c, w in enumerate(_PLANE_WEIGHTS))
+    if ref.shape[-1] == 4:
+        score = min(score, _ssim_plane(ref[..., 3], test[..., 3]))
+    return score
+
+
+def psnr(ref, test):
+    """PSNR in dB of two comparison arrays (capped at 100 for identical input)."""
+    mse = float(np.mean((ref - test) ** 2))
+    return 100.0 if mse == 0 else min(100.0, float(10 * np.log10(255.0 ** 2 / mse)))
+
+
+SCORERS = {"ssim": ssim, "psnr": psnr}
@@ -0,0 +1,172 @@
+"""Process- and thread-pool batch execution shared by the per-file operations."""
+
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from itertools import chain, islice
+
+# Tasks submitted ahead per worker: keeps workers busy without draining a
+# streaming file iterator (or holding every pending result) up front
+_WINDOW_PER_WORKER = 2
+
+
+# Process-pool workers sharing the CPUs; set in each worker by _init_worker
+_pool_workers = 1
+
+
+def default_jobs():
+    """Default worker count: one per CPU."""
+    return os.cpu_count() or 1
+
+
+def _init_worker(workers):
+    global _pool_workers
+    _pool_workers = workers
+
+
+def worker_threads():
+    """Threads one file's work may use: all CPUs in-process, its share inside a pool worker."""
+    return max(1, default_jobs() // _pool_workers)
+
+
+def _call(worker, filepath, args):
+    """Run worker on one file, turning any exception into an error record."""
+    profiler = getattr(args, "profiler", None)
+    if profiler:
+        with profiler.file(filepath) as record:
+            result = _run_worker(worker, filepath, args)
+        result["profile"] = record
+        return result
+    return _run_worker(worker, filepath, args)
+
+
+def _run_worker(worker, filepath, args):
+    cache = getattr(args, "cache", None)
+    try:
+        if cache:
+            out, message = cache.run(worker, filepath, args)
+        else:
+            out, message = worker(filepath, args)
+        return {"file": filepath, "ok": True, "output": out, "message": message}
+    except Exception as e:
+        return {"file": filepath, "ok": False, "error": f"{type(e).__name__}: {e}"}
+
+
+def _print_result(result, args, on_result=None):
+    profiler = getattr(args, "profiler", None)
+    if profiler:
+        profiler.add(result.pop("profile", None))
+    if on_result:
+        on_result(result)
+    if result["ok"]:
+        print(result["message"])
+    else:
+        print(f"Error: {result['file']}: {result['error']}")
+
+
+def _peek_jobs(files, jobs):
+    """(files, jobs) with jobs capped by the file count, consuming at most jobs items."""
+    files = iter(files)
+    head = list(islice(files, jobs))
+    return chain(head, files), max(1, min(jobs, len(head)))
+
+
+def run_batch(worker, files, args, on_result=None):
+    """Apply worker(filepath, args) -> (output_path, message) to every file.
+
+    files may be any iterable, e.g. the streaming _scan.iter_images(). Uses a
+    process pool of args.jobs workers (default: CPU count) when there is more
+    than one file, submitting only a bounded window of files ahead. Results
+    print in input order; a failing file produces an error record instead of
+    aborting the batch. When the dispatcher attached a result cache
+    (args.cache), every call goes through it; with a profiler (args.profiler,
+    from --profile) each file's phase record is collected. on_result, if
+    given, receives every result record in the main process, in order. With
+    --incremental (args.incremental) unchanged files are skipped, see
+    ops/_incremental.py. Returns the failure count.
+    """
+    if getattr(args, "incremental", False):
+        from ops._incremental import run_incremental
+        return run_incremental(worker, files, args, on_result)
+    return run_pool(worker, files, args, on_result)
+
+
+def run_pool(worker, files, args, on_result=None):
+    """run_batch() without the incremental manifest."""
+    files, jobs = _peek_jobs(files, getattr(args, "jobs", None) or default_jobs())
+    failures = 0
+
+    if jobs == 1:
+        for filepath in files:
+            result = _call(worker, filepath, args)
+            _print_result(result, args, on_result)
+            failures += not result["ok"]
+        return failures
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(jobs,)) as pool:
+        pending = deque()
+        for filepath in files:
+            pending.append(pool.submit(_call, worker, filepath, args))
+            if len(pending) < jobs * _WINDOW_PER_WORKER:
+                continue
+            result = pending.popleft().result()
+            _print_result(result, args, on_result)
+            failures += not result["ok"]
+        while pending:
+            result = pending.popleft().result()
+            _print_result(result, args, on_result)
+            failures += not result["ok"]
+    return failures
+
+
+def default_threads():
+    """Default thread count for I/O-bound work such as header reads."""
+    return min(32, (os.cpu_count() or 1) * 4)
+
+
+def iter_threaded(fn, files, jobs=None, ordered=True, profiler=None):
+    """Yield (filepath, result, error) for fn(filepath) run on a thread pool.
+
+    With ordered=False results are yielded as they complete, so callers can
+    stream output. error is None on success, otherwise a message string.
+    A profiler (from --profile) records each call.
+    """
+    def run(filepath):
+        try:
+            return filepath, fn(filepath), None
+        except Exception as e:
+            return filepath, None, f"{type(e).__name__}: {e}"
+
+    def call(filepath):
+        if not profiler:
+            return run(filepath)
+        with profiler.file(filepath) as record:
+            result = run(filepath)
+        profiler.add(record)
+        return result
+
+    files, jobs = _peek_jobs(files, jobs or default_threads())
+    if jobs == 1:
+        yield from map(call, files)
+        return
+
+    window = jobs * _WINDOW_PER_WORKER
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        if ordered:
+            pending = deque()
+            for filepath in files:
+                pending.append(pool.submit(call, filepath))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        else:
+            running = set()
+            for filepath in files:
+                running.add(pool.submit(call, filepath))
+                if len(running) >= window:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            for future in as_completed(running):
+                yield future.result()
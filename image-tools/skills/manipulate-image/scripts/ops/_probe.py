@@ -0,0 +1,112 @@
+"""Header-only container probes: frame counts, dimensions and EXIF.
+
+These walk GIF blocks / RIFF and PNG chunks and seek past the payloads, so they
+never decode pixel data. Pillow's GIF n_frames and WebP open both read (and
+for WebP demux) the whole file, and PNG getexif() decodes the image when the
+eXIf chunk comes after IDAT.
+"""
+
+import struct
+
+
+def _skip_sub_blocks(f):
+    while True:
+        size = f.read(1)
+        if not size or size == b"\0":
+            return
+        f.seek(size[0], 1)
+
+
+def gif_frame_count(f):
+    """Count image descriptors in a GIF. Returns None if f is not a GIF."""
+    f.seek(0)
+    header = f.read(13)
+    if len(header) < 13 or header[:3] != b"GIF":
+        return None
+    flags = header[10]
+    if flags & 0x80:
+        f.seek(3 << ((flags & 7) + 1), 1)  # global color table
+
+    frames = 0
+    while True:
+        block = f.read(1)
+        if not block or block == b";":
+            break
+        if block == b"!":
+            f.seek(1, 1)  # extension label
+            _skip_sub_blocks(f)
+        elif block == b",":
+            desc = f.read(9)
+            if len(desc) < 9:
+                break
+            frames += 1
+            if desc[8] & 0x80:
+                f.seek(3 << ((desc[8] & 7) + 1), 1)  # local color table
+            f.seek(1, 1)  # LZW minimum code size
+            _skip_sub_blocks(f)
+        else:
+            break  # truncated or corrupt: report what was found
+    return frames or None
+
+
+def webp_probe(f):
+    """Read size, alpha, frame count and EXIF from a WebP's RIFF chunks.
+
+    Returns a dict with width, height, alpha, frames and exif (bytes or None),
+    or None if f is not a WebP file.
+    """
+    f.seek(0)
+    riff = f.read(12)
+    if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WEBP":
+        return None
+
+    info = {"alpha": False, "frames": 0, "exif": None}
+    while True:
+        head = f.read(8)
+        if len(head) < 8:
+            break
+        fourcc = head[:4]
+        size = struct.unpack("<I", head[4:])[0]
+        start = f.tell()
+
+        if fourcc == b"VP8X":
+            data = f.read(10)
+            info["alpha"] = bool(data[0] & 0x10)
+            info["width"] = 1 + int.from_bytes(data[4:7], "little")
+            info["height"] = 1 + int.from_bytes(data[7:10], "little")
+        elif fourcc == b"VP8 " and "width" not in info:
+            data = f.read(10)
+            info["width"] = struct.unpack("<H", data[6:8])[0] & 0x3FFF
+            info["height"] = struct.unpack("<H", data[8:10])[0] & 0x3FFF
+        elif fourcc == b"VP8L" and "width" not in info:
+            data = f.read(5)
+            bits = int.from_bytes(data[1:5], "little")
+            info["width"] = (bits & 0x3FFF) + 1
+            info["height"] = ((bits >> 14) & 0x3FFF) + 1
+            info["alpha"] = bool((bits >> 28) & 1)
+        elif fourcc == b"ANMF":
+            info["frames"] += 1
+        elif fourcc == b"EXIF":
+            info["exif"] = f.read(size)
+
+        f.seek(start + size + (size & 1))  # chunks are padded to even length
+
+    if "width" not in info:
+        return None
+    info["frames"] = info["frames"] or 1
+    return info
+
+
+def png_exif(f):
+    """Raw eXIf chunk payload of a PNG, or None. Seeks past IDAT without decoding."""
+    f.seek(8)
+    while True:
+        head = f.read(8)
+        if len(head) < 8:
+            return None
+        length, ctype = struct.unpack(">I4s", head)
+        if ctype == b"eXIf":
+            return f.read(length)
+        if ctype == b"IEND":
+            return None
+        f.seek(length + 4, 1)  # payload + CRC
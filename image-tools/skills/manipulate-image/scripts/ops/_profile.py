@@ -0,0 +1,197 @@
+"""Per-file phase timing for --profile.
+
+While a Profiler is active, Pillow's open/decode/save entry points and the
+os filesystem metadata calls are wrapped with timers, so every operation is
+measured without instrumenting its code:
+
+    open       Image.open (file open and header parse)
+    decode     ImageFile.load and plugin load() overrides (pixel decode)
+    encode     Image.save (encode and write)
+    fs         os.stat/lstat/listdir/scandir
+    transform  everything else in the file's wall time (the operation itself)
+
+Phases nest exclusively: a decode triggered inside save() counts as decode,
+not encode. Timers are per thread, and records travel back from process-pool
+workers with each result, so directory batches aggregate across workers.
+"""
+
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+PHASES = ("open", "decode", "transform", "encode", "fs")
+
+_local = threading.local()
+_install_lock = threading.Lock()
+_installed = 0
+_originals = []
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return (peak if sys.platform == "darwin" else peak * 1024) / 2**20
+
+
+def _timed(phase, fn):
+    def wrapper(*args, **kwargs):
+        stack = getattr(_local, "stack", None)
+        if not stack:
+            return fn(*args, **kwargs)
+        record = stack[-1][0]
+        frame = [record, phase, time.perf_counter(), 0.0]
+        stack.append(frame)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            stack.pop()
+            end = time.perf_counter()
+            elapsed = end - frame[2]
+            # Exclusive time: nested phases already counted themselves
+            record["phases"][phase] += elapsed - frame[3]
+            stack[-1][3] += elapsed
+            if record.get("events") is not None:
+                record["events"].append((phase, frame[2], elapsed))
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+
+def _patch(owner, name, phase):
+    fn = getattr(owner, name)
+    setattr(owner, name, _timed(phase, fn))
+    _originals.append((owner, name, fn))
+
+
+def install():
+    """Wrap the measured entry points (reference counted; idempotent per process)."""
+    global _installed
+    with _install_lock:
+        _installed += 1
+        if _installed > 1:
+            return
+        from PIL import Image, ImageFile
+        Image.init()
+        _patch(Image, "open", "open")
+        _patch(Image.Image, "save", "encode")
+        _patch(ImageFile.ImageFile, "load", "decode")
+        for factory, _ in Image.OPEN.values():
+            if isinstance(factory, type) and "load" in vars(factory):
+                _patch(factory, "load", "decode")
+        for name in ("stat", "lstat", "listdir", "scandir"):
+            _patch(os, name, "fs")
+
+
+def uninstall():
+    global _installed
+    with _install_lock:
+        _installed -= 1
+        if _installed:
+            return
+        while _originals:
+            owner, name, fn = _originals.pop()
+            setattr(owner, name, fn)
+
+
+class Profiler:
+    """Collects per-file phase records. Picklable: workers get settings only."""
+
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.records = []
+        self.started = time.perf_counter()
+
+    def __getstate__(self):
+        return {"trace": self.trace, "records": [], "started": self.started}
+
+    @contextmanager
+    def file(self, label):
+        """Measure the calling thread's work on one file; yields its record."""
+        if not _installed:
+            install()
+        record = {"file": label, "phases": dict.fromkeys(PHASES, 0.0),
+                  "pid": os.getpid(), "tid": threading.get_ident(),
+                  "events": [] if self.trace else None}
+        stack = _local.__dict__.setdefault("stack", [])
+        outer = stack[:]
+        stack[:] = [[record, None, time.perf_counter(), 0.0]]
+        start = stack[0][2]
+        try:
+            yield record
+        finally:
+            end = time.perf_counter()
+            measured = stack[0][3]
+            stack[:] = outer
+            record["start"] = start
+            record["wall"] = end - start
+            record["phases"]["transform"] = max(0.0, record["wall"] - measured)
+            record["peak_rss_mb"] = round(_peak_rss_mb(), 1)
+
+    def add(self, record):
+        if record is not None:
+            self.records.append(record)
+
+    # ─── Reports ─────────────────────────────────────────────────────────────
+
+    def summary(self, command):
+        """Aggregate over all file records."""
+        wall = time.perf_counter() - self.started
+        totals = dict.fromkeys(PHASES, 0.0)
+        for record in self.records:
+            for phase, seconds in record["phases"].items():
+                totals[phase] += seconds
+        busy = sum(totals.values())
+        children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        children = (children if sys.platform == "darwin" else children * 1024) / 2**20
+        slowest = sorted(self.records, key=lambda r: -r["wall"])[:5]
+        return {
+            "command": command,
+            "files": len(self.records),
+            "wall_seconds": round(wall, 4),
+            "busy_seconds": round(busy, 4),
+            "peak_rss_mb": round(max([_peak_rss_mb(), children] + [r["peak_rss_mb"] for r in self.records]), 1),
+            "phases": {
+                phase: {
+                    "seconds": round(totals[phase], 4),
+                    "mean_ms": round(1000 * totals[phase] / max(1, len(self.records)), 2),
+                    "share": round(totals[phase] / busy, 4) if busy else 0.0,
+                }
+                for phase in PHASES
+            },
+            "bound": max(PHASES, key=totals.get) if busy else None,
+            "slowest": [{"file": r["file"], "seconds": round(r["wall"], 4)} for r in slowest],
+        }
+
+    def write_summary(self, summary, verbose=False, stream=None):
+        stream = stream or sys.stderr
+        print(f"Profile: {summary['command']}, {summary['files']} file(s), {summary['wall_seconds']:.3f}s wall, "
+              f"{summary['busy_seconds']:.3f}s busy, peak RSS {summary['peak_rss_mb']:.1f} MB", file=stream)
+        print(f"  {'Phase':<10} {'Total (s)':>10} {'Mean (ms)':>10} {'Share':>7}", file=stream)
+        for phase, p in summary["phases"].items():
+            print(f"  {phase:<10} {p['seconds']:>10.3f} {p['mean_ms']:>10.1f} {p['share']:>7.1%}", file=stream)
+        if summary["bound"]:
+            print(f"  Mostly {summary['bound']}-bound", file=stream)
+        if verbose:
+            for r in self.records:
+                parts = ", ".join(f"{phase} {1000 * s:.1f}" for phase, s in r["phases"].items())
+                print(f"  {r['file']}: {1000 * r['wall']:.1f} ms ({parts})", file=stream)
+
+    def records_json(self):
+        """Per-file records without trace events."""
+        return [{"file": r["file"], "wall_seconds": round(r["wall"], 6), "peak_rss_mb": r["peak_rss_mb"],
+                 "pid": r["pid"], "phases": {k: round(v, 6) for k, v in r["phases"].items()}}
+                for r in self.records]
+
+    def chrome_trace(self):
+        """Trace Event Format dict (chrome://tracing, Perfetto)."""
+        events = []
+        for r in self.records:
+            us = lambda t: round((t - self.started) * 1e6, 1)
+            events.append({"name": os.path.basename(str(r["file"])), "cat": "file", "ph": "X",
+                           "ts": us(r["start"]), "dur": round(r["wall"] * 1e6, 1),
+                           "pid": r["pid"], "tid": r["tid"], "args": {"file": str(r["file"])}})
+            for phase, start, elapsed in r.get("events") or ():
+                events.append({"name": phase, "cat": "phase", "ph": "X", "ts": us(start),
+                               "dur": round(elapsed * 1e6, 1), "pid": r["pid"], "tid": r["tid"]})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
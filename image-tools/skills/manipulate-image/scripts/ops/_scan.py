@@ -0,0 +1,103 @@
+"""Input discovery for batch commands: a streaming os.scandir walker.
+
+iter_images() yields image paths as directories are read, so a batch starts
+working on the first file instead of after listing the whole tree. Entries
+of each directory are visited in sorted order (files first, then
+subdirectories), which keeps runs reproducible without sorting the tree.
+
+Filters:
+    recursive    descend into subdirectories
+    include      glob patterns a file must match (any of them)
+    exclude      glob patterns that drop files and prune directories
+    symlinks     "skip" ignores links, "files" (default) follows links to
+                 files only, "follow" also descends into linked directories
+                 (each directory is visited once, so cycles are safe)
+
+Patterns match either the entry name or its path relative to the input
+directory, with "/" separators (e.g. "*.jpg", "raw/*", "*/drafts").
+
+output_base() maps an input file into --output-dir, mirroring its position
+below the input directory.
+"""
+
+import fnmatch
+import os
+
+IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tiff", ".tif", ".gif"}
+
+SYMLINK_POLICIES = ("skip", "files", "follow")
+
+
+def _matches(patterns, name, rel):
+    return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(rel, p) for p in patterns)
+
+
+def iter_images(path, recursive=False, include=None, exclude=None, symlinks="files"):
+    """Yield image file paths under path (or path itself if it is not a directory)."""
+    if not os.path.isdir(path):
+        yield path
+        return
+
+    include, exclude = include or (), exclude or ()
+    root_stat = os.stat(path)
+    seen = {(root_stat.st_dev, root_stat.st_ino)}
+    stack = [(path, "")]
+    while stack:
+        directory, rel_dir = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            rel = f"{rel_dir}{entry.name}"
+            try:
+                is_link = entry.is_symlink()
+                if is_link and symlinks == "skip":
+                    continue
+                if entry.is_dir(follow_symlinks=True):
+                    if not recursive or (is_link and symlinks != "follow") or _matches(exclude, entry.name, rel):
+                        continue
+                    st = entry.stat(follow_symlinks=True)
+                    if (st.st_dev, st.st_ino) in seen:
+                        continue
+                    seen.add((st.st_dev, st.st_ino))
+                    subdirs.append((entry.path, rel + "/"))
+                    continue
+                if not entry.is_file(follow_symlinks=True):
+                    continue
+            except OSError:
+                continue  # dangling link, vanished entry
+
+            if os.path.splitext(entry.name)[1].lower() not in IMAGE_EXTS:
+                continue
+            if include and not _matches(include, entry.name, rel):
+                continue
+            if _matches(exclude, entry.name, rel):
+                continue
+            yield entry.path
+
+        # Depth first, in sorted order
+        stack.extend(reversed(subdirs))
+
+
+def scan_args(args):
+    """iter_images() over args.input with the scan flags of a batch command."""
+    return iter_images(
+        args.input,
+        recursive=getattr(args, "recursive", False),
+        include=getattr(args, "include", None),
+        exclude=getattr(args, "exclude", None),
+        symlinks=getattr(args, "symlinks", None) or "files",
+    )
+
+
+def output_base(filepath, args):
+    """Path outputs are named after: filepath, or its mirror under --output-dir."""
+    output_dir = getattr(args, "output_dir", None)
+    if not output_dir:
+        return filepath
+    root = args.input if os.path.isdir(args.input) else os.path.dirname(args.input)
+    return os.path.join(output_dir, os.path.relpath(filepath, root or "."))
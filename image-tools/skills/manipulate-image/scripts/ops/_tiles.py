@@ -0,0 +1,52 @@
+"""Row-strip execution of pointwise operations under a --max-memory budget.
+
+Pillow decodes and encodes whole images, so the decoded source and the result
+are each held once. Only operations with a working set several times the image
+(the chroma key's masks and numpy temporaries, compositing) use strips: they
+run one full-width strip at a time, sized so the working set stays within the
+budget. Plain mode conversions gain nothing from strips and do not take one.
+
+Settings (environment):
+    IMAGE_TOOLS_MAX_MEMORY       default budget when --max-memory is not given
+"""
+
+import os
+
+from PIL import Image
+
+from ops._units import parse_bytes
+
+# Rough working set per pixel of a strip for Pillow per-strip work:
+# the cropped strip, its converted copy and the paste into the result
+CONVERT_BYTES_PER_PIXEL = 16
+
+
+def budget_bytes(args):
+    """The --max-memory budget in bytes, or None when strip mode is off."""
+    value = getattr(args, "max_memory", None) or os.environ.get("IMAGE_TOOLS_MAX_MEMORY")
+    return parse_bytes(value) if value else None
+
+
+def strip_rows(width, bytes_per_pixel, budget, overlap=0):
+    """Rows per strip so that a strip plus 2 * overlap context rows fits budget."""
+    rows = budget // max(1, width * bytes_per_pixel) - 2 * overlap
+    return max(1, rows)
+
+
+def iter_strips(height, rows):
+    """Yield (top, bottom) row ranges covering height."""
+    for y in range(0, height, rows):
+        yield y, min(y + rows, height)
+
+
+def map_strips(img, fn, mode, budget, bytes_per_pixel=CONVERT_BYTES_PER_PIXEL):
+    """New image of mode assembled from fn(strip) over full-width strips of img.
+
+    fn must be pointwise (each output pixel depends only on the same input
+    pixel) and return an image of the strip's size.
+    """
+    width, height = img.size
+    out = Image.new(mode, img.size)
+    for top, bottom in iter_strips(height, strip_rows(width, bytes_per_pixel, budget)):
+        out.paste(fn(img.crop((0, top, width, bottom))), (0, top))
+    return out
@@ -0,0 +1,10 @@
+"""Size arguments shared by the cache, --max-memory and --max-bytes."""
+
+
+def parse_bytes(text):
+    """Parse '500M', '2G', '1048576' into a byte count."""
+    text = str(text).strip().upper().rstrip("B")
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
@@ -1,8 +1,13 @@
 """Alpha channel and compositing operations."""
 
 import os
+import math
 import colorsys
-from PIL import Image, ImageFilter
+from PIL import Image, ImageChops, ImageFilter
+
+from ops._frames import apply
+from ops._parallel import run_batch
+from ops._tiles import CONVERT_BYTES_PER_PIXEL, budget_bytes, iter_strips, map_strips, strip_rows
 
 try:
     import numpy as np
@@ -31,172 +36,273 @@ def _rgb_to_hue(r, g, b):
     return h * 360.0
 
 
-def _chroma_key_numpy(img, target, tolerance, feather):
-    """HSV-based chroma key with spill suppression using numpy."""
-    arr = np.array(img, dtype=np.float64)
-    r, g, b = arr[:, :, 0], arr[:, :, 1], arr[:, :, 2]
-
-    # Convert target to HSV hue
-    target_h = _rgb_to_hue(*target)
-    target_s_min = 0.15  # minimum saturation to be considered chromatic
+# Pixels per row strip for the numpy chroma key: bounds the size of the
+# per-strip temporaries independently of the image size
+_STRIP_PIXELS = 1 << 20
 
-    # Convert image to HSV
-    # Normalize to 0-1
-    rn, gn, bn = r / 255.0, g / 255.0, b / 255.0
-    cmax = np.maximum(np.maximum(rn, gn), bn)
-    cmin = np.minimum(np.minimum(rn, gn), bn)
-    delta = cmax - cmin
+# Peak numpy/Pillow working set per strip pixel of the chroma key, used to
+# size strips under --max-memory
+_CHROMA_BYTES_PER_PIXEL = 64
 
-    # Hue calculation
-    hue = np.zeros_like(delta)
-    mask_r = (cmax == rn) & (delta > 0)
-    mask_g = (cmax == gn) & (delta > 0)
-    mask_b = (cmax == bn) & (delta > 0)
-    hue[mask_r] = 60.0 * (((gn[mask_r] - bn[mask_r]) / delta[mask_r]) % 6)
-    hue[mask_g] = 60.0 * (((bn[mask_g] - rn[mask_g]) / delta[mask_g]) + 2)
-    hue[mask_b] = 60.0 * (((rn[mask_b] - gn[mask_b]) / delta[mask_b]) + 4)
 
-    # Saturation (suppress divide-by-zero for black pixels)
-    with np.errstate(invalid='ignore'):
-        sat = np.where(cmax > 0, delta / cmax, 0)
+def _sq_diff_lut(t):
+    """256-entry table of (v - t)**2, so RGB distance needs no float math."""
+    v = np.arange(256, dtype=np.int32)
+    return (v - t) ** 2
 
-    # Hue distance (circular)
-    hue_diff = np.abs(hue - target_h)
-    hue_diff = np.minimum(hue_diff, 360.0 - hue_diff)
 
-    # Background detection: match hue within tolerance, with minimum saturation
-    hue_tolerance = max(tolerance, 15)
-    hue_feather = max(feather, 20)
+def _key_alpha_strip(strip, target_h, hue_tolerance, hue_feather, sq_luts, rgb_close_sq):
+    """Unblurred alpha (uint8) for one strip of an RGBA uint8 array."""
+    r, g, b = strip[..., 0], strip[..., 1], strip[..., 2]
+    cmax = np.maximum(np.maximum(r, g), b)
+    cmin = np.minimum(np.minimum(r, g), b)
+    delta = cmax - cmin
 
-    is_chromatic = sat > target_s_min
-    bg_core = is_chromatic & (hue_diff <= hue_tolerance)
-    bg_edge = is_chromatic & (hue_diff > hue_tolerance) & (hue_diff <= hue_tolerance + hue_feather)
+    # Hue in degrees. Assigned r, g, b in turn: on ties the later one wins,
+    # matching the original float64 mask assignments
+    hue = np.zeros(r.shape, dtype=np.float32)
+    has_hue = delta > 0
+    for x, y, offset, is_max in ((g, b, 0, cmax == r), (b, r, 2, cmax == g), (r, g, 4, cmax == b)):
+        m = is_max & has_hue
+        h = (x[m].astype(np.float32) - y[m]) / delta[m]
+        if offset:
+            h += offset
+        else:
+            h %= 6
+        h *= 60.0
+        hue[m] = h
+
+    # Circular hue distance, in place
+    hue -= target_h
+    np.abs(hue, out=hue)
+    np.minimum(hue, 360.0 - hue, out=hue)
+
+    # Saturation > 0.15 without dividing: 20 * delta > 3 * cmax. Exact ties
+    # are decided by the original float64 rounding on the 0-1 scale
+    delta20, cmax3 = delta.astype(np.uint16) * 20, cmax.astype(np.uint16) * 3
+    is_chromatic = delta20 > cmax3
+    tie = delta20 == cmax3
+    tie &= has_hue
+    if tie.any():
+        hi, lo = cmax[tie] / 255.0, cmin[tie] / 255.0
+        is_chromatic[tie] = (hi - lo) / hi > 0.15
+
+    alpha = np.full(r.shape, 255.0, dtype=np.float32)
+    alpha[is_chromatic & (hue <= hue_tolerance)] = 0.0
+    bg_edge = is_chromatic & (hue > hue_tolerance) & (hue <= hue_tolerance + hue_feather)
+    alpha[bg_edge] = (hue[bg_edge] - hue_tolerance) / hue_feather * 255.0
+
+    # Low-saturation pixels close to the target in RGB (squared, integer)
+    dist_sq = sq_luts[0][r] + sq_luts[1][g] + sq_luts[2][b]
+    alpha[(dist_sq < rgb_close_sq) & ~is_chromatic] = 0.0
+    return alpha.astype(np.uint8)
+
+
+def _despill_strip(strip, alpha, out, low_idx, high_indices, sq_luts):
+    """Write despilled RGB + alpha for one strip into out (uint8, in place)."""
+    r, g, b = strip[..., 0], strip[..., 1], strip[..., 2]
 
-    # Alpha: 0 for background, gradient for edges, 255 for subject
-    alpha = np.full(r.shape, 255.0)
-    alpha[bg_core] = 0.0
-    edge_alpha = (hue_diff[bg_edge] - hue_tolerance) / hue_feather * 255.0
-    alpha[bg_edge] = edge_alpha
+    # Spill strength based on proximity to background
+    max_rgb_dist = np.sqrt(3 * 255**2)
+    spill = np.sqrt((sq_luts[0][r] + sq_luts[1][g] + sq_luts[2][b]).astype(np.float32))
+    spill *= -1.0 / (max_rgb_dist * 0.3)
+    spill += 1.0
+    np.clip(spill, 0, 1, out=spill)
+    needs_despill = (alpha > 0) & (spill > 0)
+
+    out[..., low_idx] = strip[..., low_idx]
+    low = strip[..., low_idx].astype(np.float32)
+    for hi in high_indices:
+        channel = strip[..., hi].astype(np.float32)
+        excess = channel - low
+        excess -= 30
+        np.maximum(excess, 0, out=excess)
+        excess *= spill
+        excess *= 0.6
+        np.subtract(channel, excess, out=channel, where=needs_despill)
+        np.clip(channel, 0, 255, out=channel)
+        out[..., hi] = channel
+    out[..., 3] = alpha
+
+
+def _rgba_rows(img, top, bottom):
+    """Rows [top, bottom) of img as an RGBA uint8 array."""
+    strip = img.crop((0, top, img.size[0], bottom))
+    if strip.mode != "RGBA":
+        strip = strip.convert("RGBA")
+    return np.asarray(strip)
+
+
+def _chroma_key_numpy(img, target, tolerance, feather, max_memory=None):
+    """HSV-based chroma key with spill suppression using numpy.
+
+    Runs in full-width row strips on uint8/int32/float32 data with in-place
+    operations; only the source and the result image are full-size. The blur
+    needs context rows around each strip, so unblurred alpha is carried over
+    from one strip to the next. max_memory (bytes) sizes the strips.
+    """
+    width, height = img.size
+    blur_radius = max(1.0, feather / 15.0)
+    # Reach of PIL's Gaussian blur (three box blur passes)
+    overlap = 3 * (math.ceil(blur_radius) + 1)
+    if max_memory:
+        rows = strip_rows(width, _CHROMA_BYTES_PER_PIXEL, max_memory, overlap)
+    else:
+        rows = max(1, _STRIP_PIXELS // max(width, 1))
 
-    # Also catch low-saturation near-white/near-black pixels that are close to target in RGB
-    rgb_dist = np.sqrt((r - target[0])**2 + (g - target[1])**2 + (b - target[2])**2)
-    rgb_close = rgb_dist < (tolerance * 5)
-    alpha[rgb_close & ~is_chromatic] = 0.0
+    target_h = _rgb_to_hue(*target)
+    hue_tolerance = max(tolerance, 15)
+    hue_feather = max(feather, 20)
+    rgb_close_sq = (tolerance * 5) ** 2
+    sq_luts = [_sq_diff_lut(t) for t in target[:3]]
 
-    # Gaussian blur the alpha mask for smooth antialiased edges
-    blur_radius = max(1.0, feather / 15.0)
-    alpha_img = Image.fromarray(alpha.astype(np.uint8), mode='L')
-    alpha_img = alpha_img.filter(ImageFilter.GaussianBlur(radius=blur_radius))
-    alpha = np.array(alpha_img, dtype=np.float64)
-
-    # Spill suppression: remove background color from edge/subject pixels
-    # For magenta (high R, high B, low G): clamp R and B so they don't
-    # exceed what's natural. Use the "low channel" as reference.
-    # Identify which channel is the "low" one in the target
-    t_channels = list(target)
+    # Spill suppression: pull the target's high channels down toward its low
+    # channel on pixels near the background color
+    t_channels = list(target[:3])
     low_idx = t_channels.index(min(t_channels))
     high_indices = [i for i in range(3) if i != low_idx]
 
-    # Spill strength based on proximity to background
-    # Pixels closer to bg get more despill
-    max_rgb_dist = np.sqrt(3 * 255**2)
-    spill_strength = np.clip(1.0 - (rgb_dist / (max_rgb_dist * 0.3)), 0, 1)
-    # Only despill pixels that are partially or fully opaque and near edges
-    needs_despill = (alpha > 0) & (spill_strength > 0)
-
-    channels = [r.copy(), g.copy(), b.copy()]
-    low_channel = channels[low_idx]
-
-    for hi in high_indices:
-        # Clamp high channels: they shouldn't exceed low_channel + natural_offset
-        # The offset accounts for natural color (e.g., a red object has high R legitimately)
-        # Use a gentle clamp: blend toward the low channel value
-        excess = np.maximum(0, channels[hi] - low_channel - 30)
-        reduction = excess * spill_strength * 0.6
-        channels[hi] = np.where(needs_despill, channels[hi] - reduction, channels[hi])
-
-    channels = [np.clip(c, 0, 255) for c in channels]
-
-    # Build output
-    out_arr = np.stack([
-        channels[0].astype(np.uint8),
-        channels[1].astype(np.uint8),
-        channels[2].astype(np.uint8),
-        alpha.astype(np.uint8),
-    ], axis=-1)
-
-    result = Image.fromarray(out_arr, mode='RGBA')
-    transparent_count = int(np.sum(alpha < 255))
+    result = Image.new("RGBA", img.size)
+    blur = ImageFilter.GaussianBlur(radius=blur_radius)
+    keyed, keyed_top = np.empty((0, width), dtype=np.uint8), 0
+    transparent_count = 0
+    for top, bottom in iter_strips(height, rows):
+        # Alpha: 0 for background, gradient for edges, 255 for subject, for
+        # rows [lo, hi); rows keyed for the previous strip are reused
+        lo, hi = max(0, top - overlap), min(height, bottom + overlap)
+        keyed = keyed[lo - keyed_top:]
+        keyed_end = lo + len(keyed)
+        if hi > keyed_end:
+            fresh = _key_alpha_strip(_rgba_rows(img, keyed_end, hi), target_h, hue_tolerance,
+                                     hue_feather, sq_luts, rgb_close_sq)
+            keyed = np.concatenate([keyed, fresh]) if len(keyed) else fresh
+        keyed_top = lo
+
+        # Gaussian blur the alpha mask for smooth antialiased edges
+        alpha = np.asarray(Image.fromarray(keyed, mode='L').filter(blur))[top - lo:bottom - lo]
+        transparent_count += int(np.count_nonzero(alpha < 255))
+
+        out = np.empty((bottom - top, width, 4), dtype=np.uint8)
+        _despill_strip(_rgba_rows(img, top, bottom), alpha, out, low_idx, high_indices, sq_luts)
+        result.paste(Image.fromarray(out, mode='RGBA'), (0, top))
     return result, transparent_count
 
 
 def _chroma_key_fallback(img, target, tolerance, feather):
-    """Simple RGB fallback when numpy is not available."""
+    """RGB tolerance key when numpy is not available (or without --feather).
+
+    Pixels whose largest channel difference from target is within tolerance
+    become (0, 0, 0, 0); with feather, the next `feather` levels get alpha
+    255 * (diff - tolerance) / feather. Runs on Pillow's C primitives: per-band
+    point LUTs, ImageChops.lighter and masked pastes.
+    """
     img = img.convert("RGBA")
-    data = img.getdata()
-    new_data = []
-    count = 0
-    for pixel in data:
-        r, g, b = pixel[:3]
-        max_diff = max(abs(r - target[0]), abs(g - target[1]), abs(b - target[2]))
-        if max_diff <= tolerance:
-            new_data.append((0, 0, 0, 0))
-            count += 1
-        elif feather > 0 and max_diff <= tolerance + feather:
-            alpha = int(255 * (max_diff - tolerance) / feather)
-            new_data.append((r, g, b, alpha))
-            count += 1
-        else:
-            new_data.append(pixel)
-    img.putdata(new_data)
-    return img, count
+    r, g, b, a = img.split()
 
+    # Largest per-channel |value - target|
+    diffs = [band.point([abs(v - t) for v in range(256)]) for band, t in zip((r, g, b), target)]
+    max_diff = ImageChops.lighter(ImageChops.lighter(diffs[0], diffs[1]), diffs[2])
 
-def cmd_alpha(args):
-    """Manage alpha channel: add, remove, or make color transparent."""
-    img = Image.open(args.input)
+    limit = tolerance + feather if feather > 0 else tolerance
+    keyed = max_diff.point([255 if d <= limit else 0 for d in range(256)])
+    core = max_diff.point([255 if d <= tolerance else 0 for d in range(256)])
+    edge_alpha = max_diff.point([
+        int(255 * (d - tolerance) / feather) if tolerance < d <= limit else 0 for d in range(256)])
 
+    a.paste(edge_alpha, mask=keyed)
+    result = Image.merge("RGBA", (r, g, b, a))
+    result.paste((0, 0, 0, 0), mask=core)
+    return result, keyed.histogram()[255]
+
+
+def add_alpha(img):
+    """Convert to RGBA."""
+    return img.convert("RGBA")
+
+
+def remove_alpha(img, background=None):
+    """Flatten onto a solid background color (default: white)."""
+    if img.mode == "RGBA":
+        bg = Image.new("RGB", img.size, _parse_color(background) if background else (255, 255, 255))
+        bg.paste(img, mask=img.split()[3])
+        return bg
+    return img.convert("RGB")
+
+
+def make_transparent(img, args):
+    """Key out the --transparent color. Returns (RGBA image, affected pixel count)."""
+    target = _parse_color(args.transparent)
+    tolerance = args.tolerance or 0
+    feather = args.feather or 0
+    max_memory = budget_bytes(args)
+
+    if HAS_NUMPY and feather > 0:
+        return _chroma_key_numpy(img, target, tolerance, feather, max_memory)
+    if not HAS_NUMPY and feather > 0:
+        print("Warning: numpy not available, using basic RGB matching (no spill suppression)")
+    if max_memory:
+        counts = []
+
+        def key(strip):
+            keyed, count = _chroma_key_fallback(strip, target, tolerance, feather)
+            counts.append(count)
+            return keyed
+
+        return map_strips(img, key, "RGBA", max_memory), sum(counts)
+    return _chroma_key_fallback(img, target, tolerance, feather)
+
+
+def alpha_image(img, args):
+    """Apply --add, --remove or --transparent. Raises ValueError if none is given."""
     if args.add:
-        result = img.convert("RGBA")
-        out = _output_path(args.input, "alpha", args.output)
+        return add_alpha(img)
+    if args.remove:
+        return remove_alpha(img, args.background)
+    if args.transparent:
+        return make_transparent(img, args)[0]
+    raise ValueError("specify --add, --remove, or --transparent R,G,B")
+
+
+def _alpha_file(filepath, args):
+    img = Image.open(filepath)
+
+    if args.add:
+        result = apply(img, add_alpha)
+        out = _output_path(filepath, "alpha", args.output)
         result.save(out)
-        print(f"{args.input}: added alpha channel => {out}")
+        return out, f"{filepath}: added alpha channel => {out}"
 
-    elif args.remove:
-        if img.mode == "RGBA":
-            bg = Image.new("RGB", img.size, _parse_color(args.background) if args.background else (255, 255, 255))
-            bg.paste(img, mask=img.split()[3])
-            result = bg
-        else:
-            result = img.convert("RGB")
-        out = _output_path(args.input, "noalpha", args.output)
+    if args.remove:
+        result = apply(img, lambda frame: remove_alpha(frame, args.background))
+        out = _output_path(filepath, "noalpha", args.output)
         result.save(out)
-        print(f"{args.input}: removed alpha channel => {out}")
+        return out, f"{filepath}: removed alpha channel => {out}"
 
-    elif args.transparent:
-        target = _parse_color(args.transparent)
-        tolerance = args.tolerance or 0
-        feather = args.feather or 0
-        img = img.convert("RGBA")
+    counts = []
 
-        if HAS_NUMPY and feather > 0:
-            result, count = _chroma_key_numpy(img, target, tolerance, feather)
-        else:
-            if not HAS_NUMPY and feather > 0:
-                print("Warning: numpy not available, using basic RGB matching (no spill suppression)")
-            result, count = _chroma_key_fallback(img, target, tolerance, feather)
+    def key(frame):
+        keyed, count = make_transparent(frame, args)
+        counts.append(count)
+        return keyed
 
-        out = _output_path(args.input, "transparent", args.output)
-        result.save(out)
-        print(f"{args.input}: made {count} pixels transparent/semi-transparent => {out}")
+    result = apply(img, key)
+    count = sum(counts)
+    out = _output_path(filepath, "transparent", args.output)
+    result.save(out)
+    return out, f"{filepath}: made {count} pixels transparent/semi-transparent => {out}"
 
-    else:
+
+def cmd_alpha(args):
+    """Manage alpha channel: add, remove, or make color transparent."""
+    if not (args.add or args.remove or args.transparent):
         print("Error: specify --add, --remove, or --transparent R,G,B")
+        return
+    return run_batch(_alpha_file, [args.input], args)
 
 
 def cmd_composite(args):
     """Overlay one image on another."""
-    base = Image.open(args.base).convert("RGBA")
+    base = Image.open(args.base)
     overlay = Image.open(args.overlay).convert("RGBA")
 
     if args.position == "center":
@@ -212,30 +318,25 @@ def cmd_composite(args):
         ow, oh = [int(x) for x in args.overlay_size.lower().split("x")]
         overlay = overlay.resize((ow, oh), Image.LANCZOS)
 
-    result = base.copy()
-    result.paste(overlay, (x, y), overlay)
+    max_memory = budget_bytes(args)
+
+    def composite(frame):
+        if not max_memory:
+            result = frame.convert("RGBA")
+            result.paste(overlay, (x, y), overlay)
+            return result
+        # Alpha compositing is pointwise: paste the overlay's slice into each strip
+        width, height = frame.size
+        result = Image.new("RGBA", frame.size)
+        for top, bottom in iter_strips(height, strip_rows(width, CONVERT_BYTES_PER_PIXEL, max_memory)):
+            strip = frame.crop((0, top, width, bottom)).convert("RGBA")
+            strip.paste(overlay, (x, y - top), overlay)
+            result.paste(strip, (0, top))
+        return result
+
+    # An animated base gets the overlay on every frame
+    result = apply(base, composite)
 
     out = args.output or _output_path(args.base, "composite")
     result.save(out)
     print(f"Composited {args.overlay} onto {args.base} at ({x},{y}) => {out}")
-
-
-def register(subparsers):
-    p = subparsers.add_parser("alpha", help="Manage alpha channel")
-    p.add_argument("input", help="Image file")
-    p.add_argument("-o", "--output", help="Output path")
-    p.add_argument("--add", action="store_true", help="Add alpha channel")
-    p.add_argument("--remove", action="store_true", help="Remove alpha (flatten)")
-    p.add_argument("--background", help="Background color for --remove as R,G,B (default: white)")
-    p.add_argument("--transparent", help="Make color transparent as R,G,B")
-    p.add_argument("--tolerance", type=int, default=0, help="Color match tolerance (0-255)")
-    p.add_argument("--feather", type=int, default=0, help="Feather radius for antialiased edges (0-255, default: 0)")
-    p.set_defaults(func=cmd_alpha)
-
-    p = subparsers.add_parser("composite", help="Overlay images")
-    p.add_argument("base", help="Base image file")
-    p.add_argument("overlay", help="Overlay image file")
-    p.add_argument("-o", "--output", help="Output path")
-    p.add_argument("--position", default="center", help="Position: center or X,Y")
-    p.add_argument("--overlay-size", help="Resize overlay to WxH before compositing")
-    p.set_defaults(func=cmd_composite)
@@ -2,47 +2,114 @@
 
 import os
 import json
-from PIL import Image
+from functools import partial
+from PIL import Image, ImageFilter, ImageStat
 from PIL.ExifTags import TAGS
 
+from ops._parallel import iter_threaded
+from ops._probe import gif_frame_count, png_exif, webp_probe
+from ops._scan import scan_args
+
+
+# Quality metrics are computed on a copy no larger than this (long edge)
+QUALITY_EDGE = 1024
+
+_LAPLACIAN = ImageFilter.Kernel((3, 3), [0, 1, 0, 1, -4, 1, 0, 1, 0], scale=1, offset=128)
+
+
+def quality_metrics(img):
+    """
+    Cheap no-reference quality metrics for an image.
+
+    Returns a dict with the full-size width/height plus, from a grayscale copy
+    at most QUALITY_EDGE wide: sharpness (variance of the Laplacian),
+    contrast (luminance standard deviation), histogram_spread (5th-95th
+    percentile luminance range) and entropy (bits). Higher is better for all.
+    """
+    width, height = img.size
+    img.draft("L", (QUALITY_EDGE, QUALITY_EDGE))
+    gray = img.convert("L")
+    if max(gray.size) > QUALITY_EDGE:
+        gray.thumbnail((QUALITY_EDGE, QUALITY_EDGE), Image.Resampling.BILINEAR)
+
+    hist = gray.histogram()
+    total = sum(hist)
+    low = high = seen = 0
+    for value, count in enumerate(hist):
+        if seen < total * 0.05:
+            low = value
+        seen += count
+        if seen <= total * 0.95:
+            high = value
+
+    # Kernel filters leave the 1 px border unfiltered
+    edges = gray.filter(_LAPLACIAN).crop((1, 1, gray.width - 1, gray.height - 1))
+    return {
+        "width": width,
+        "height": height,
+        "sharpness": round(ImageStat.Stat(edges).var[0], 2),
+        "contrast": round(ImageStat.Stat(gray).stddev[0], 2),
+        "histogram_spread": max(0, high - low),
+        "entropy": round(gray.entropy(), 3) + 0.0,
+    }
 
-def _collect_images(path):
-    EXTS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tiff", ".tif", ".gif"}
-    if os.path.isdir(path):
-        files = []
-        for f in sorted(os.listdir(path)):
-            if os.path.splitext(f)[1].lower() in EXTS:
-                files.append(os.path.join(path, f))
-        return files
-    return [path]
 
+def _get_info(filepath, quality=False):
+    """Get image info as dict, reading headers only (no pixel decode) unless quality is set."""
+    with open(filepath, "rb") as f:
+        size_bytes = os.fstat(f.fileno()).st_size
+        webp = webp_probe(f)
+        if webp:
+            fmt, mode = "WEBP", "RGBA" if webp["alpha"] else "RGB"
+            width, height, frames = webp["width"], webp["height"], webp["frames"]
+        else:
+            f.seek(0)
+            img = Image.open(f)
+            fmt, mode = img.format, img.mode
+            width, height = img.size
+            if img.format == "GIF":
+                frames = gif_frame_count(f)
+            else:
+                frames = getattr(img, "n_frames", None)
 
-def _get_info(filepath):
-    """Get image info as dict."""
-    img = Image.open(filepath)
     info = {
         "file": filepath,
-        "format": img.format,
-        "mode": img.mode,
-        "width": img.size[0],
-        "height": img.size[1],
-        "size_bytes": os.path.getsize(filepath),
+        "format": fmt,
+        "mode": mode,
+        "width": width,
+        "height": height,
+        "size_bytes": size_bytes,
     }
-    if img.mode == "RGBA":
+    if mode == "RGBA":
         info["has_alpha"] = True
-    if hasattr(img, "n_frames"):
-        info["frames"] = img.n_frames
+    if frames:
+        info["frames"] = frames
+    if quality:
+        with Image.open(filepath) as img:
+            info["quality"] = quality_metrics(img)
     return info
 
 
 def cmd_info(args):
     """Show image information."""
-    files = _collect_images(args.input)
+    files = scan_args(args)
+    separate = os.path.isdir(args.input)
+    failures = 0
+
+    # JSON lines stream in completion order; text output keeps input order
+    get_info = partial(_get_info, quality=args.quality)
+    for filepath, info, error in iter_threaded(get_info, files, args.jobs, ordered=not args.json,
+                                               profiler=getattr(args, "profiler", None)):
+        if error:
+            failures += 1
+            if args.json:
+                print(json.dumps({"file": filepath, "error": error}), flush=True)
+            else:
+                print(f"Error: {filepath}: {error}")
+            continue
 
-    for filepath in files:
-        info = _get_info(filepath)
         if args.json:
-            print(json.dumps(info))
+            print(json.dumps(info), flush=True)
         else:
             print(f"File:   {info['file']}")
             print(f"Format: {info['format']}")
@@ -53,45 +120,72 @@ def cmd_info(args):
                 print("Alpha:  yes")
             if info.get("frames"):
                 print(f"Frames: {info['frames']}")
-            if len(files) > 1:
+            if info.get("quality"):
+                q = info["quality"]
+                print(f"Quality: sharpness {q['sharpness']}, contrast {q['contrast']}, "
+                      f"spread {q['histogram_spread']}, entropy {q['entropy']}")
+            if separate:
                 print("---")
+    return failures
+
+
+def _read_exif(f):
+    """EXIF for an open file without decoding pixels."""
+    webp = webp_probe(f)
+    if webp:
+        raw = webp["exif"]
+    else:
+        f.seek(0)
+        img = Image.open(f)
+        if img.format != "PNG" or "exif" in img.info:
+            return img.getexif()
+        # PNG getexif() decodes the image when eXIf follows IDAT
+        raw = png_exif(f)
+
+    exif = Image.Exif()
+    if raw:
+        exif.load(raw)
+    return exif
+
+
+def _get_metadata(filepath):
+    meta = {"file": filepath}
+    with open(filepath, "rb") as f:
+        exif_data = _read_exif(f)
+    if exif_data:
+        for tag_id, value in exif_data.items():
+            tag_name = TAGS.get(tag_id, str(tag_id))
+            if isinstance(value, bytes):
+                value = value.hex()
+            elif not isinstance(value, (str, int, float, bool, type(None))):
+                value = str(value)
+            meta[tag_name] = value
+    return meta
 
 
 def cmd_metadata(args):
     """Extract EXIF metadata."""
-    files = _collect_images(args.input)
+    files = scan_args(args)
     all_metadata = []
+    failures = 0
+
+    stream = args.jsonl and not args.output
+    for filepath, meta, error in iter_threaded(_get_metadata, files, args.jobs, ordered=not stream,
+                                               profiler=getattr(args, "profiler", None)):
+        if error:
+            failures += 1
+            meta = {"file": filepath, "error": error}
+        if stream:
+            print(json.dumps(meta, default=str), flush=True)
+        else:
+            all_metadata.append(meta)
 
-    for filepath in files:
-        img = Image.open(filepath)
-        meta = {"file": filepath}
-        exif_data = img.getexif()
-        if exif_data:
-            for tag_id, value in exif_data.items():
-                tag_name = TAGS.get(tag_id, str(tag_id))
-                if isinstance(value, bytes):
-                    value = value.hex()
-                elif not isinstance(value, (str, int, float, bool, type(None))):
-                    value = str(value)
-                meta[tag_name] = value
-
-        all_metadata.append(meta)
-
+    if stream:
+        return failures
     if args.output:
         with open(args.output, "w") as f:
             json.dump(all_metadata, f, indent=2, default=str)
-        print(f"Metadata for {len(files)} image(s) => {args.output}")
+        print(f"Metadata for {len(all_metadata)} image(s) => {args.output}")
     else:
         print(json.dumps(all_metadata, indent=2, default=str))
-
-
-def register(subparsers):
-    p = subparsers.add_parser("info", help="Show image info")
-    p.add_argument("input", help="Image file or directory")
-    p.add_argument("--json", action="store_true", help="Output as JSON")
-    p.set_defaults(func=cmd_info)
-
-    p = subparsers.add_parser("metadata", help="Extract EXIF metadata")
-    p.add_argument("input", help="Image file or directory")
-    p.add_argument("-o", "--output", help="Save to JSON file")
-    p.set_defaults(func=cmd_metadata)
+    return failures
@@ -0,0 +1,23 @@
+"""Result cache inspection and maintenance."""
+
+import json
+
+from ops._cache import ResultCache
+from ops._units import parse_bytes
+
+
+def cmd_cache(args):
+    """Show cache statistics, prune to a size bound, or clear the cache."""
+    cache = ResultCache(root=args.dir)
+
+    if args.action == "stats":
+        print(json.dumps(cache.stats(), indent=2))
+    elif args.action == "prune":
+        max_bytes = parse_bytes(args.max_size) if args.max_size else cache.max_bytes
+        evicted = cache.prune(max_bytes)
+        stats = cache.stats()
+        print(f"Evicted {evicted} entr{'y' if evicted == 1 else 'ies'}; "
+              f"{stats['entries']} left ({stats['size_bytes']:,}B) in {stats['dir']}")
+    elif args.action == "clear":
+        count = cache.clear()
+        print(f"Removed {count} entr{'y' if count == 1 else 'ies'} from {cache.root}")
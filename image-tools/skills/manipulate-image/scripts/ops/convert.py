@@ -3,16 +3,11 @@
 import os
 from PIL import Image
 
-
-def _collect_images(path):
-    EXTS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tiff", ".tif", ".gif"}
-    if os.path.isdir(path):
-        files = []
-        for f in sorted(os.listdir(path)):
-            if os.path.splitext(f)[1].lower() in EXTS:
-                files.append(os.path.join(path, f))
-        return files
-    return [path]
+from ops._encode import fit_bytes, fit_target, save_kwargs
+from ops._frames import Animation, apply
+from ops._parallel import run_batch
+from ops._scan import output_base, scan_args
+from ops._units import parse_bytes
 
 
 FORMAT_MAP = {
@@ -26,79 +21,143 @@ FORMAT_MAP = {
 }
 
 
+def _report(filepath, out):
+    orig_size = os.path.getsize(filepath)
+    new_size = os.path.getsize(out)
+    ratio = ((orig_size - new_size) / orig_size) * 100 if orig_size > 0 else 0
+    return f"{filepath} -> {out} ({orig_size:,}B -> {new_size:,}B, {ratio:+.1f}%)"
+
+
+def convert_image(img, pil_format):
+    """Convert img to a mode the target format can store (JPEG has no alpha)."""
+    if pil_format == "JPEG" and img.mode in ("RGBA", "P", "LA"):
+        return img.convert("RGB")
+    return img
+
+
+def _animation_search(img, args):
+    """Reject the single-encode searches for an animation (ValueError)."""
+    if isinstance(img, Animation) and (args.target or getattr(args, "max_bytes", None)):
+        raise ValueError("--max-bytes and --target-ssim/--target-psnr do not support animated images")
+
+
+def _convert_file(filepath, args):
+    fmt = args.format.lower()
+    pil_format = FORMAT_MAP[fmt]
+    img = apply(Image.open(filepath), lambda frame: convert_image(frame, pil_format), pil_format)
+    _animation_search(img, args)
+
+    base = os.path.splitext(output_base(filepath, args))[0]
+    out = args.output or f"{base}.{fmt}"
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    if args.target:
+        return _save_fitted(filepath, out, *fit_target(img, pil_format, *args.target))
+    img.save(out, pil_format, **save_kwargs(pil_format, args.quality))
+    return out, _report(filepath, out)
+
+
 def cmd_convert(args):
     """Convert image(s) to a different format."""
-    files = _collect_images(args.input)
     fmt = args.format.lower()
-    pil_format = FORMAT_MAP.get(fmt)
-    if not pil_format:
+    if fmt not in FORMAT_MAP:
         print(f"Error: unsupported format '{fmt}'. Supported: {', '.join(FORMAT_MAP.keys())}")
         return
+    if not _parse_target(args):
+        return
 
-    save_kwargs = {}
-    if args.quality and pil_format in ("JPEG", "WEBP"):
-        save_kwargs["quality"] = args.quality
-    if pil_format == "PNG" and args.quality:
-        save_kwargs["compress_level"] = min(9, max(0, (100 - args.quality) // 10))
-
-    for filepath in files:
-        img = Image.open(filepath)
-
-        if pil_format == "JPEG" and img.mode in ("RGBA", "P", "LA"):
-            img = img.convert("RGB")
+    # -o only applies to single-file input
+    if os.path.isdir(args.input):
+        args.output = None
+    return run_batch(_convert_file, scan_args(args), args)
 
-        base = os.path.splitext(filepath)[0]
-        out = args.output if (args.output and len(files) == 1) else f"{base}.{fmt}"
-        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
-        img.save(out, pil_format, **save_kwargs)
 
-        orig_size = os.path.getsize(filepath)
-        new_size = os.path.getsize(out)
-        ratio = ((orig_size - new_size) / orig_size) * 100 if orig_size > 0 else 0
-        print(f"{filepath} -> {out} ({orig_size:,}B -> {new_size:,}B, {ratio:+.1f}%)")
+def _compress_file(filepath, args):
+    quality = args.quality or 80
+    img = Image.open(filepath)
+    ext = os.path.splitext(filepath)[1].lower()
+    pil_format = FORMAT_MAP.get(ext.lstrip("."), "PNG")
+    img = apply(img, lambda frame: convert_image(frame, pil_format), pil_format)
+    _animation_search(img, args)
+
+    base, orig_ext = os.path.splitext(output_base(filepath, args))
+    out = args.output or f"{base}_compressed{orig_ext}"
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+
+    if args.target:
+        return _save_fitted(filepath, out, *fit_target(img, pil_format, *args.target))
+    if args.max_bytes:
+        fitted = fit_bytes(img, pil_format, args.max_bytes, quality, (args.min_scale or 100) / 100.0)
+        return _save_fitted(filepath, out, *fitted)
+
+    kwargs = {}
+    if pil_format in ("JPEG", "WEBP"):
+        kwargs["quality"] = quality
+        kwargs["optimize"] = True
+    elif pil_format == "PNG":
+        kwargs["optimize"] = True
+
+    img.save(out, pil_format, **kwargs)
+    return out, _report(filepath, out)
+
+
+def _describe_fit(fit):
+    parts = []
+    if fit.get("quality") is not None:
+        parts.append(f"quality {fit['quality']}")
+    if fit.get("colors"):
+        parts.append(f"{fit['colors']} colors")
+    if fit.get("lossless"):
+        parts.append("lossless")
+    if fit.get("subsampling"):
+        parts.append(fit["subsampling"])
+    if fit.get("scale", 1) < 1:
+        parts.append(f"scaled to {fit['size'][0]}x{fit['size'][1]}")
+    if fit.get("metric"):
+        score = f"{fit['metric'].upper()} {fit['score']}"
+        parts.append(score if fit["met"] else f"{score}, below target")
+    parts.append(f"{fit['attempts']} encode(s)")
+    return ", ".join(parts)
+
+
+def _save_fitted(filepath, out, data, fit):
+    """Write the bytes chosen by an _encode search; the report names the settings."""
+    with open(out, "wb") as f:
+        f.write(data)
+    return out, f"{_report(filepath, out)} [{_describe_fit(fit)}]"
+
+
+def _parse_target(args):
+    """Set args.target to (metric, value) from --target-ssim/--target-psnr. False on a usage error."""
+    given = [(m, v) for m, v in (("ssim", args.target_ssim), ("psnr", args.target_psnr)) if v is not None]
+    args.target = given[0] if given else None
+    if not given:
+        return True
+    if len(given) > 1 or getattr(args, "max_bytes", None):
+        print("Error: use only one of --target-ssim, --target-psnr and --max-bytes")
+        return False
+    from ops._metrics import HAS_NUMPY
+    if not HAS_NUMPY:
+        print("Error: --target-ssim/--target-psnr need numpy (pip install numpy)")
+        return False
+    if args.target_ssim is not None and not 0 < args.target_ssim <= 1:
+        print("Error: --target-ssim must be in (0, 1]")
+        return False
+    return True
 
 
 def cmd_compress(args):
-    """Compress image by adjusting quality."""
-    files = _collect_images(args.input)
-    quality = args.quality or 80
-
-    for filepath in files:
-        img = Image.open(filepath)
-        ext = os.path.splitext(filepath)[1].lower()
-        pil_format = FORMAT_MAP.get(ext.lstrip("."), "PNG")
-
-        if pil_format == "JPEG" and img.mode in ("RGBA", "P", "LA"):
-            img = img.convert("RGB")
-
-        base, orig_ext = os.path.splitext(filepath)
-        out = args.output if (args.output and len(files) == 1) else f"{base}_compressed{orig_ext}"
-
-        save_kwargs = {}
-        if pil_format in ("JPEG", "WEBP"):
-            save_kwargs["quality"] = quality
-            save_kwargs["optimize"] = True
-        elif pil_format == "PNG":
-            save_kwargs["optimize"] = True
-
-        img.save(out, pil_format, **save_kwargs)
-
-        orig_size = os.path.getsize(filepath)
-        new_size = os.path.getsize(out)
-        ratio = ((orig_size - new_size) / orig_size) * 100 if orig_size > 0 else 0
-        print(f"{filepath} -> {out} ({orig_size:,}B -> {new_size:,}B, {ratio:+.1f}%)")
-
-
-def register(subparsers):
-    p = subparsers.add_parser("convert", help="Convert image format")
-    p.add_argument("input", help="Image file or directory")
-    p.add_argument("--format", "-f", required=True, help="Target format: png, jpg, webp, bmp, tiff, gif")
-    p.add_argument("--quality", "-q", type=int, help="Quality 1-100 (for JPEG/WebP)")
-    p.add_argument("-o", "--output", help="Output path")
-    p.set_defaults(func=cmd_convert)
-
-    p = subparsers.add_parser("compress", help="Compress image")
-    p.add_argument("input", help="Image file or directory")
-    p.add_argument("--quality", "-q", type=int, default=80, help="Quality 1-100 (default: 80)")
-    p.add_argument("-o", "--output", help="Output path")
-    p.set_defaults(func=cmd_compress)
+    """Compress image by adjusting quality, or to a byte budget with --max-bytes."""
+    if args.max_bytes:
+        try:
+            args.max_bytes = parse_bytes(args.max_bytes)
+        except ValueError:
+            print(f"Error: invalid --max-bytes '{args.max_bytes}' (e.g. 200K, 1.5M, 204800)")
+            return
+    if args.min_scale is not None and not 0 < args.min_scale <= 100:
+        print("Error: --min-scale must be a percentage in (0, 100]")
+        return
+    if not _parse_target(args):
+        return
+    if os.path.isdir(args.input):
+        args.output = None
+    return run_batch(_compress_file, scan_args(args), args)
@@ -3,6 +3,8 @@
 import os
 from PIL import Image, ImageChops
 
+from ops._frames import Animation, apply, open_frames
+
 
 def _output_path(input_path, suffix, output=None):
     if output:
@@ -23,9 +25,8 @@ def _parse_size(size_str):
     return int(parts[0]), int(parts[1])
 
 
-def cmd_crop(args):
-    """Crop image by box coordinates or center crop."""
-    img = Image.open(args.input)
+def crop_image(img, args):
+    """Crop by --box or --center. Raises ValueError if neither is given."""
     w, h = img.size
 
     if args.box:
@@ -37,19 +38,29 @@ def cmd_crop(args):
         top = (h - ch) // 2
         box = (left, top, left + cw, top + ch)
     else:
-        print("Error: specify --box or --center")
+        raise ValueError("specify --box or --center")
+
+    return img.crop(box)
+
+
+def cmd_crop(args):
+    """Crop image by box coordinates or center crop."""
+    img = Image.open(args.input)
+    w, h = img.size
+
+    try:
+        result = apply(img, lambda frame: crop_image(frame, args))
+    except ValueError as e:
+        print(f"Error: {e}")
         return
 
-    result = img.crop(box)
     out = _output_path(args.input, "cropped", args.output)
     result.save(out)
     print(f"{args.input}: {w}x{h} -> {result.size[0]}x{result.size[1]} => {out}")
 
 
-def cmd_trim(args):
-    """Auto-trim whitespace/uniform borders from image."""
-    img = Image.open(args.input)
-
+def _trim_bbox(img, args):
+    """Bounding box of content that differs from the border color, or None."""
     if args.color:
         bg_color = _parse_color(args.color)
     else:
@@ -61,7 +72,30 @@ def cmd_trim(args):
         bg = Image.new(img.mode, img.size, bg_color[:len(img.getpixel((0, 0)))] if isinstance(bg_color, tuple) else bg_color)
 
     diff = ImageChops.difference(img, bg)
-    bbox = diff.getbbox()
+    return diff.getbbox()
+
+
+def _union_bbox(img, args):
+    """_trim_bbox of a still, or the box enclosing every frame's content."""
+    if not isinstance(img, Animation):
+        return _trim_bbox(img, args)
+    boxes = [box for box in img.map_values(lambda frame: _trim_bbox(frame, args)) if box]
+    if not boxes:
+        return None
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+
+def trim_image(img, args):
+    """Trim uniform borders (one box for all frames). Uniform images are returned unchanged."""
+    bbox = _union_bbox(img, args)
+    return img.crop(bbox) if bbox else img
+
+
+def cmd_trim(args):
+    """Auto-trim whitespace/uniform borders from image."""
+    img = open_frames(Image.open(args.input))
+    bbox = _union_bbox(img, args)
 
     if bbox:
         result = img.crop(bbox)
@@ -72,9 +106,8 @@ def cmd_trim(args):
         print(f"{args.input}: nothing to trim (image is uniform)")
 
 
-def cmd_pad(args):
-    """Pad image to target size with background color."""
-    img = Image.open(args.input)
+def pad_image(img, args):
+    """Center img on a --size canvas filled with --color."""
     target_w, target_h = _parse_size(args.size)
     color = _parse_color(args.color) if args.color else (255, 255, 255)
 
@@ -87,29 +120,14 @@ def cmd_pad(args):
     x = (target_w - img.size[0]) // 2
     y = (target_h - img.size[1]) // 2
     result.paste(img, (x, y))
+    return result
+
+
+def cmd_pad(args):
+    """Pad image to target size with background color."""
+    img = Image.open(args.input)
+    result = apply(img, lambda frame: pad_image(frame, args))
 
     out = _output_path(args.input, "padded", args.output)
     result.save(out)
-    print(f"{args.input}: {img.size[0]}x{img.size[1]} -> {target_w}x{target_h} => {out}")
-
-
-def register(subparsers):
-    p = subparsers.add_parser("crop", help="Crop image")
-    p.add_argument("input", help="Image file")
-    p.add_argument("-o", "--output", help="Output path")
-    p.add_argument("--box", help="Crop box as left,top,right,bottom")
-    p.add_argument("--center", help="Center crop as WxH")
-    p.set_defaults(func=cmd_crop)
-
-    p = subparsers.add_parser("trim", help="Auto-trim borders")
-    p.add_argument("input", help="Image file")
-    p.add_argument("-o", "--output", help="Output path")
-    p.add_argument("--color", help="Background color to trim as R,G,B (default: sample corner)")
-    p.set_defaults(func=cmd_trim)
-
-    p = subparsers.add_parser("pad", help="Pad image to target size")
-    p.add_argument("input", help="Image file")
-    p.add_argument("--size", required=True, help="Target size as WxH")
-    p.add_argument("--color", help="Padding color as R,G,B (default: 255,255,255)")
-    p.add_argument("-o", "--output", help="Output path")
-    p.set_defaults(func=cmd_pad)
+    print(f"{args.input}: {img.size[0]}x{img.size[1]} -> {result.size[0]}x{result.size[1]} => {out}")
@@ -0,0 +1,126 @@
+"""Responsive derivatives: every width x format of a source from one decode.
+
+Widths are produced largest first, each resampled from the smallest image
+already made that is at least REDUCING_GAP times wider (falling back to the
+source), so a 320px rendition comes from the 1280px one instead of the full
+decode. Encodes run on a thread pool while the chain continues, and a JSON
+manifest lists every output with its dimensions and byte size.
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+from ops import convert, resize
+from ops._encode import save_kwargs
+from ops._frames import ANIMATED_FORMATS, Animation, open_frames
+from ops._parallel import run_batch, worker_threads
+from ops._scan import output_base, scan_args
+
+MANIFEST_NAME = "derivatives.json"
+
+
+def _parse_list(text, cast=str):
+    return [cast(part.strip()) for part in text.split(",") if part.strip()]
+
+
+def _plan_widths(widths, source_width):
+    """Requested widths the source can fill (no upscaling), largest first."""
+    fitting = sorted({w for w in widths if w <= source_width}, reverse=True)
+    return fitting or [source_width]
+
+
+def _chain(img, sizes, gap):
+    """Yield (size, image) per size, each from the smallest fit predecessor.
+
+    With gap None (--full-decode) every size is resampled from img.
+    """
+    levels = []
+    for size in sizes:
+        if size == img.size:
+            yield size, img
+            continue
+        source = img
+        if gap is not None:
+            source = next((level for level in reversed(levels) if level.size[0] >= size[0] * gap), img)
+        result = source.resize(size, Image.LANCZOS, reducing_gap=gap)
+        levels.append(result)
+        yield size, result
+
+
+def _encode(img, out, fmt, quality):
+    pil_format = convert.FORMAT_MAP[fmt]
+    if isinstance(img, Animation) and pil_format not in ANIMATED_FORMATS:
+        img = img.frames[0]
+    img = convert.convert_image(img, pil_format)
+    img.save(out, pil_format, **save_kwargs(pil_format, quality))
+    return {"path": out, "format": fmt, "width": img.size[0], "height": img.size[1],
+            "bytes": os.path.getsize(out)}
+
+
+def _derivatives_file(filepath, args):
+    img = Image.open(filepath)
+    orig_w, orig_h = img.size
+    widths = _plan_widths(args.widths, orig_w)
+    sizes = [(w, max(1, round(orig_h * w / orig_w))) for w in widths]
+    gap = resize._reducing_gap(args)
+    if gap is not None:
+        img.draft(None, (int(sizes[0][0] * gap), int(sizes[0][1] * gap)))
+    # An animation is resampled frame by frame at every level of the chain
+    img = open_frames(img)
+    if img.mode not in ("RGB", "RGBA", "L", "LA"):
+        img = img.convert("RGBA" if "transparency" in img.info or img.mode.endswith("A") else "RGB")
+
+    base = os.path.splitext(output_base(filepath, args))[0]
+    os.makedirs(os.path.dirname(base) or ".", exist_ok=True)
+    # Inside a --jobs pool worker only this worker's share of the CPUs
+    threads = args.threads or min(worker_threads(), len(widths) * len(args.formats))
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(_encode, level, f"{base}_{size[0]}w.{fmt}", fmt, args.quality)
+                   for size, level in _chain(img, sizes, gap)
+                   for fmt in args.formats]
+        outputs = [future.result() for future in futures]
+
+    entry = {"source": filepath, "width": orig_w, "height": orig_h, "outputs": outputs}
+    total = sum(o["bytes"] for o in outputs)
+    listed = ", ".join(str(w) for w in widths)
+    return entry, (f"{filepath}: {orig_w}x{orig_h} -> {len(widths)} width(s) [{listed}] x "
+                   f"{'/'.join(args.formats)} ({len(outputs)} files, {total:,}B) => {os.path.dirname(base) or '.'}")
+
+
+def _manifest_path(args):
+    if args.manifest:
+        return args.manifest
+    root = args.output_dir or (args.input if os.path.isdir(args.input) else os.path.dirname(args.input))
+    return os.path.join(root or ".", MANIFEST_NAME)
+
+
+def cmd_derivatives(args):
+    """Write every --widths x --formats rendition of each image, plus a JSON manifest."""
+    try:
+        args.widths = _parse_list(args.widths, int)
+    except ValueError:
+        print(f"Error: --widths must be comma-separated integers, got '{args.widths}'")
+        return
+    args.formats = [fmt.lower() for fmt in _parse_list(args.formats)]
+    unknown = [fmt for fmt in args.formats if fmt not in convert.FORMAT_MAP]
+    if not args.widths or any(w < 1 for w in args.widths) or not args.formats or unknown:
+        print(f"Error: need positive --widths and --formats from: {', '.join(convert.FORMAT_MAP.keys())}")
+        return
+
+    entries = []
+
+    def collect(result):
+        if result["ok"]:
+            entries.append(result["output"])
+
+    failures = run_batch(_derivatives_file, scan_args(args), args, on_result=collect)
+
+    manifest = _manifest_path(args)
+    os.makedirs(os.path.dirname(manifest) or ".", exist_ok=True)
+    with open(manifest, "w") as f:
+        json.dump({"widths": args.widths, "formats": args.formats, "images": entries}, f, indent=2)
+    count = sum(len(e["outputs"]) for e in entries)
+    print(f"Manifest: {len(entries)} image(s), {count} file(s) => {manifest}")
+    return failures
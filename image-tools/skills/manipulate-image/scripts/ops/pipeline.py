@@ -0,0 +1,113 @@
+"""Multi-step pipeline: decode once, apply ops in memory, encode once."""
+
+import argparse
+import os
+import shlex
+from PIL import Image
+
+from ops import add_command, alpha, convert, crop, resize, transform
+from ops._encode import save_kwargs
+from ops._frames import ANIMATED_FORMATS, apply, open_frames
+from ops._parallel import run_batch
+from ops._scan import output_base, scan_args
+
+
+def _convert_step(img, args):
+    return convert.convert_image(img, convert.FORMAT_MAP[args.format.lower()])
+
+
+# step name -> function(img, step_args) returning the transformed image
+STEPS = {
+    "crop": crop.crop_image,
+    "trim": crop.trim_image,
+    "pad": crop.pad_image,
+    "resize": resize.resize_image,
+    "rotate": transform.rotate_image,
+    "flip": transform.flip_image,
+    "alpha": alpha.alpha_image,
+    "convert": _convert_step,
+}
+
+# Steps given a whole Animation rather than one frame at a time
+WHOLE_IMAGE_STEPS = {"trim"}  # One trim box for all frames
+
+
+def _parse_steps(step_strs):
+    """Parse each 'op --flag value' string with that op's own subcommand flags."""
+    parser = argparse.ArgumentParser(prog="pipeline --step")
+    subparsers = parser.add_subparsers(dest="command")
+    for name in STEPS:
+        add_command(subparsers, name)
+
+    steps = []
+    for step in step_strs:
+        tokens = shlex.split(step)
+        if not tokens or tokens[0] not in STEPS:
+            raise ValueError(f"unknown step '{step}'. Steps: {', '.join(STEPS)}")
+        # The op parsers require an input positional; the image is already in memory
+        step_args = parser.parse_args([tokens[0], "-", *tokens[1:]])
+        if tokens[0] == "convert" and step_args.format.lower() not in convert.FORMAT_MAP:
+            raise ValueError(f"unsupported format '{step_args.format}'. Supported: {', '.join(convert.FORMAT_MAP.keys())}")
+        steps.append((tokens[0], step_args))
+    return steps
+
+
+def _pipeline_file(filepath, args):
+    img = Image.open(filepath)
+    orig_w, orig_h = img.size
+
+    fmt, quality = None, None
+    for name, step_args in args.parsed_steps:
+        if name == "convert":
+            fmt, quality = step_args.format.lower(), step_args.quality
+
+    base, ext = os.path.splitext(output_base(filepath, args))
+    out = args.output or f"{base}_pipeline{'.' + fmt if fmt else ext}"
+    if fmt is None:
+        fmt = os.path.splitext(out)[1].lstrip(".").lower()
+    pil_format = convert.FORMAT_MAP.get(fmt)
+
+    # Every frame of an animation goes through the steps unless the output keeps only the first
+    if pil_format in ANIMATED_FORMATS:
+        img = open_frames(img)
+    for name, step_args in args.parsed_steps:
+        step = STEPS[name]
+        if name in WHOLE_IMAGE_STEPS:
+            img = step(img, step_args)
+        else:
+            img = apply(img, lambda frame: step(frame, step_args), pil_format)
+
+    img = apply(img, lambda frame: convert.convert_image(frame, pil_format), pil_format)
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    img.save(out, pil_format, **save_kwargs(pil_format, quality))
+
+    chain = " -> ".join(name for name, _ in args.parsed_steps)
+    return out, f"{filepath}: {orig_w}x{orig_h} -> [{chain}] -> {img.size[0]}x{img.size[1]} => {out}"
+
+
+def cmd_pipeline(args):
+    """Apply an ordered list of ops to each image with a single decode and save."""
+    try:
+        args.parsed_steps = _parse_steps(args.step)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    # A pipeline-wide --max-memory applies to every step that supports strips
+    for _, step_args in args.parsed_steps:
+        if hasattr(step_args, "max_memory") and not step_args.max_memory:
+            step_args.max_memory = args.max_memory
+
+    # -o only applies to single-file input
+    if os.path.isdir(args.input):
+        args.output = None
+    if args.output:
+        # The saved format and the -o extension must agree
+        ext = os.path.splitext(args.output)[1].lstrip(".").lower()
+        formats = [step_args.format.lower() for name, step_args in args.parsed_steps if name == "convert"]
+        if formats and convert.FORMAT_MAP.get(ext) != convert.FORMAT_MAP[formats[-1]]:
+            print(f"Error: -o {args.output} does not match the convert step's format '{formats[-1]}'")
+            return
+        if not formats and ext not in convert.FORMAT_MAP:
+            print(f"Error: unsupported output extension '.{ext}'. Supported: {', '.join(convert.FORMAT_MAP.keys())}")
+            return
+    return run_batch(_pipeline_file, scan_args(args), args)
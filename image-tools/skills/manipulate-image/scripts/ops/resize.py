@@ -3,6 +3,10 @@
 import os
 from PIL import Image
 
+from ops._frames import apply
+from ops._parallel import run_batch
+from ops._scan import output_base, scan_args
+
 
 def _parse_size(size_str):
     """Parse 'WxH' or 'W' into (width, height) or (width, None)."""
@@ -20,80 +24,90 @@ def _output_path(input_path, suffix, output=None):
     return f"{base}_{suffix}{ext}"
 
 
-def _collect_images(path):
-    """If path is a directory, return all image files. Otherwise return [path]."""
-    EXTS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tiff", ".tif", ".gif"}
-    if os.path.isdir(path):
-        files = []
-        for f in sorted(os.listdir(path)):
-            if os.path.splitext(f)[1].lower() in EXTS:
-                files.append(os.path.join(path, f))
-        return files
-    return [path]
+def _new_size(orig_w, orig_h, args):
+    """Compute target (width, height) from --width/--height/--scale."""
+    if args.width and args.height:
+        return (args.width, args.height)
+    if args.width:
+        ratio = args.width / orig_w
+        return (args.width, round(orig_h * ratio))
+    if args.height:
+        ratio = args.height / orig_h
+        return (round(orig_w * ratio), args.height)
+    if not args.scale:
+        raise ValueError("specify --width, --height, or --scale")
+    factor = args.scale / 100.0
+    return (round(orig_w * factor), round(orig_h * factor))
+
+
+# Downscales keep at least this multiple of the target size for the final
+# LANCZOS pass; everything above it is shed by the decoder (JPEG DCT scaling
+# via draft) or by a cheap integer reduce(). Same default as Image.thumbnail.
+REDUCING_GAP = 2.0
+
+
+def _reducing_gap(args):
+    """REDUCING_GAP, or None for an exact full-resolution resample (--full-decode)."""
+    return None if getattr(args, "full_decode", False) else REDUCING_GAP
+
+
+def resize_image(img, args):
+    """Resize per --width/--height/--scale with LANCZOS resampling.
+
+    Unless --full-decode is given, a not-yet-loaded JPEG is decoded at a
+    reduced scale when the target is much smaller, and large downscales
+    reduce() by an integer factor before the final LANCZOS pass.
+    """
+    new_size = _new_size(img.size[0], img.size[1], args)
+    gap = _reducing_gap(args)
+    if gap is None:
+        return img.resize(new_size, Image.LANCZOS)
+    img.draft(None, (int(new_size[0] * gap), int(new_size[1] * gap)))
+    return img.resize(new_size, Image.LANCZOS, reducing_gap=gap)
+
+
+def _resize_file(filepath, args):
+    img = Image.open(filepath)
+    orig_w, orig_h = img.size
+    result = apply(img, lambda frame: resize_image(frame, args))
+    new_size = result.size
+
+    out = _output_path(output_base(filepath, args), f"{new_size[0]}x{new_size[1]}", args.output)
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    result.save(out)
+    return out, f"{filepath}: {orig_w}x{orig_h} -> {new_size[0]}x{new_size[1]} => {out}"
 
 
 def cmd_resize(args):
     """Resize image(s) to specified dimensions."""
-    files = _collect_images(args.input)
-
-    for filepath in files:
-        img = Image.open(filepath)
-        orig_w, orig_h = img.size
-
-        if args.width and args.height:
-            new_size = (args.width, args.height)
-        elif args.width:
-            ratio = args.width / orig_w
-            new_size = (args.width, round(orig_h * ratio))
-        elif args.height:
-            ratio = args.height / orig_h
-            new_size = (round(orig_w * ratio), args.height)
-        elif args.scale:
-            factor = args.scale / 100.0
-            new_size = (round(orig_w * factor), round(orig_h * factor))
-        else:
-            print(f"Error: specify --width, --height, or --scale")
-            return
-
-        resample = Image.LANCZOS
-        result = img.resize(new_size, resample)
-
-        out = _output_path(filepath, f"{new_size[0]}x{new_size[1]}", args.output if len(files) == 1 else None)
-        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
-        result.save(out)
-        print(f"{filepath}: {orig_w}x{orig_h} -> {new_size[0]}x{new_size[1]} => {out}")
+    if not (args.width or args.height or args.scale):
+        print(f"Error: specify --width, --height, or --scale")
+        return
 
+    # -o only applies to single-file input
+    if os.path.isdir(args.input):
+        args.output = None
+    return run_batch(_resize_file, scan_args(args), args)
 
-def cmd_thumbnail(args):
-    """Generate thumbnail with max size constraint."""
-    files = _collect_images(args.input)
+
+def _thumbnail_file(filepath, args):
     max_w, max_h = _parse_size(args.size)
     if max_h is None:
         max_h = max_w
 
-    for filepath in files:
-        img = Image.open(filepath)
-        img.thumbnail((max_w, max_h), Image.LANCZOS)
-        out = _output_path(filepath, "thumb", args.output if len(files) == 1 else None)
-        os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
-        img.save(out)
-        print(f"{filepath}: -> {img.size[0]}x{img.size[1]} => {out}")
-
-
-def register(subparsers):
-    # resize
-    p = subparsers.add_parser("resize", help="Resize image(s)")
-    p.add_argument("input", help="Image file or directory")
-    p.add_argument("-o", "--output", help="Output path")
-    p.add_argument("--width", type=int, help="Target width (px)")
-    p.add_argument("--height", type=int, help="Target height (px)")
-    p.add_argument("--scale", type=float, help="Scale percentage (e.g. 50 for half)")
-    p.add_argument("--overwrite", action="store_true", help="Overwrite input file")
-    p.set_defaults(func=cmd_resize)
-
-    # thumbnail
-    p = subparsers.add_parser("thumbnail", help="Generate thumbnail")
-    p.add_argument("input", help="Image file or directory")
-    p.add_argument("--size", required=True, help="Max size as WxH or W (e.g. 200x200)")
-    p.add_argument("-o", "--output", help="Output path")
-    p.set_defaults(func=cmd_thumbnail)
+    def thumbnail(frame):
+        frame.thumbnail((max_w, max_h), Image.LANCZOS, reducing_gap=_reducing_gap(args))
+        return frame
+
+    img = apply(Image.open(filepath), thumbnail)
+    out = _output_path(output_base(filepath, args), "thumb", args.output)
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    img.save(out)
+    return out, f"{filepath}: -> {img.size[0]}x{img.size[1]} => {out}"
+
+
+def cmd_thumbnail(args):
+    """Generate thumbnail with max size constraint."""
+    if os.path.isdir(args.input):
+        args.output = None
+    return run_batch(_thumbnail_file, scan_args(args), args)
@@ -1,4 +1,17 @@
 #!/bin/bash
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 VENV_DIR="$SCRIPT_DIR/../../../scripts/venv"
-"$VENV_DIR/bin/python" "$SCRIPT_DIR/image_tools.py" "$@"
+PYTHON="$VENV_DIR/bin/python"
+SOCKET="${IMAGE_TOOLS_SOCKET:-${XDG_RUNTIME_DIR:-/tmp}/image-tools-$(id -u).sock}"
+
+case "$1" in
+    serve|status|stop)
+        exec "$PYTHON" "$SCRIPT_DIR/daemon.py" "$@" ;;
+esac
+
+# Use the server when it is running (client.py falls back to in-process execution).
+# -S -I: no site-packages or user site, the client only needs the interpreter core
+if [ -S "$SOCKET" ]; then
+    exec "$PYTHON" -S -I "$SCRIPT_DIR/client.py" "$@"
+fi
+"$PYTHON" "$SCRIPT_DIR/image_tools.py" "$@"
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+# The scripts directory is not a package: image_tools.py imports ops.* from it
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+
+@pytest.fixture
+def cache_env(tmp_path, monkeypatch):
+    """Run from tmp_path with a private, enabled result cache."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("IMAGE_TOOLS_CACHE", "1")
+    monkeypatch.setenv("IMAGE_TOOLS_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.delenv("IMAGE_TOOLS_MAX_MEMORY", raising=False)
+    return tmp_path
@@ -0,0 +1,38 @@
+import os
+
+from PIL import Image
+
+import image_tools
+from ops._cache import ResultCache
+
+
+def _photo(path):
+    Image.radial_gradient("L").convert("RGB").resize((400, 300)).save(path)
+
+
+def _stats():
+    return ResultCache().stats()
+
+
+def test_output_flag_then_default_name(cache_env, capsys):
+    _photo("a.jpg")
+    image_tools.run(["resize", "a.jpg", "--width", "200", "-o", "out1.jpg"])
+    # Same key, but the entry stored under -o has no default-name suffix
+    image_tools.run(["resize", "a.jpg", "--width", "200"])
+    assert os.path.exists("a_200x150.jpg")
+    assert "a_200x150.jpg" in capsys.readouterr().out
+
+    image_tools.run(["resize", "a.jpg", "--width", "200"])
+    image_tools.run(["resize", "a.jpg", "--width", "200", "-o", "out2.jpg"])
+    assert Image.open("out2.jpg").size == (200, 150)
+    stats = _stats()
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+
+
+def test_hit_reproduces_output(cache_env):
+    _photo("a.jpg")
+    image_tools.run(["thumbnail", "a.jpg", "--size", "64", "-o", "first.jpg"])
+    image_tools.run(["thumbnail", "a.jpg", "--size", "64", "-o", "second.jpg"])
+    with open("first.jpg", "rb") as a, open("second.jpg", "rb") as b:
+        assert a.read() == b.read()
+    assert _stats()["hits"] == 1
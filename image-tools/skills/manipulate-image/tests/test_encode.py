@@ -0,0 +1,17 @@
+from PIL import Image, ImageFilter
+
+from ops._encode import fit_bytes
+
+
+def _noisy(size, seed):
+    return Image.effect_noise(size, 40 + seed).convert("RGB").filter(ImageFilter.GaussianBlur(1))
+
+
+def test_fit_bytes_does_not_depend_on_previous_files():
+    img = _noisy((320, 240), 0)
+    alone = fit_bytes(img, "JPEG", 12_000)
+    # A different file first must not shift the search for this one
+    fit_bytes(_noisy((320, 240), 30), "JPEG", 40_000)
+    again = fit_bytes(img, "JPEG", 12_000)
+    assert again == alone
+    assert len(alone[0]) <= 12_000